@@ -7,6 +7,9 @@ if (!db.getCollectionNames().includes("prompts")) {
 }
 // índice para buscar por modelo de IA
 db.prompts.createIndex({ ia_model: 1 });
+// listagem paginada (cursor em _id) filtrada por modelo ou por prefixo do nome
+db.prompts.createIndex({ ia_model: 1, _id: 1 });
+db.prompts.createIndex({ name: 1 });
 
 // --- executions ---
 if (!db.getCollectionNames().includes("executions")) {
@@ -14,4 +17,31 @@ if (!db.getCollectionNames().includes("executions")) {
 }
 // índices para métricas
 db.executions.createIndex({ prompt_id: 1 });
-db.executions.createIndex({ timestamp: 1 });
+// export e listagem das execuções de um prompt em ordem de _id
+db.executions.createIndex({ prompt_id: 1, _id: 1 });
+db.executions.createIndex({ created_at: 1 });
+// execuções restauradas do arquivo (POST /executions/archive/restore) expiram em 24h
+db.executions.createIndex({ restored_at: 1 }, { expireAfterSeconds: 86400 });
+// percentis de latência por prompt (GET /prompts/{id}/metrics)
+db.executions.createIndex({ prompt_id: 1, latency_ms: 1 });
+
+// --- execution_rollups ---
+// séries temporais pré-agregadas (GET /prompts/{id}/timeseries); minutos e horas expiram
+db.execution_rollups.createIndex(
+  { prompt_id: 1, granularity: 1, bucket: 1, ia_model: 1 },
+  { unique: true }
+);
+db.execution_rollups.createIndex({ expires_at: 1 }, { expireAfterSeconds: 0 });
+
+// --- response_cache ---
+// cache de respostas do /execute; documentos expiram via índice TTL
+db.response_cache.createIndex({ expires_at: 1 }, { expireAfterSeconds: 0 });
+
+// --- extraction_cache ---
+// texto extraído de PDFs/OCR por hash do arquivo; expira via índice TTL
+db.extraction_cache.createIndex({ expires_at: 1 }, { expireAfterSeconds: 0 });
+
+// --- jobs ---
+// fila de execuções assíncronas (POST /jobs)
+db.jobs.createIndex({ status: 1, available_at: 1, created_at: 1 });
+db.jobs.createIndex({ status: 1, lease_until: 1 });
@@ -0,0 +1,175 @@
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Tuple, TypeVar
+
+from roteamento_ia_backend.core.config import settings
+from roteamento_ia_backend.core.logging import logger
+from roteamento_ia_backend.core.rate_limit import provider_for_model
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """O circuito do provedor/modelo está aberto: a chamada falha sem ir à rede."""
+
+    def __init__(self, key: str, retry_in_s: float):
+        self.key = key
+        self.retry_in_s = retry_in_s
+        super().__init__(f"Circuito aberto para {key}; nova tentativa em {retry_in_s:.0f}s")
+
+
+def breaker_key(ia_model: str) -> str:
+    return f"{provider_for_model(ia_model)}:{ia_model}"
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por janela de chamadas recentes.
+
+    - closed: chamadas passam; abre se a taxa de falhas ou de chamadas lentas na
+      janela passar do limite (com um mínimo de chamadas).
+    - open: chamadas falham na hora com CircuitOpenError até `open_s` expirar.
+    - half_open: deixa passar poucas chamadas de teste; sucesso fecha, falha reabre.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.half_open_in_flight = 0
+        self._calls: Deque[Tuple[bool, bool]] = deque(maxlen=settings.BREAKER_WINDOW)
+
+    def allows(self) -> bool:
+        """Indica, sem alterar o estado, se uma chamada passaria agora."""
+        if self.state == OPEN:
+            return time.monotonic() - self.opened_at >= settings.BREAKER_OPEN_S
+        if self.state == HALF_OPEN:
+            return self.half_open_in_flight < settings.BREAKER_HALF_OPEN_CALLS
+        return True
+
+    def before_call(self) -> None:
+        if self.state == OPEN:
+            elapsed = time.monotonic() - self.opened_at
+            if elapsed < settings.BREAKER_OPEN_S:
+                raise CircuitOpenError(self.key, settings.BREAKER_OPEN_S - elapsed)
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self.half_open_in_flight >= settings.BREAKER_HALF_OPEN_CALLS:
+                raise CircuitOpenError(self.key, 1.0)
+            self.half_open_in_flight += 1
+
+    def record(self, ok: bool, latency_ms: float) -> None:
+        slow = latency_ms >= settings.BREAKER_SLOW_CALL_MS
+        if self.state == HALF_OPEN:
+            self.half_open_in_flight = max(self.half_open_in_flight - 1, 0)
+            if ok and not slow:
+                self._transition(CLOSED)
+            else:
+                self._transition(OPEN)
+            return
+
+        self._calls.append((ok, slow))
+        if self.state == CLOSED and len(self._calls) >= settings.BREAKER_MIN_CALLS:
+            total = len(self._calls)
+            failure_rate = sum(1 for ok_, _ in self._calls if not ok_) / total
+            slow_rate = sum(1 for _, slow_ in self._calls if slow_) / total
+            if failure_rate >= settings.BREAKER_FAILURE_RATE or slow_rate >= settings.BREAKER_SLOW_CALL_RATE:
+                self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        logger.warning(f"Circuit breaker {self.key}: {self.state} -> {state}")
+        self.state = state
+        self.half_open_in_flight = 0
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+        if state == CLOSED:
+            self._calls.clear()
+
+    @asynccontextmanager
+    async def track(self) -> AsyncIterator[None]:
+        """Envolve uma chamada: rejeita se o circuito estiver aberto e registra o resultado."""
+        self.before_call()
+        start = time.monotonic()
+        try:
+            yield
+        except BaseException as e:
+            # Cancelamento (ex: hedge perdedor) e cliente que fechou o stream SSE
+            # (GeneratorExit no aclose do gerador) não são falha do provedor
+            if isinstance(e, (asyncio.CancelledError, GeneratorExit)):
+                if self.state == HALF_OPEN:
+                    self.half_open_in_flight = max(self.half_open_in_flight - 1, 0)
+            else:
+                self.record(False, (time.monotonic() - start) * 1000)
+            raise
+        self.record(True, (time.monotonic() - start) * 1000)
+
+    def snapshot(self) -> Dict[str, Any]:
+        total = len(self._calls)
+        return {
+            "state": self.state,
+            "calls_in_window": total,
+            "failure_rate": round(sum(1 for ok, _ in self._calls if not ok) / total, 3) if total else 0.0,
+            "slow_rate": round(sum(1 for _, slow in self._calls if slow) / total, 3) if total else 0.0,
+        }
+
+
+class BreakerRegistry:
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, key: str) -> CircuitBreaker:
+        if key not in self._breakers:
+            self._breakers[key] = CircuitBreaker(key)
+        return self._breakers[key]
+
+    def allows(self, ia_model: str) -> bool:
+        breaker = self._breakers.get(breaker_key(ia_model))
+        return breaker is None or breaker.allows()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {key: b.snapshot() for key, b in self._breakers.items()}
+
+
+breakers = BreakerRegistry()
+
+
+def _is_retryable(exc: Exception) -> bool:
+    """Timeouts, erros de conexão e 5xx são transitórios; 4xx (inclusive 429) não."""
+    if isinstance(exc, (CircuitOpenError, asyncio.CancelledError)):
+        return False
+    if isinstance(exc, asyncio.TimeoutError):
+        return True
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    if isinstance(status, int):
+        return status >= 500
+    return True
+
+
+async def call_with_resilience(ia_model: str, fn: Callable[[], Awaitable[T]]) -> T:
+    """
+    Executa a chamada ao provedor com circuit breaker por provedor/modelo, timeout
+    e novas tentativas com backoff exponencial e jitter para erros transitórios.
+    """
+    breaker = breakers.get(breaker_key(ia_model))
+    attempts = settings.PROVIDER_RETRIES + 1
+    for attempt in range(attempts):
+        try:
+            async with breaker.track():
+                return await asyncio.wait_for(fn(), timeout=settings.PROVIDER_CALL_TIMEOUT_S)
+        except Exception as e:
+            if attempt == attempts - 1 or not _is_retryable(e):
+                raise
+            # Full jitter: espera aleatória entre 0 e o backoff exponencial
+            backoff = min(settings.PROVIDER_RETRY_BASE_S * (2 ** attempt), settings.PROVIDER_RETRY_MAX_S)
+            delay = random.uniform(0, backoff)
+            logger.warning(f"Falha transitória em {ia_model} ({e!r}); nova tentativa em {delay:.2f}s")
+            await asyncio.sleep(delay)
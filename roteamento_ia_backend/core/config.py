@@ -1,3 +1,5 @@
+from typing import Any, Dict, List
+from pydantic import field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -10,4 +12,189 @@ class Settings(BaseSettings):
     MONGO_URI: str
     MONGO_DB: str = "roteamento_ia"
 
+    # Timeout (ms) das chamadas ao Gemini; as chamadas são assíncronas e não
+    # ocupam o event loop enquanto aguardam o provedor
+    GEMINI_TIMEOUT_MS: int = 60_000
+
+    # Pool de conexões HTTP do client OpenAI (compartilhado pelo processo)
+    OPENAI_MAX_CONNECTIONS: int = 100
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    OPENAI_KEEPALIVE_EXPIRY_S: float = 30.0
+    OPENAI_TIMEOUT_S: float = 60.0
+    OPENAI_CONNECT_TIMEOUT_S: float = 5.0
+    OPENAI_MAX_RETRIES: int = 0  # as novas tentativas são feitas por call_with_resilience
+
+    # Cache de respostas do /execute (LRU em memória + coleção Mongo com TTL)
+    RESPONSE_CACHE_ENABLED: bool = False
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1024
+    RESPONSE_CACHE_TTL_S: int = 3600
+    RESPONSE_CACHE_MONGO_ENABLED: bool = True
+
+    # Agrupa execuções idênticas simultâneas numa única chamada ao provedor
+    SINGLEFLIGHT_ENABLED: bool = True
+
+    # Execução em lote (/execute/batch)
+    BATCH_DEFAULT_CONCURRENCY: int = 8
+    BATCH_MAX_CONCURRENCY: int = 32
+    BATCH_MAX_INPUTS: int = 10_000
+    BATCH_INSERT_CHUNK: int = 100
+
+    # Fila de jobs assíncronos (POST /jobs) processada por workers no próprio processo
+    JOB_WORKERS: int = 2
+    JOB_POLL_INTERVAL_S: float = 1.0
+    JOB_LEASE_S: float = 120.0
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_DELAY_S: float = 5.0
+    JOB_MAX_FILE_BYTES: int = 10 * 1024 * 1024
+
+    # Limites por provedor ("openai", "gemini") e por modelo (ex: "gpt-4o"):
+    # concurrency = chamadas simultâneas, rpm = requisições/min, tpm = tokens/min.
+    # Via .env, em JSON: RATE_LIMITS='{"openai": {"concurrency": 16, "rpm": 500}}'
+    RATE_LIMITS: Dict[str, Dict[str, float]] = {
+        "openai": {"concurrency": 32, "rpm": 500, "tpm": 200_000},
+        "gemini": {"concurrency": 32, "rpm": 1000, "tpm": 1_000_000},
+    }
+    RATE_LIMIT_MAX_WAIT_S: float = 30.0      # espera máxima na fila do limitador
+    RATE_LIMIT_BURST_S: float = 5.0          # capacidade do balde, em segundos de taxa
+    RATE_LIMIT_DECREASE_FACTOR: float = 0.5  # fator aplicado à taxa a cada 429
+    RATE_LIMIT_MIN_FRACTION: float = 0.1     # piso da taxa, em fração da configurada
+    RATE_LIMIT_RECOVERY_STEP: float = 0.02   # recuperação por sucesso, em fração da configurada
+    RATE_LIMIT_IMAGE_TOKENS: int = 1000      # tokens estimados por imagem
+
+    # Amostras recentes de latência guardadas por modelo e peso das médias EWMA
+    MODEL_STATS_WINDOW: int = 200
+    MODEL_STATS_EWMA_ALPHA: float = 0.2
+
+    # Roteamento: o chamador pode pedir uma classe em vez de um modelo concreto.
+    # O score de cada candidato soma latência e custo normalizados (pelos pesos da
+    # classe) e a taxa de erro recente multiplicada por ROUTING_ERROR_PENALTY.
+    ROUTING_CLASSES: Dict[str, Dict[str, Any]] = {
+        "fast": {"models": ["gemini-2.0-flash", "gpt-4o-mini", "gemini-1.5-flash"], "latency_weight": 1.0, "cost_weight": 0.1},
+        "cheap": {"models": ["gemini-1.5-flash", "gemini-2.0-flash", "gpt-4o-mini", "gpt-3.5-turbo"], "latency_weight": 0.1, "cost_weight": 1.0},
+        "vision": {"models": ["gpt-4o", "gemini-2.0-flash", "gemini-1.5-pro"], "latency_weight": 0.5, "cost_weight": 0.5},
+        "balanced": {"models": ["gemini-2.0-flash", "gpt-4o-mini", "gpt-4o"], "latency_weight": 0.5, "cost_weight": 0.5},
+    }
+    # Preço em USD por 1k tokens de entrada/saída
+    MODEL_COSTS: Dict[str, Dict[str, float]] = {
+        "gpt-3.5-turbo": {"input": 0.0005, "output": 0.0015},
+        "gpt-4o": {"input": 0.0025, "output": 0.01},
+        "gpt-4o-mini": {"input": 0.00015, "output": 0.0006},
+        "gemini-1.5-flash": {"input": 0.000075, "output": 0.0003},
+        "gemini-1.5-pro": {"input": 0.00125, "output": 0.005},
+        "gemini-2.0-flash": {"input": 0.0001, "output": 0.0004},
+    }
+    ROUTING_DEFAULT_LATENCY_MS: float = 2000.0
+    ROUTING_ERROR_PENALTY: float = 2.0
+    ROUTING_ERROR_HALF_LIFE_S: float = 60.0      # a taxa de erro cai pela metade a cada minuto sem chamadas
+    ROUTING_EXPLORE_PROBABILITY: float = 0.02    # fração das requisições roteadas para um candidato fora do melhor
+    ROUTING_EXPECTED_OUTPUT_TOKENS: int = 500
+
+    # Cache de prompts em memória (invalidado por change stream ou poll de versões)
+    PROMPT_CACHE_ENABLED: bool = True
+    PROMPT_CACHE_MAX_ENTRIES: int = 1000
+    PROMPT_CACHE_TTL_S: float = 300.0
+    PROMPT_CACHE_POLL_INTERVAL_S: float = 5.0
+
+    # Gravação das execuções em lote (write-behind) com transbordo para disco
+    RECORDER_MAX_QUEUE: int = 10_000
+    RECORDER_BATCH_SIZE: int = 200
+    RECORDER_FLUSH_INTERVAL_S: float = 1.0
+    RECORDER_MAX_WAIT_S: float = 0.05
+    RECORDER_SPILL_PATH: str = "logs/executions_spill.jsonl"  # base do nome: um arquivo por processo (pid)
+
+    # Rollups das execuções por prompt × modelo × minuto/hora/dia
+    ROLLUPS_ENABLED: bool = True
+    ROLLUP_LATENCY_BUCKETS_MS: List[int] = [100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000]
+    ROLLUP_MINUTE_RETENTION_DAYS: int = 2
+    ROLLUP_HOUR_RETENTION_DAYS: int = 90
+    ROLLUP_MAX_POINTS: int = 1500
+
+    # Extração de PDF/OCR em processos separados (0 = thread no próprio worker)
+    EXTRACTION_WORKERS: int = 2
+    EXTRACTION_MAX_PENDING: int = 16         # fila + em execução; acima disso, 503
+    EXTRACTION_TIMEOUT_S: float = 60.0
+    EXTRACTION_MAX_TASKS_PER_CHILD: int = 50 # recicla o processo após N extrações
+    # Cache do texto extraído (PDF/OCR) por SHA-256 do arquivo + extrator + opções
+    EXTRACTION_CACHE_ENABLED: bool = True
+    EXTRACTION_CACHE_MAX_ENTRIES: int = 128
+    EXTRACTION_CACHE_TTL_S: int = 7 * 24 * 3600
+    EXTRACTION_CACHE_MONGO_ENABLED: bool = True
+    # PDFs: páginas por tarefa do pool e limite de caracteres extraídos (~4 por token; 0 = sem limite)
+    PDF_PAGES_PER_TASK: int = 8
+    PDF_MAX_CHARS: int = 400_000
+    # Imagens enviadas à IA: redimensionadas para o limite do modelo, sem EXIF e
+    # recomprimidas (webp ou jpeg). Limite [lado maior, lado menor] em pixels,
+    # procurado pelo nome do modelo, depois pelo provedor e por fim "default".
+    IMAGE_PREPROCESS_ENABLED: bool = True
+    IMAGE_MAX_DIMENSIONS: Dict[str, List[int]] = {
+        "default": [2048, 768],
+        "openai": [2048, 768],
+        "gemini": [3072, 3072],
+    }
+    IMAGE_FORMAT: str = "webp"
+    IMAGE_QUALITY: int = 85
+    IMAGE_OCR_MAX_SIDE: int = 2000           # cópia reduzida (tons de cinza) usada só no OCR
+
+    # Arquivos de input em blob store (GridFS, chave SHA-256) em vez de inline na execução
+    BLOB_STORE_ENABLED: bool = True
+    INPUT_INLINE_MAX_CHARS: int = 4096
+
+    # Retenção: execuções com mais de EXECUTION_HOT_DAYS dias saem do MongoDB para
+    # arquivos JSONL comprimidos (gzip) em ARCHIVE_DIR, um por dia × prompt.
+    # Em produção, ARCHIVE_DIR deve ser um volume persistente.
+    ARCHIVE_ENABLED: bool = False
+    ARCHIVE_DIR: str = "archive/executions"
+    EXECUTION_HOT_DAYS: int = 30
+    ARCHIVE_INTERVAL_S: float = 3600.0
+    ARCHIVE_BATCH_SIZE: int = 1000
+    ARCHIVE_RESTORE_TTL_HOURS: int = 24  # execuções restauradas voltam a sair depois disso
+
+    # Listagens paginadas por cursor (GET /prompts, GET /executions)
+    PAGE_MAX_LIMIT: int = 500
+
+    # Export das execuções (GET /executions/export): documentos por batch do cursor
+    EXPORT_BATCH_SIZE: int = 500
+
+    # Templates compilados em memória, por (prompt_id, versão)
+    TEMPLATE_CACHE_MAX_ENTRIES: int = 1024
+
+    # Circuit breaker por provedor/modelo (janela das últimas BREAKER_WINDOW chamadas)
+    BREAKER_WINDOW: int = 20
+    BREAKER_MIN_CALLS: int = 10
+    BREAKER_FAILURE_RATE: float = 0.5
+    BREAKER_SLOW_CALL_MS: float = 20_000
+    BREAKER_SLOW_CALL_RATE: float = 0.8
+    BREAKER_OPEN_S: float = 30.0
+    BREAKER_HALF_OPEN_CALLS: int = 2
+
+    # Timeout e novas tentativas (backoff exponencial com jitter) das chamadas aos provedores
+    PROVIDER_CALL_TIMEOUT_S: float = 60.0
+    PROVIDER_RETRIES: int = 1
+    PROVIDER_RETRY_BASE_S: float = 0.5
+    PROVIDER_RETRY_MAX_S: float = 4.0
+
+    # Cadeia de fallback padrão por modelo (ex: {"gemini-2.0-flash": ["gpt-4o-mini"]});
+    # cada prompt pode definir a sua em `fallback_models`
+    FALLBACK_MODELS: Dict[str, List[str]] = {}
+
+    # Hedging (opt-in): se o modelo não responder dentro do percentil HEDGE_PERCENTILE
+    # da sua latência recente, o prompt também é enviado ao modelo secundário.
+    # HEDGE_SECONDARY_MODELS aceita modelo ou provedor como chave.
+    HEDGE_ENABLED: bool = False
+    HEDGE_PERCENTILE: float = 95.0
+    HEDGE_MIN_SAMPLES: int = 20
+    HEDGE_SECONDARY_MODELS: Dict[str, str] = {
+        "gemini": "gpt-4o-mini",
+        "openai": "gemini-2.0-flash",
+    }
+
+    @field_validator("IMAGE_FORMAT", mode="before")
+    @classmethod
+    def _image_format(cls, value: Any) -> str:
+        # Falha na subida, e não na primeira imagem enviada
+        fmt = str(value).strip().lower()
+        if fmt not in ("webp", "jpeg"):
+            raise ValueError("IMAGE_FORMAT deve ser 'webp' ou 'jpeg'")
+        return fmt
+
 settings = Settings()
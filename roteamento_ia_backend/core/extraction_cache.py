@@ -0,0 +1,102 @@
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from roteamento_ia_backend.core.config import settings
+from roteamento_ia_backend.core.logging import logger
+from roteamento_ia_backend.core.metrics import EXTRACTION_CACHE_REQUESTS, EXTRACTION_CACHE_SAVED
+from roteamento_ia_backend.core.response_cache import LRUCache
+from roteamento_ia_backend.core.singleflight import SingleFlight
+from roteamento_ia_backend.db.crud import get_cached_extraction, set_cached_extraction
+
+
+def make_extraction_key(content: bytes, extractor: str, options: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Chave do cache: SHA-256 do arquivo, versão do extrator e opções (páginas,
+    limite de caracteres). Trocar a versão do pdfplumber/Tesseract invalida tudo.
+    """
+    file_hash = hashlib.sha256(content).hexdigest()
+    raw = "\x1f".join([file_hash, extractor, json.dumps(options or {}, sort_keys=True, default=str)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    """
+    Cache do texto extraído de arquivos em dois níveis, como o cache de
+    respostas: LRU em memória (por worker) e coleção Mongo com índice TTL
+    (compartilhada). Reenvios do mesmo arquivo não passam pelo pdfplumber/OCR.
+    """
+
+    def __init__(self, max_entries: int, ttl_s: float, use_mongo: bool):
+        self.memory = LRUCache(max_entries, ttl_s)
+        self.ttl_s = ttl_s
+        self.use_mongo = use_mongo
+        # Uploads simultâneos do mesmo arquivo extraem uma única vez
+        self._inflight = SingleFlight()
+
+    async def get(self, key: str) -> Optional[Tuple[Dict[str, Any], str]]:
+        """Retorna `(entrada, tier)` ou None; falhas no Mongo contam como miss."""
+        entry = self.memory.get(key)
+        if entry is not None:
+            return entry, "memory"
+        if not self.use_mongo:
+            return None
+        try:
+            entry = await get_cached_extraction(key)
+        except Exception as e:
+            logger.warning(f"Falha ao consultar cache de extração no Mongo: {e}")
+            return None
+        if entry is None:
+            return None
+        self.memory.set(key, entry)
+        return entry, "mongo"
+
+    async def set(self, key: str, entry: Dict[str, Any]) -> None:
+        self.memory.set(key, entry)
+        if not self.use_mongo:
+            return
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl_s)
+        try:
+            await set_cached_extraction(key, entry, expires_at)
+        except Exception as e:
+            logger.warning(f"Falha ao gravar cache de extração no Mongo: {e}")
+
+    async def get_or_extract(
+        self,
+        content: bytes,
+        method: str,
+        extractor: str,
+        options: Optional[Dict[str, Any]],
+        extract: Callable[[], Awaitable[str]],
+    ) -> str:
+        """
+        Devolve o texto do cache ou chama `extract()` e guarda o resultado.
+        Erros de extração não são cacheados.
+        """
+        key = make_extraction_key(content, extractor, options)
+        cached = await self.get(key)
+        if cached is not None:
+            entry, tier = cached
+            EXTRACTION_CACHE_REQUESTS.labels(method, tier).inc()
+            EXTRACTION_CACHE_SAVED.labels(method).inc(entry.get("seconds", 0.0))
+            return entry["text"]
+
+        EXTRACTION_CACHE_REQUESTS.labels(method, "miss").inc()
+
+        async def run() -> str:
+            start = time.perf_counter()
+            text = await extract()
+            await self.set(key, {"text": text, "seconds": time.perf_counter() - start, "extractor": extractor})
+            return text
+
+        text, _ = await self._inflight.do(key, run)
+        return text
+
+
+extraction_cache = ExtractionCache(
+    max_entries=settings.EXTRACTION_CACHE_MAX_ENTRIES,
+    ttl_s=settings.EXTRACTION_CACHE_TTL_S,
+    use_mongo=settings.EXTRACTION_CACHE_MONGO_ENABLED,
+)
@@ -0,0 +1,128 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException
+
+from roteamento_ia_backend.core.config import settings
+from roteamento_ia_backend.core.logging import logger
+from roteamento_ia_backend.core.metrics import EXTRACTION_PENDING
+
+
+class ExtractionPool:
+    """
+    Pool de processos para a extração pesada em CPU (pdfplumber, Tesseract),
+    fora do event loop e do GIL do worker da API.
+
+    - `max_pending`: extrações na fila + em execução; acima disso, 503
+    - `timeout_s`: tempo máximo por extração (504). No pool de processos, os
+      processos são encerrados e o pool recriado: um arquivo que trava o
+      pdfplumber/Tesseract não prende um worker (nem a vaga) para sempre. As
+      outras extrações em andamento no pool antigo recebem 503. Na thread
+      (sem pool), a extração continua ocupando a vaga até terminar
+    - `max_tasks_per_child`: cada processo é reciclado após N extrações,
+      devolvendo ao sistema a memória acumulada por PDFs e imagens grandes
+
+    Sem `start()` (testes, scripts) ou com `workers=0`, roda numa thread.
+    """
+
+    def __init__(self, workers: int, max_pending: int, timeout_s: float, max_tasks_per_child: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout_s = timeout_s
+        self.max_tasks_per_child = max_tasks_per_child
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.pending = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def start(self) -> None:
+        if self.workers <= 0 or self._executor is not None:
+            return
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            # spawn: fork de um processo com threads e event loop não é seguro
+            mp_context=multiprocessing.get_context("spawn"),
+            max_tasks_per_child=self.max_tasks_per_child or None,
+        )
+        logger.info(f"Pool de extração iniciado com {self.workers} processos")
+
+    def stop(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Executa `fn(*args)` no pool (`fn` precisa ser uma função de módulo, serializável)."""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Extração de arquivos sobrecarregada, tente novamente",
+                headers={"Retry-After": "1"},
+            )
+        loop = asyncio.get_running_loop()
+        executor = self._executor
+        try:
+            if executor is not None:
+                future = loop.run_in_executor(executor, fn, *args)
+            else:
+                future = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+            # A vaga só é liberada quando a extração termina de fato, mesmo após timeout
+            self.pending += 1
+            EXTRACTION_PENDING.inc()
+            future.add_done_callback(self._release)
+            return await asyncio.wait_for(asyncio.shield(future), timeout=self.timeout_s)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            if executor is not None:
+                self._terminate(executor)
+            raise HTTPException(status_code=504, detail="Tempo limite da extração do arquivo excedido")
+        except BrokenProcessPool:
+            self._restart(executor)
+            raise HTTPException(status_code=503, detail="Falha no processo de extração, tente novamente")
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        """Um processo morreu (ex: OOM) e o pool inteiro fica inutilizável: recria uma vez."""
+        if self._executor is broken:
+            logger.error("Pool de extração quebrado; recriando")
+            self.stop()
+            self.start()
+
+    def _terminate(self, stuck: ProcessPoolExecutor) -> None:
+        """Mata os processos do pool com a extração travada e recria o pool."""
+        if self._executor is not stuck:
+            return
+        logger.error("Extração excedeu o tempo limite; encerrando os processos do pool")
+        # ProcessPoolExecutor não tem terminate público antes do Python 3.14
+        processes = list((getattr(stuck, "_processes", None) or {}).values())
+        self.stop()
+        for process in processes:
+            process.terminate()
+        self.start()
+
+    def _release(self, future: asyncio.Future) -> None:
+        self.pending -= 1
+        EXTRACTION_PENDING.dec()
+        if not future.cancelled():
+            # Evita o aviso de exceção não lida quando ninguém mais aguarda (timeout)
+            future.exception()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers if self._executor is not None else 0,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }
+
+
+extraction_pool = ExtractionPool(
+    workers=settings.EXTRACTION_WORKERS,
+    max_pending=settings.EXTRACTION_MAX_PENDING,
+    timeout_s=settings.EXTRACTION_TIMEOUT_S,
+    max_tasks_per_child=settings.EXTRACTION_MAX_TASKS_PER_CHILD,
+)
@@ -1,14 +1,21 @@
 import os
+import base64
+from typing import AsyncIterator
 from google.genai import Client
 from google.genai import types
 
+from roteamento_ia_backend.core.config import settings
+
 # 1. Carrega a chave da API Gemini/GenAI a partir do .env
 GENAI_API_KEY = os.getenv("GENAI_API_KEY")
 if not GENAI_API_KEY:
     raise RuntimeError("GENAI_API_KEY não definida em .env")
 
-# 2. Instancia o client singleton
-_client = Client(api_key=GENAI_API_KEY)
+# 2. Instancia o client singleton (o timeout vale para as chamadas sync e async)
+_client = Client(
+    api_key=GENAI_API_KEY,
+    http_options=types.HttpOptions(timeout=settings.GEMINI_TIMEOUT_MS),
+)
 
 class GeminiClient:
     def __init__(self, default_model: str = "gemini-2.0-flash"):
@@ -29,13 +36,77 @@ class GeminiClient:
             model=chosen_model,
             contents=[part],
         )
+        return _first_candidate(response)
+
+    async def agenerate(self, prompt: str, model: str = None) -> str:
+        """
+        Versão assíncrona de `generate`: usa o client nativo `aio` da lib,
+        sem bloquear o event loop durante a chamada ao provedor.
+        """
+        chosen_model = model or self.default_model
+        part = types.Part.from_text(text=prompt)
+
+        response = await self.client.aio.models.generate_content(
+            model=chosen_model,
+            contents=[part],
+        )
+        return _first_candidate(response)
+
+    async def agenerate_multimodal(self, text_prompt: str, image_data_uri: str, model: str = None) -> str:
+        """
+        Envia texto + imagem (data URI base64) ao modelo Gemini de forma assíncrona.
+        """
+        chosen_model = model or self.default_model
+
+        response = await self.client.aio.models.generate_content(
+            model=chosen_model,
+            contents=_multimodal_parts(text_prompt, image_data_uri),
+        )
+        return _first_candidate(response)
+
+    async def astream(self, prompt: str, model: str = None, image_data_uri: str = None) -> AsyncIterator[str]:
+        """
+        Gera a resposta em streaming, produzindo os trechos de texto à medida que chegam.
+        Se `image_data_uri` for informado, envia texto + imagem.
+        """
+        chosen_model = model or self.default_model
+        if image_data_uri:
+            contents = _multimodal_parts(prompt, image_data_uri)
+        else:
+            contents = [types.Part.from_text(text=prompt)]
+
+        stream = await self.client.aio.models.generate_content_stream(
+            model=chosen_model,
+            contents=contents,
+        )
+        async for chunk in stream:
+            text = getattr(chunk, "text", None)
+            if text:
+                yield text
+
+
+def _first_candidate(response):
+    # Extrai a primeira "candidate" gerada
+    candidates = getattr(response, "candidates", None)
+    if not candidates:
+        return ""
+
+    first = candidates[0]
+    # dependendo da versão da lib, o campo da resposta pode ser `.content` ou `.text`
+    return getattr(first, "content", None) or getattr(first, "text", "")
+
 
-        # Extrai a primeira "candidate" gerada
-        candidates = getattr(response, "candidates", None)
-        if not candidates:
-            return ""
+def _multimodal_parts(text_prompt: str, image_data_uri: str) -> list:
+    mime_type, data = _parse_data_uri(image_data_uri)
+    parts = []
+    if text_prompt:
+        parts.append(types.Part.from_text(text=text_prompt))
+    parts.append(types.Part.from_bytes(data=data, mime_type=mime_type))
+    return parts
 
-        first = candidates[0]
-        # dependendo da versão da lib, o campo da resposta pode ser `.content` ou `.text`
-        return getattr(first, "content", None) or getattr(first, "text", "")
 
+def _parse_data_uri(data_uri: str) -> tuple[str, bytes]:
+    """Separa um data URI (`data:<mime>;base64,<dados>`) em MIME type e bytes."""
+    header, _, encoded = data_uri.strip().partition(",")
+    mime_type = header[len("data:"):].split(";")[0] or "image/png"
+    return mime_type, base64.b64decode(encoded)
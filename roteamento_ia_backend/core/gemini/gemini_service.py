@@ -1,12 +1,13 @@
 from roteamento_ia_backend.core.gemini.gemini_client import GeminiClient
-from typing import Optional
+from roteamento_ia_backend.core.circuit_breaker import breakers, breaker_key, call_with_resilience
+from typing import AsyncIterator, Optional
 
-def generate_gemini_completion(
+async def generate_gemini_completion(
         prompt: str,
         model: str = "gemini-2.0-flash",
 ) -> str:
     """
-    Gera uma resposta usando o modelo Gemini.
+    Gera uma resposta usando o modelo Gemini, sem bloquear o event loop.
 
     Args:
         prompt (str): O prompt a ser enviado para o modelo.
@@ -31,7 +32,38 @@ def generate_gemini_completion(
         img_data = prompt[img_start:]
         
         # Generate with multi-modal content
-        return client.generate_multimodal(text_prompt, img_data, model)
+        return await call_with_resilience(
+            model, lambda: client.agenerate_multimodal(text_prompt, img_data, model)
+        )
     else:
-        # Standard text-only completion
-        return client.generate(prompt, model=model)
\ No newline at end of file
+        # Standard text-only completion (circuit breaker + timeout + retry com jitter)
+        return await call_with_resilience(model, lambda: client.agenerate(prompt, model=model))
+
+
+async def stream_gemini_completion(
+        prompt: str,
+        model: str = "gemini-2.0-flash",
+) -> AsyncIterator[str]:
+    """
+    Gera a resposta do modelo Gemini em streaming.
+
+    Args:
+        prompt (str): O prompt a ser enviado para o modelo.
+        model (str): O modelo a ser usado. Padrão é "gemini-2.0-flash".
+
+    Yields:
+        str: Trechos (tokens) da resposta.
+    """
+    client = GeminiClient()
+
+    if "data:image/" in prompt:
+        img_start = prompt.find("data:image/")
+        text_prompt = prompt[:img_start].strip() if img_start > 0 else ""
+        stream = client.astream(text_prompt, model=model, image_data_uri=prompt[img_start:])
+    else:
+        stream = client.astream(prompt, model=model)
+
+    # O stream não é repetido (trechos já enviados), mas conta para o circuit breaker
+    async with breakers.get(breaker_key(model)).track():
+        async for text in stream:
+            yield text
@@ -0,0 +1,57 @@
+import asyncio
+from typing import Awaitable, Callable, Optional, Tuple, TypeVar
+
+from roteamento_ia_backend.core.config import settings
+from roteamento_ia_backend.core.model_stats import model_stats
+from roteamento_ia_backend.core.rate_limit import provider_for_model
+
+T = TypeVar("T")
+
+
+def hedge_plan(ia_model: str) -> Optional[Tuple[str, float]]:
+    """
+    Decide se a chamada pode ser "hedged": retorna `(modelo secundário, atraso em s)`
+    ou None quando não há secundário configurado ou amostras suficientes de latência.
+    """
+    secondary = settings.HEDGE_SECONDARY_MODELS.get(ia_model) or \
+        settings.HEDGE_SECONDARY_MODELS.get(provider_for_model(ia_model))
+    if not secondary or secondary == ia_model:
+        return None
+    delay_ms = model_stats.percentile(ia_model, settings.HEDGE_PERCENTILE, settings.HEDGE_MIN_SAMPLES)
+    if delay_ms is None:
+        return None
+    return secondary, delay_ms / 1000
+
+
+async def hedged_call(
+    primary: Callable[[], Awaitable[T]],
+    secondary: Callable[[], Awaitable[T]],
+    delay_s: float,
+    is_success: Callable[[T], bool],
+) -> Tuple[T, bool, bool]:
+    """
+    Executa `primary`; se não responder em `delay_s`, dispara também `secondary`.
+    A primeira resposta bem-sucedida vence e a outra chamada é cancelada.
+
+    Returns:
+        Tuple[T, bool, bool]: (resultado, hedge disparado, resposta veio do secundário)
+    """
+    first = asyncio.ensure_future(primary())
+    done, _ = await asyncio.wait({first}, timeout=delay_s)
+    if done:
+        return first.result(), False, False
+
+    second = asyncio.ensure_future(secondary())
+    pending = {first, second}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # Prefere o primário quando ambos terminam juntos
+            for task in sorted(done, key=lambda t: t is not first):
+                if task.exception() is None and is_success(task.result()):
+                    return task.result(), True, task is second
+        # Nenhuma das duas teve sucesso: devolve o resultado (ou o erro) do primário
+        return first.result(), True, False
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,151 @@
+import asyncio
+import io
+import os
+import uuid
+from typing import List, Optional
+
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+
+from roteamento_ia_backend.core.config import settings
+from roteamento_ia_backend.core.logging import logger
+from roteamento_ia_backend.db.crud import claim_job, complete_job, fail_job, renew_job_lease
+from roteamento_ia_backend.db.blob_store import get_blob
+from roteamento_ia_backend.db.schemas import ExecutionIn, InputPayload
+
+
+async def _load_job_file(job_payload: dict) -> dict:
+    """Busca no blob store o arquivo referenciado pelo job (jobs antigos têm os bytes inline)."""
+    file_info = job_payload.get("file")
+    if not file_info or "data" in file_info:
+        return job_payload
+    data = await get_blob(file_info["blob"])
+    if data is None:
+        raise HTTPException(status_code=400, detail=f"Arquivo do job não encontrado no blob store ({file_info['blob']})")
+    return {**job_payload, "file": {**file_info, "data": data}}
+
+
+def _payload_from_job(job_payload: dict) -> ExecutionIn:
+    """Reconstrói o ExecutionIn a partir do payload serializado na fila (com os bytes do arquivo)."""
+    data = {
+        "prompt_id": job_payload["prompt_id"],
+        "ia_model": job_payload.get("ia_model"),
+        "variables": job_payload.get("variables", {}),
+    }
+    file_info = job_payload.get("file")
+    if file_info:
+        data["pages"] = job_payload.get("pages")
+        data["input_file"] = UploadFile(
+            file=io.BytesIO(file_info["data"]),
+            filename=file_info["file_name"],
+            headers=Headers({"content-type": file_info["mime_type"]}),
+        )
+    else:
+        data["input"] = InputPayload(type="text", data=job_payload["input_text"])
+    return ExecutionIn(**data)
+
+
+class JobWorkerPool:
+    """
+    Workers in-process que consomem a coleção `jobs`: reservam um job com lease,
+    renovam o lease enquanto executam e devolvem o job à fila em caso de erro.
+    """
+
+    def __init__(self, workers: int, poll_interval_s: float, lease_s: float):
+        self.workers = workers
+        self.poll_interval_s = poll_interval_s
+        self.lease_s = lease_s
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = asyncio.Event()
+        # Identifica o processo: vários workers do uvicorn compartilham a fila
+        self._prefix = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+    async def start(self) -> None:
+        self._stopping.clear()
+        self._tasks = [
+            asyncio.create_task(self._run(f"{self._prefix}-{i}"))
+            for i in range(self.workers)
+        ]
+        logger.info(f"{self.workers} workers de jobs iniciados")
+
+    async def stop(self) -> None:
+        """Para de reservar jobs; jobs em andamento são interrompidos e voltam à fila pelo lease."""
+        self._stopping.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self, worker_id: str) -> None:
+        while not self._stopping.is_set():
+            try:
+                job = await claim_job(worker_id, self.lease_s)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Erro ao reservar job ({worker_id}): {e}")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval_s)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._process(worker_id, job)
+
+    async def _process(self, worker_id: str, job: dict) -> None:
+        # Import tardio: o router de execução importa módulos do core
+        from roteamento_ia_backend.routers.execute import _execute_common
+
+        job_id = job["_id"]
+        if job["attempts"] > job["max_attempts"]:
+            await fail_job(job_id, worker_id, job.get("error") or "Número máximo de tentativas excedido", None)
+            return
+
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, worker_id))
+        try:
+            result = await _execute_common(_payload_from_job(await _load_job_file(job["payload"])))
+            if result.error:
+                # O provedor falhou (erro vira output): tenta de novo como qualquer erro transitório
+                retry_in_s = None
+                if job["attempts"] < job["max_attempts"]:
+                    retry_in_s = settings.JOB_RETRY_DELAY_S * job["attempts"]
+                logger.warning(f"Job {job_id}: falha do provedor na tentativa {job['attempts']}")
+                await fail_job(job_id, worker_id, str(result.output), retry_in_s, result.model_dump())
+                return
+            await complete_job(job_id, worker_id, result.model_dump())
+            logger.info(f"Job {job_id} concluído por {worker_id}")
+        except HTTPException as e:
+            # Erros de validação (prompt inexistente, variável faltando) não adiantam repetir;
+            # sobrecarga (503 do limitador) volta para a fila
+            retry_in_s = None
+            if e.status_code >= 500 and job["attempts"] < job["max_attempts"]:
+                retry_in_s = settings.JOB_RETRY_DELAY_S * job["attempts"]
+            await fail_job(job_id, worker_id, str(e.detail), retry_in_s)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Erro ao executar job {job_id}: {e}")
+            retry_in_s: Optional[float] = None
+            if job["attempts"] < job["max_attempts"]:
+                retry_in_s = settings.JOB_RETRY_DELAY_S * job["attempts"]
+            await fail_job(job_id, worker_id, str(e), retry_in_s)
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, job_id, worker_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.lease_s / 3)
+            try:
+                await renew_job_lease(job_id, worker_id, self.lease_s)
+            except Exception as e:
+                logger.warning(f"Falha ao renovar lease do job {job_id}: {e}")
+
+
+job_workers = JobWorkerPool(
+    workers=settings.JOB_WORKERS,
+    poll_interval_s=settings.JOB_POLL_INTERVAL_S,
+    lease_s=settings.JOB_LEASE_S,
+)
@@ -0,0 +1,151 @@
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+)
+from prometheus_client import multiprocess
+from pymongo import monitoring
+from starlette.requests import Request
+from starlette.responses import Response
+
+from roteamento_ia_backend.core.circuit_breaker import CircuitOpenError
+
+# Com vários workers do uvicorn, PROMETHEUS_MULTIPROC_DIR precisa estar definido
+# (e vazio) antes de subir os processos: cada worker grava suas métricas ali e o
+# /metrics agrega todos.
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+PROVIDER_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Latência das requests HTTP por rota (até o envio dos headers em respostas streaming)",
+    ["method", "route", "status"],
+)
+PROVIDER_LATENCY = Histogram(
+    "provider_call_duration_seconds",
+    "Latência das chamadas aos provedores de IA por modelo e resultado",
+    ["provider", "model", "status"],
+    buckets=PROVIDER_BUCKETS,
+)
+EXTRACTION_LATENCY = Histogram(
+    "file_extraction_duration_seconds",
+    "Tempo de extração de conteúdo de arquivos (PDF, OCR) por MIME type",
+    ["mime_type", "method"],
+)
+MONGO_LATENCY = Histogram(
+    "mongo_operation_duration_seconds",
+    "Latência dos comandos enviados ao MongoDB",
+    ["command", "collection", "status"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+EXECUTIONS_IN_FLIGHT = Gauge(
+    "executions_in_flight",
+    "Execuções em andamento (síncronas, streaming, lote e jobs)",
+    ["kind"],
+    multiprocess_mode="livesum",
+)
+EXTRACTION_CACHE_REQUESTS = Counter(
+    "file_extraction_cache_requests_total",
+    "Consultas ao cache de extração por resultado (memory, mongo ou miss)",
+    ["method", "result"],
+)
+EXTRACTION_CACHE_SAVED = Counter(
+    "file_extraction_cache_saved_seconds_total",
+    "Tempo de extração evitado pelos hits do cache (duração da extração original)",
+    ["method"],
+)
+EXTRACTION_PENDING = Gauge(
+    "file_extraction_pending",
+    "Extrações de arquivo na fila ou em execução no pool de processos",
+    multiprocess_mode="livesum",
+)
+
+IMAGE_BYTES = Counter(
+    "image_preprocess_bytes_total",
+    "Bytes das imagens de input antes (original) e depois (sent) do pré-processamento",
+    ["stage"],
+)
+
+
+def provider_status(exc: Exception) -> str:
+    """Classifica o resultado de uma chamada ao provedor para o label `status`."""
+    if isinstance(exc, CircuitOpenError):
+        return "circuit_open"
+    if isinstance(exc, asyncio.TimeoutError):
+        return "timeout"
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    if status == 429:
+        return "rate_limited"
+    return "error"
+
+
+def observe_provider_call(provider: str, model: str, status: str, seconds: float) -> None:
+    PROVIDER_LATENCY.labels(provider, model, status).observe(seconds)
+
+
+@contextmanager
+def track_extraction(mime_type: str, method: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        EXTRACTION_LATENCY.labels(mime_type or "unknown", method).observe(time.perf_counter() - start)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Mede todos os comandos do client Motor (find, insert, update, aggregate...)."""
+
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        collection = event.command.get(event.command_name)
+        self._collections[event.request_id] = collection if isinstance(collection, str) else ""
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._observe(event, "ok")
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._observe(event, "error")
+
+    def _observe(self, event, status: str) -> None:
+        collection = self._collections.pop(event.request_id, "")
+        # Comandos de handshake/monitoramento não interessam
+        if event.command_name in ("hello", "ismaster", "isMaster", "ping", "endSessions"):
+            return
+        MONGO_LATENCY.labels(event.command_name, collection, status).observe(event.duration_micros / 1e6)
+
+
+async def metrics_middleware(request: Request, call_next):
+    """Registra a latência por rota (template da rota, não a URL, para limitar a cardinalidade)."""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        if path != "/metrics":
+            REQUEST_LATENCY.labels(request.method, path, str(status)).observe(time.perf_counter() - start)
+
+
+def metrics_response() -> Response:
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+def mark_process_dead() -> None:
+    """No shutdown do worker: descarta os gauges `live*` deste processo."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,104 @@
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from roteamento_ia_backend.core.config import settings
+
+
+class ModelStats:
+    """
+    Estatísticas recentes de um modelo: janela deslizante com as latências das
+    chamadas bem-sucedidas e médias móveis exponenciais (EWMA) de latência e erro.
+    """
+
+    def __init__(self, window: int, alpha: float):
+        self.alpha = alpha
+        self.latencies_ms: Deque[int] = deque(maxlen=window)
+        self.ewma_latency_ms: Optional[float] = None
+        self.ewma_error_rate: float = 0.0
+        self.calls = 0
+        self.updated_at = time.monotonic()
+
+    def record(self, latency_ms: int, ok: bool) -> None:
+        self.calls += 1
+        self.updated_at = time.monotonic()
+        self.ewma_error_rate += self.alpha * ((0.0 if ok else 1.0) - self.ewma_error_rate)
+        if ok:
+            self.latencies_ms.append(latency_ms)
+            if self.ewma_latency_ms is None:
+                self.ewma_latency_ms = float(latency_ms)
+            else:
+                self.ewma_latency_ms += self.alpha * (latency_ms - self.ewma_latency_ms)
+
+    def record_cancelled(self, elapsed_ms: int) -> None:
+        """
+        Chamada cancelada (ex: o hedge venceu): o tempo decorrido é um limite
+        inferior da latência. Sem ele, justamente a cauda lenta sumiria da janela
+        e o percentil usado como atraso do hedge cairia a cada rodada.
+        """
+        self.updated_at = time.monotonic()
+        self.latencies_ms.append(elapsed_ms)
+        if self.ewma_latency_ms is not None and elapsed_ms > self.ewma_latency_ms:
+            self.ewma_latency_ms += self.alpha * (elapsed_ms - self.ewma_latency_ms)
+
+    def error_rate(self, half_life_s: float, now: Optional[float] = None) -> float:
+        """
+        Taxa de erro EWMA decaindo pela metade a cada `half_life_s` sem chamadas:
+        um modelo que falhou e deixou de ser escolhido volta a competir com o tempo.
+        """
+        if half_life_s <= 0:
+            return self.ewma_error_rate
+        idle = max((now if now is not None else time.monotonic()) - self.updated_at, 0.0)
+        return self.ewma_error_rate * 0.5 ** (idle / half_life_s)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.latencies_ms:
+            return None
+        ordered = sorted(self.latencies_ms)
+        index = min(int(round(p / 100 * (len(ordered) - 1))), len(ordered) - 1)
+        return float(ordered[index])
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "ewma_latency_ms": round(self.ewma_latency_ms, 1) if self.ewma_latency_ms is not None else None,
+            "ewma_error_rate": round(self.ewma_error_rate, 4),
+            "p50_latency_ms": self.percentile(50),
+            "p95_latency_ms": self.percentile(95),
+        }
+
+
+class ModelStatsRegistry:
+    """Estatísticas recentes por modelo, alimentadas a cada chamada ao provedor."""
+
+    def __init__(self, window: int, alpha: float = 0.2):
+        self.window = window
+        self.alpha = alpha
+        self._stats: Dict[str, ModelStats] = {}
+
+    def get(self, ia_model: str) -> ModelStats:
+        if ia_model not in self._stats:
+            self._stats[ia_model] = ModelStats(self.window, self.alpha)
+        return self._stats[ia_model]
+
+    def peek(self, ia_model: str) -> Optional[ModelStats]:
+        return self._stats.get(ia_model)
+
+    def record(self, ia_model: str, latency_ms: int, ok: bool) -> None:
+        self.get(ia_model).record(latency_ms, ok)
+
+    def record_cancelled(self, ia_model: str, elapsed_ms: int) -> None:
+        self.get(ia_model).record_cancelled(elapsed_ms)
+
+    def percentile(self, ia_model: str, p: float, min_samples: int = 1) -> Optional[float]:
+        """Percentil `p` da latência recente, ou None se houver menos de `min_samples` amostras."""
+        stats = self._stats.get(ia_model)
+        if stats is None or len(stats.latencies_ms) < min_samples:
+            return None
+        return stats.percentile(p)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {model: stats.snapshot() for model, stats in self._stats.items()}
+
+
+model_stats = ModelStatsRegistry(window=settings.MODEL_STATS_WINDOW, alpha=settings.MODEL_STATS_EWMA_ALPHA)
@@ -1,11 +1,60 @@
 import os
+from typing import Optional
+
+import httpx
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from roteamento_ia_backend.core.config import settings
 
 load_dotenv()
 
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    raise RuntimeError("OPENAI_API_KEY não definida em .env")
+# Client único por processo, criado no `lifespan` da aplicação
+client: Optional[AsyncOpenAI] = None
+
+
+async def init_openai_client() -> AsyncOpenAI:
+    """
+    Cria o client assíncrono da OpenAI com um pool de conexões keep-alive
+    compartilhado, evitando um handshake TLS por requisição.
+    """
+    global client
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY não definida em .env")
+
+    timeout = httpx.Timeout(
+        settings.OPENAI_TIMEOUT_S,
+        connect=settings.OPENAI_CONNECT_TIMEOUT_S,
+    )
+    http_client = DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=settings.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY_S,
+        ),
+        timeout=timeout,
+    )
+    client = AsyncOpenAI(
+        api_key=api_key,
+        http_client=http_client,
+        timeout=timeout,
+        max_retries=settings.OPENAI_MAX_RETRIES,
+    )
+    return client
+
+
+async def close_openai_client() -> None:
+    """Fecha o client e libera as conexões do pool."""
+    global client
+    if client is not None:
+        await client.close()
+        client = None
+
 
-client = OpenAI(api_key=api_key)
\ No newline at end of file
+def get_openai_client() -> AsyncOpenAI:
+    """Retorna o client compartilhado; falha se o `lifespan` ainda não o criou."""
+    if client is None:
+        raise RuntimeError("Client OpenAI não inicializado (lifespan da aplicação não executado)")
+    return client
@@ -1,16 +1,46 @@
-import os
-from openai import OpenAI
-from dotenv import load_dotenv
+from typing import AsyncIterator, List, Dict, Any
 
-# Carrega as variáveis de ambiente do arquivo .env
-load_dotenv()
+from roteamento_ia_backend.core.openai.openai_client import get_openai_client
+from roteamento_ia_backend.core.circuit_breaker import breakers, breaker_key, call_with_resilience
+from roteamento_ia_backend.core.logging import logger
 
-# Inicializa o cliente OpenAI com a chave da API
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    raise RuntimeError("OPENAI_API_KEY não definida em .env")
+SYSTEM_MESSAGE = {"role": "system", "content": "Você é um assistente útil e conciso."}
+VISION_MODELS = ["gpt-4-vision", "gpt-4-turbo", "gpt-4o"]
+
+
+def _build_messages(prompt: str, model: str) -> List[Dict[str, Any]]:
+    """
+    Monta as mensagens do chat a partir do prompt final, separando
+    a imagem (data URI) quando houver.
+    """
+    # Check if prompt contains an image
+    if "data:image/" in prompt:
+        img_start = prompt.find("data:image/")
+
+        # For vision-capable models (e.g., gpt-4-vision)
+        if model.lower() in VISION_MODELS:
+            # Extract parts - text prompt and image
+            text_prompt = prompt[:img_start].strip() if img_start > 0 else ""
+            img_data = prompt[img_start:]
+
+            # Create messages with content array
+            return [
+                SYSTEM_MESSAGE,
+                {"role": "user", "content": [
+                    {"type": "text", "text": text_prompt},
+                    {"type": "image_url", "image_url": {"url": img_data}}
+                ]}
+            ]
+
+        # Fallback for non-vision models
+        # Remove the image data and add a note
+        text_prompt = prompt[:img_start].strip() if img_start > 0 else prompt
+        text_prompt += "\n[Note: Image processing is only available with GPT-4-Vision, GPT-4-Turbo, or GPT-4o]"
+        return [SYSTEM_MESSAGE, {"role": "user", "content": text_prompt}]
+
+    # Standard text-only completion
+    return [SYSTEM_MESSAGE, {"role": "user", "content": prompt}]
 
-client = OpenAI(api_key=api_key)
 
 async def generate_openai_completion(prompt: str, model: str = "gpt-3.5-turbo") -> str:
     """
@@ -23,61 +53,56 @@ async def generate_openai_completion(prompt: str, model: str = "gpt-3.5-turbo")
     Returns:
         str: A resposta gerada pelo modelo.
     """
+    # Client assíncrono compartilhado (pool de conexões criado no lifespan)
+    client = get_openai_client()
+
+    try:
+        # Circuit breaker + timeout + retry com jitter por modelo
+        response = await call_with_resilience(model, lambda: client.chat.completions.create(
+            model=model,
+            messages=_build_messages(prompt, model),
+            temperature=0.7,
+            max_tokens=1000,
+        ))
+
+        # Extract the text of the response
+        return response.choices[0].message.content
+    except Exception as e:
+        # Propaga o erro para que o chamador registre a falha (e não a trate como resposta)
+        logger.error(f"Erro ao chamar OpenAI API: {e}")
+        raise
+
+
+async def stream_openai_completion(prompt: str, model: str = "gpt-3.5-turbo") -> AsyncIterator[str]:
+    """
+    Gera a resposta do modelo OpenAI em streaming, produzindo os trechos
+    de texto à medida que chegam.
+
+    Args:
+        prompt (str): O prompt a ser enviado para o modelo.
+        model (str): O modelo a ser usado. Padrão é "gpt-3.5-turbo".
+
+    Yields:
+        str: Trechos (tokens) da resposta.
+    """
+    client = get_openai_client()
+
     try:
-        # Check if prompt contains an image
-        if "data:image/" in prompt:
-            # For vision-capable models (e.g., gpt-4-vision)
-            if model.lower() in ["gpt-4-vision", "gpt-4-turbo", "gpt-4o"]:
-                # Extract parts - text prompt and image
-                img_start = prompt.find("data:image/")
-                text_prompt = prompt[:img_start].strip() if img_start > 0 else ""
-                img_data = prompt[img_start:]
-                
-                # Create messages with content array
-                messages = [
-                    {"role": "system", "content": "Você é um assistente útil e conciso."},
-                    {"role": "user", "content": [
-                        {"type": "text", "text": text_prompt},
-                        {"type": "image_url", "image_url": {"url": img_data}}
-                    ]}
-                ]
-                
-                response = await client.chat.completions.create(
-                    model=model,
-                    messages=messages,
-                    temperature=0.7,
-                    max_tokens=1000,
-                )
-            else:
-                # Fallback for non-vision models
-                # Remove the image data and add a note
-                img_start = prompt.find("data:image/")
-                text_prompt = prompt[:img_start].strip() if img_start > 0 else prompt
-                text_prompt += "\n[Note: Image processing is only available with GPT-4-Vision, GPT-4-Turbo, or GPT-4o]"
-                
-                response = await client.chat.completions.create(
-                    model=model,
-                    messages=[
-                        {"role": "system", "content": "Você é um assistente útil e conciso."},
-                        {"role": "user", "content": text_prompt}
-                    ],
-                    temperature=0.7,
-                    max_tokens=1000,
-                )
-        else:
-            # Standard text-only completion
-            response = await client.chat.completions.create(
+        # O stream não é repetido (trechos já enviados), mas conta para o circuit breaker
+        async with breakers.get(breaker_key(model)).track():
+            stream = await client.chat.completions.create(
                 model=model,
-                messages=[
-                    {"role": "system", "content": "Você é um assistente útil e conciso."},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=_build_messages(prompt, model),
                 temperature=0.7,
                 max_tokens=1000,
+                stream=True,
             )
-        
-        # Extract the text of the response
-        return response.choices[0].message.content
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    yield text
     except Exception as e:
-        print(f"Erro ao chamar OpenAI API: {e}")
-        return f"Erro ao gerar resposta: {str(e)}"
\ No newline at end of file
+        logger.error(f"Erro no streaming da OpenAI API: {e}")
+        raise
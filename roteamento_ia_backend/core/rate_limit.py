@@ -0,0 +1,235 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from roteamento_ia_backend.core.config import settings
+from roteamento_ia_backend.core.logging import logger
+
+
+class RateLimitTimeout(Exception):
+    """O chamador esperou mais que o máximo permitido por uma vaga no limitador."""
+
+    def __init__(self, key: str, retry_after_s: float):
+        self.key = key
+        self.retry_after_s = retry_after_s
+        super().__init__(f"Limite de requisições para {key} excedido; tente novamente em {retry_after_s:.1f}s")
+
+
+def provider_for_model(ia_model: str) -> str:
+    """Provedor responsável pelo modelo (mesma regra de `_select_model_fn`)."""
+    return "openai" if ia_model.lower().startswith("gpt") else "gemini"
+
+
+def estimate_tokens(prompt: str, max_output_tokens: int = 1000) -> int:
+    """
+    Estimativa grosseira de tokens (≈ 4 caracteres por token) usada pelo balde de
+    tokens/min. Imagens em data URI contam como um valor fixo, não pelo tamanho do base64.
+    """
+    img_start = prompt.find("data:image/")
+    if img_start >= 0:
+        return img_start // 4 + settings.RATE_LIMIT_IMAGE_TOKENS + max_output_tokens
+    return len(prompt) // 4 + max_output_tokens
+
+
+def rate_limit_retry_after(exc: Exception) -> Optional[float]:
+    """
+    Se a exceção for um 429 do provedor, retorna o Retry-After em segundos
+    (0.0 quando o header não vem); caso contrário, None.
+    """
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    if status != 429:
+        return None
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class TokenBucket:
+    """
+    Balde de tokens com taxa adaptativa (AIMD): a taxa cai pela metade a cada 429
+    e volta a subir aos poucos, até a taxa configurada, a cada sucesso.
+    """
+
+    def __init__(self, per_minute: float):
+        self.base_rate = per_minute / 60.0
+        self.rate = self.base_rate
+        self.capacity = max(per_minute / 60.0 * settings.RATE_LIMIT_BURST_S, 1.0)
+        self.tokens = self.capacity
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Segundos até `amount` tokens estarem disponíveis (0 se já estão)."""
+        now = time.monotonic()
+        self._refill(now)
+        blocked = max(self.blocked_until - now, 0.0)
+        # Pedidos maiores que a capacidade passam quando o balde estiver cheio
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return blocked
+        return max(blocked, (amount - self.tokens) / self.rate)
+
+    def consume(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+    def penalize(self, retry_after_s: float) -> None:
+        self.rate = max(self.rate * settings.RATE_LIMIT_DECREASE_FACTOR, self.base_rate * settings.RATE_LIMIT_MIN_FRACTION)
+        self.tokens = 0.0
+        if retry_after_s:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after_s)
+
+    def reward(self) -> None:
+        self.rate = min(self.base_rate, self.rate + self.base_rate * settings.RATE_LIMIT_RECOVERY_STEP)
+
+    def snapshot(self) -> Dict[str, Any]:
+        self._refill(time.monotonic())
+        return {
+            "configured_per_min": round(self.base_rate * 60, 2),
+            "current_per_min": round(self.rate * 60, 2),
+            "available": round(self.tokens, 2),
+            "blocked_for_s": round(max(self.blocked_until - time.monotonic(), 0.0), 2),
+        }
+
+
+class Limiter:
+    """Limite de concorrência + baldes de requisições/min e tokens/min para uma chave."""
+
+    def __init__(self, key: str, concurrency: Optional[int], rpm: Optional[float], tpm: Optional[float]):
+        self.key = key
+        self.concurrency = int(concurrency) if concurrency else None
+        self._semaphore = asyncio.Semaphore(self.concurrency) if self.concurrency else None
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.in_flight = 0
+        self.waiting = 0
+
+    async def acquire_rate(self, tokens: int, deadline: float) -> None:
+        while True:
+            waits = [0.0]
+            if self.requests:
+                waits.append(self.requests.wait_time(1))
+            if self.tokens:
+                waits.append(self.tokens.wait_time(tokens))
+            wait = max(waits)
+            if wait <= 0:
+                if self.requests:
+                    self.requests.consume(1)
+                if self.tokens:
+                    self.tokens.consume(tokens)
+                return
+            if time.monotonic() + wait > deadline:
+                raise RateLimitTimeout(self.key, wait)
+            await asyncio.sleep(wait)
+
+    async def acquire_slot(self, deadline: float) -> None:
+        if not self._semaphore:
+            return
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=max(deadline - time.monotonic(), 0.0))
+        except asyncio.TimeoutError:
+            raise RateLimitTimeout(self.key, 1.0)
+
+    def release_slot(self) -> None:
+        if self._semaphore:
+            self._semaphore.release()
+
+    def on_success(self) -> None:
+        for bucket in (self.requests, self.tokens):
+            if bucket:
+                bucket.reward()
+
+    def on_rate_limited(self, retry_after_s: float) -> None:
+        for bucket in (self.requests, self.tokens):
+            if bucket:
+                bucket.penalize(retry_after_s)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "requests": self.requests.snapshot() if self.requests else None,
+            "tokens": self.tokens.snapshot() if self.tokens else None,
+        }
+
+
+class RateLimiterRegistry:
+    """
+    Limitadores por provedor ("openai", "gemini") e por modelo, configurados em
+    `settings.RATE_LIMITS`. Uma chamada precisa de vaga em ambos.
+    """
+
+    def __init__(self, config: Dict[str, Dict[str, float]], max_wait_s: float):
+        self.config = config
+        self.max_wait_s = max_wait_s
+        self._limiters: Dict[str, Limiter] = {}
+
+    def _get(self, key: str) -> Optional[Limiter]:
+        if key not in self.config:
+            return None
+        if key not in self._limiters:
+            cfg = self.config[key]
+            self._limiters[key] = Limiter(key, cfg.get("concurrency"), cfg.get("rpm"), cfg.get("tpm"))
+        return self._limiters[key]
+
+    def limiters_for(self, ia_model: str) -> List[Limiter]:
+        keys = [provider_for_model(ia_model), ia_model]
+        return [lim for lim in (self._get(k) for k in keys) if lim is not None]
+
+    @asynccontextmanager
+    async def limit(self, ia_model: str, tokens: int) -> AsyncIterator[None]:
+        """
+        Aguarda (até `max_wait_s`) vaga de concorrência e saldo nos baldes.
+        Levanta RateLimitTimeout se a espera passar do máximo.
+        """
+        limiters = self.limiters_for(ia_model)
+        deadline = time.monotonic() + self.max_wait_s
+        acquired: List[Limiter] = []
+        for lim in limiters:
+            lim.waiting += 1
+        try:
+            for lim in limiters:
+                await lim.acquire_slot(deadline)
+                acquired.append(lim)
+            for lim in limiters:
+                await lim.acquire_rate(tokens, deadline)
+        except BaseException:
+            for lim in acquired:
+                lim.release_slot()
+            raise
+        finally:
+            for lim in limiters:
+                lim.waiting -= 1
+
+        for lim in limiters:
+            lim.in_flight += 1
+        try:
+            yield
+        finally:
+            for lim in limiters:
+                lim.in_flight -= 1
+                lim.release_slot()
+
+    def record_result(self, ia_model: str, exc: Optional[Exception] = None) -> None:
+        """Ajusta as taxas: penaliza em 429/Retry-After, recupera aos poucos em sucesso."""
+        retry_after = rate_limit_retry_after(exc) if exc is not None else None
+        for lim in self.limiters_for(ia_model):
+            if retry_after is not None:
+                lim.on_rate_limited(retry_after)
+            elif exc is None:
+                lim.on_success()
+        if retry_after is not None:
+            logger.warning(f"429 do provedor para {ia_model}; taxa reduzida (Retry-After={retry_after}s)")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {key: self._get(key).snapshot() for key in self.config}
+
+
+rate_limiter = RateLimiterRegistry(settings.RATE_LIMITS, settings.RATE_LIMIT_MAX_WAIT_S)
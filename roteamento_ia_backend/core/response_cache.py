@@ -0,0 +1,106 @@
+import hashlib
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from roteamento_ia_backend.core.config import settings
+from roteamento_ia_backend.core.logging import logger
+from roteamento_ia_backend.db.crud import get_cached_response, set_cached_response
+
+
+class LRUCache:
+    """
+    Cache LRU em memória com limite de entradas e expiração por TTL.
+    Não é thread-safe: é usado apenas a partir do event loop.
+    """
+
+    def __init__(self, max_entries: int, ttl_s: float):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl_s, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def pop(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def make_cache_key(prompt_id: str, rendered: str, input_content: Any, ia_model: str) -> str:
+    """
+    Monta a chave do cache: prompt, template renderizado, hash do input e modelo.
+    O input entra apenas como hash, pois pode ser um data URI de vários MB.
+    """
+    input_hash = hashlib.sha256(str(input_content).encode("utf-8")).hexdigest()
+    raw = "\x1f".join([prompt_id, ia_model, input_hash, rendered])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Cache de respostas do /execute em dois níveis:
+    LRU em memória (por worker) e coleção Mongo com índice TTL (compartilhada).
+    """
+
+    def __init__(self, max_entries: int, ttl_s: float, use_mongo: bool):
+        self.memory = LRUCache(max_entries, ttl_s)
+        self.ttl_s = ttl_s
+        self.use_mongo = use_mongo
+
+    async def get(self, key: str) -> Optional[Tuple[Dict[str, Any], str]]:
+        """Retorna `(entrada, tier)` ou None; falhas no Mongo contam como miss."""
+        entry = self.memory.get(key)
+        if entry is not None:
+            return entry, "memory"
+
+        if not self.use_mongo:
+            return None
+        try:
+            entry = await get_cached_response(key)
+        except Exception as e:
+            logger.warning(f"Falha ao consultar cache de respostas no Mongo: {e}")
+            return None
+        if entry is None:
+            return None
+
+        # Promove para o nível em memória
+        self.memory.set(key, entry)
+        return entry, "mongo"
+
+    async def set(self, key: str, entry: Dict[str, Any]) -> None:
+        self.memory.set(key, entry)
+        if not self.use_mongo:
+            return
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl_s)
+        try:
+            await set_cached_response(key, entry, expires_at)
+        except Exception as e:
+            logger.warning(f"Falha ao gravar cache de respostas no Mongo: {e}")
+
+
+response_cache = ResponseCache(
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl_s=settings.RESPONSE_CACHE_TTL_S,
+    use_mongo=settings.RESPONSE_CACHE_MONGO_ENABLED,
+)
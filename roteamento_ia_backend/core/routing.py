@@ -0,0 +1,111 @@
+import random
+from typing import Any, Dict, List, Optional
+
+from roteamento_ia_backend.core.config import settings
+from roteamento_ia_backend.core.model_stats import ModelStatsRegistry, model_stats
+
+
+def estimate_cost(ia_model: str, input_tokens: int, output_tokens: int) -> Optional[float]:
+    """Custo estimado (USD) a partir da tabela `MODEL_COSTS` (preço por 1k tokens)."""
+    prices = settings.MODEL_COSTS.get(ia_model)
+    if prices is None:
+        return None
+    return (input_tokens * prices.get("input", 0.0) + output_tokens * prices.get("output", 0.0)) / 1000
+
+
+class ModelRouter:
+    """
+    Resolve o modelo pedido pelo chamador. Nomes de modelo concretos passam direto;
+    classes ("fast", "cheap", "vision"...) escolhem, entre os candidatos da classe,
+    o de menor score combinando latência EWMA, custo estimado e taxa de erro recentes.
+
+    A taxa de erro decai com o tempo sem chamadas (`error_half_life_s`) e, com
+    probabilidade `explore_probability`, outro candidato é escolhido no lugar do
+    melhor: modelos penalizados ou sem histórico voltam a gerar estatísticas.
+    """
+
+    def __init__(
+        self,
+        classes: Dict[str, Dict[str, Any]],
+        stats: ModelStatsRegistry,
+        error_half_life_s: float = 0.0,
+        explore_probability: float = 0.0,
+    ):
+        self.classes = classes
+        self.stats = stats
+        self.error_half_life_s = error_half_life_s
+        self.explore_probability = explore_probability
+
+    def route(self, requested: str, input_tokens: int, needs_vision: bool = False) -> Dict[str, Any]:
+        """
+        Returns:
+            Dict: a decisão de roteamento — `model` escolhido, `requested`, `route_class`,
+            `reason` e os `candidates` avaliados (com as métricas usadas no score).
+        """
+        route_class = self.classes.get(requested)
+        if route_class is None:
+            return {
+                "requested": requested,
+                "model": requested,
+                "route_class": None,
+                "reason": "explicit",
+                "candidates": [],
+            }
+
+        models: List[str] = list(route_class["models"])
+        if needs_vision:
+            vision = set(self.classes.get("vision", {}).get("models", []))
+            models = [m for m in models if m in vision] or models
+
+        output_tokens = settings.ROUTING_EXPECTED_OUTPUT_TOKENS
+        candidates = []
+        for model in models:
+            stats = self.stats.peek(model)
+            latency = stats.ewma_latency_ms if stats and stats.ewma_latency_ms is not None else None
+            candidates.append({
+                "model": model,
+                "ewma_latency_ms": latency,
+                "error_rate": round(stats.error_rate(self.error_half_life_s), 4) if stats else 0.0,
+                "estimated_cost": estimate_cost(model, input_tokens, output_tokens),
+            })
+
+        # Modelos sem histórico assumem a latência padrão (e entram pela exploração)
+        latencies = [c["ewma_latency_ms"] or settings.ROUTING_DEFAULT_LATENCY_MS for c in candidates]
+        costs = [c["estimated_cost"] or 0.0 for c in candidates]
+        max_latency = max(latencies) or 1.0
+        max_cost = max(costs) or 1.0
+
+        latency_weight = route_class.get("latency_weight", 1.0)
+        cost_weight = route_class.get("cost_weight", 0.0)
+        for candidate, latency, cost in zip(candidates, latencies, costs):
+            candidate["score"] = round(
+                latency_weight * latency / max_latency
+                + cost_weight * cost / max_cost
+                + settings.ROUTING_ERROR_PENALTY * candidate["error_rate"],
+                4,
+            )
+
+        best = min(candidates, key=lambda c: c["score"])
+        reason = f"menor score (latência x{latency_weight}, custo x{cost_weight}, erro x{settings.ROUTING_ERROR_PENALTY})"
+        others = [c for c in candidates if c is not best]
+        if others and random.random() < self.explore_probability:
+            best = random.choice(others)
+            reason = "exploração"
+        return {
+            "requested": requested,
+            "model": best["model"],
+            "route_class": requested,
+            "reason": reason,
+            "candidates": candidates,
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"classes": self.classes, "costs": settings.MODEL_COSTS, "stats": self.stats.snapshot()}
+
+
+model_router = ModelRouter(
+    settings.ROUTING_CLASSES,
+    model_stats,
+    error_half_life_s=settings.ROUTING_ERROR_HALF_LIFE_S,
+    explore_probability=settings.ROUTING_EXPLORE_PROBABILITY,
+)
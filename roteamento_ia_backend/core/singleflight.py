@@ -0,0 +1,44 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class SingleFlight:
+    """
+    Agrupa chamadas concorrentes com a mesma chave: apenas a primeira executa,
+    as demais aguardam o mesmo resultado (ou a mesma exceção).
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Executa `fn` uma única vez por chave em andamento.
+
+        Returns:
+            Tuple[Any, bool]: (resultado, compartilhado) — `compartilhado` é True
+            quando o chamador reaproveitou uma chamada já em andamento.
+        """
+        task = self._calls.get(key)
+        shared = task is not None
+        if not shared:
+            # A chamada roda numa task própria: se o chamador que a iniciou for
+            # cancelado (cliente desconectou), os demais continuam aguardando
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+
+        return await asyncio.shield(task), shared
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Evita o aviso "exception was never retrieved" quando todos desistiram
+        if not task.cancelled():
+            task.exception()
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+
+inflight_executions = SingleFlight()
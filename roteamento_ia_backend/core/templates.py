@@ -0,0 +1,156 @@
+import string
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from roteamento_ia_backend.core.config import settings
+
+_formatter = string.Formatter()
+
+
+class TemplateError(ValueError):
+    """Template inválido ou incompatível com as variáveis declaradas."""
+
+
+class MissingVariablesError(KeyError):
+    """Variáveis do template não informadas na execução (todas de uma vez)."""
+
+    def __init__(self, missing: List[str], extra: List[str]):
+        self.missing = missing
+        self.extra = extra
+        super().__init__(", ".join(missing))
+
+    def __str__(self) -> str:
+        if len(self.missing) == 1:
+            msg = f"Variável '{self.missing[0]}' mencionada no template, mas não fornecida nos parâmetros"
+        else:
+            msg = f"Variáveis {', '.join(self.missing)} mencionadas no template, mas não fornecidas nos parâmetros"
+        if self.extra:
+            msg += f" (informadas e não usadas: {', '.join(self.extra)})"
+        return msg
+
+
+def _root_name(field_name: str) -> str:
+    """`user.name` e `items[0]` dependem da variável `user`/`items`."""
+    for i, ch in enumerate(field_name):
+        if ch in ".[":
+            return field_name[:i]
+    return field_name
+
+
+class CompiledTemplate:
+    """
+    Template já analisado: trechos literais intercalados com campos. Renderizar
+    é só concatenar, sem reprocessar a string a cada execução.
+    """
+
+    def __init__(self, template: str):
+        self.template = template
+        # (literal, campo, conversão, format_spec) — campo None no trecho final
+        self._parts: List[Tuple[str, Optional[str], Optional[str], str]] = []
+        # Format spec com campos aninhados ({x:{largura}}) usa o format() padrão
+        self._nested = False
+        names: List[str] = []
+        try:
+            for literal, field, spec, conversion in _formatter.parse(template):
+                if field is not None:
+                    root = _root_name(field)
+                    if not root or root.isdigit():
+                        raise TemplateError(f"Campos posicionais não são suportados no template: '{{{field}}}'")
+                    if root not in names:
+                        names.append(root)
+                    if spec and "{" in spec:
+                        self._nested = True
+                        for _, inner, _, _ in _formatter.parse(spec):
+                            if inner and _root_name(inner) not in names:
+                                names.append(_root_name(inner))
+                self._parts.append((literal, field, conversion, spec or ""))
+        except ValueError as e:
+            if isinstance(e, TemplateError):
+                raise
+            raise TemplateError(f"Template inválido: {e}")
+        self.variables = names
+
+    def check(self, declared: Iterable[str]) -> None:
+        """Levanta TemplateError se placeholders e variáveis declaradas divergirem."""
+        declared = list(declared)
+        undeclared = [v for v in self.variables if v not in declared]
+        unused = [v for v in declared if v not in self.variables]
+        problems = []
+        if undeclared:
+            problems.append(f"placeholders não declarados em `variables`: {', '.join(undeclared)}")
+        if unused:
+            problems.append(f"variáveis declaradas e não usadas no template: {', '.join(unused)}")
+        if problems:
+            raise TemplateError("; ".join(problems))
+
+    def render(self, values: Dict[str, Any]) -> str:
+        """
+        Substitui os campos pelos valores. Levanta MissingVariablesError
+        listando todas as variáveis faltantes (e as informadas sem uso).
+        """
+        missing = [v for v in self.variables if v not in values]
+        if missing:
+            extra = [k for k in values if k not in self.variables]
+            raise MissingVariablesError(missing, extra)
+        if self._nested:
+            return self.template.format(**values)
+
+        out = []
+        for literal, field, conversion, spec in self._parts:
+            out.append(literal)
+            if field is None:
+                continue
+            if field in values:
+                obj = values[field]
+            else:
+                obj, _ = _formatter.get_field(field, (), values)
+            if conversion:
+                obj = _formatter.convert_field(obj, conversion)
+            out.append(format(obj, spec) if spec else str(obj))
+        return "".join(out)
+
+
+def compile_template(template: str, declared: Optional[Iterable[str]] = None) -> CompiledTemplate:
+    """Compila o template e, se informado, confere os placeholders com `declared`."""
+    compiled = CompiledTemplate(template)
+    if declared is not None:
+        compiled.check(declared)
+    return compiled
+
+
+class TemplateCache:
+    """Templates compilados por (prompt_id, versão), com limite de entradas (LRU)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Tuple[str, int], CompiledTemplate]" = OrderedDict()
+
+    def get(self, prompt_id: str, version: int, template: str) -> CompiledTemplate:
+        key = (str(prompt_id), version)
+        compiled = self._data.get(key)
+        # Confere o texto: um documento alterado por fora da API não reaproveita o compilado
+        if compiled is not None and compiled.template == template:
+            self._data.move_to_end(key)
+            return compiled
+        compiled = CompiledTemplate(template)
+        self.put(prompt_id, version, compiled)
+        return compiled
+
+    def put(self, prompt_id: str, version: int, compiled: CompiledTemplate) -> None:
+        self._data[(str(prompt_id), version)] = compiled
+        self._data.move_to_end((str(prompt_id), version))
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def forget(self, prompt_id: str) -> None:
+        for key in [k for k in self._data if k[0] == str(prompt_id)]:
+            del self._data[key]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+template_cache = TemplateCache(settings.TEMPLATE_CACHE_MAX_ENTRIES)
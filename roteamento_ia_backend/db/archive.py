@@ -0,0 +1,227 @@
+import asyncio
+import gzip
+import os
+import re
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+from bson import ObjectId, json_util
+from pymongo.errors import BulkWriteError
+
+from roteamento_ia_backend.core.config import settings
+from roteamento_ia_backend.core.logging import logger
+from roteamento_ia_backend.db.mongo import db
+
+_SAFE_NAME = re.compile(r"^[A-Za-z0-9_-]+$")
+# Datas lidas do arquivo voltam com fuso (UTC), comparáveis com as janelas da API
+_JSON_OPTIONS = json_util.RELAXED_JSON_OPTIONS.with_options(tz_aware=True, tzinfo=timezone.utc)
+
+
+def execution_time(doc: dict) -> datetime:
+    """Horário da execução: `created_at` ou, em documentos antigos, o embutido no `_id`."""
+    ts = doc.get("created_at")
+    if isinstance(ts, datetime):
+        return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+    oid = doc.get("_id")
+    if isinstance(oid, ObjectId):
+        return oid.generation_time
+    return datetime.now(timezone.utc)
+
+
+def _utc(ts: Optional[datetime]) -> Optional[datetime]:
+    if ts is None:
+        return None
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+class ExecutionArchive:
+    """
+    Retenção das execuções em dois níveis: os últimos `hot_days` dias ficam no
+    MongoDB; as mais antigas são movidas para arquivos JSONL comprimidos em
+    `root/AAAA-MM-DD/<prompt_id>.jsonl.gz` e apagadas da coleção.
+
+    Cada lote arquivado é anexado ao arquivo como um membro gzip completo (e
+    sincronizado em disco antes do delete). Se o processo cair entre a escrita
+    e o delete, o lote é arquivado de novo no ciclo seguinte; a leitura descarta
+    os `_id` repetidos.
+    """
+
+    def __init__(self, root: str, hot_days: int, batch_size: int):
+        self.root = root
+        self.hot_days = hot_days
+        self.batch_size = batch_size
+        self.archived = 0
+        self.last_run: Optional[datetime] = None
+
+    # --- arquivos ---
+
+    def _partition_path(self, day: date, prompt_id: str) -> str:
+        # prompt_id vira nome de arquivo: só caracteres seguros (ObjectId em hex)
+        name = prompt_id if _SAFE_NAME.match(prompt_id) else "_invalid"
+        return os.path.join(self.root, day.isoformat(), f"{name}.jsonl.gz")
+
+    def _write_partitions(self, groups: Dict[str, List[dict]]) -> None:
+        for path, docs in groups.items():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            payload = "".join(json_util.dumps(d, json_options=_JSON_OPTIONS) + "\n" for d in docs).encode("utf-8")
+            with open(path, "ab") as f:
+                f.write(gzip.compress(payload))
+                f.flush()
+                os.fsync(f.fileno())
+
+    def partitions(
+        self,
+        prompt_id: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        """Arquivos existentes (dia × prompt) que podem conter execuções de [since, until)."""
+        since, until = _utc(since), _utc(until)
+        if not os.path.isdir(self.root):
+            return []
+        out = []
+        for day_dir in sorted(os.listdir(self.root)):
+            try:
+                day = date.fromisoformat(day_dir)
+            except ValueError:
+                continue
+            if since and day < since.date():
+                continue
+            if until and day > until.date():
+                continue
+            for file_name in sorted(os.listdir(os.path.join(self.root, day_dir))):
+                if not file_name.endswith(".jsonl.gz"):
+                    continue
+                pid = file_name[: -len(".jsonl.gz")]
+                if prompt_id and pid != prompt_id:
+                    continue
+                path = os.path.join(self.root, day_dir, file_name)
+                out.append({"day": day, "prompt_id": pid, "path": path, "size_bytes": os.path.getsize(path)})
+        return out
+
+    def iter_archived(
+        self,
+        prompt_id: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        ia_model: Optional[str] = None,
+    ) -> Iterator[dict]:
+        """
+        Lê as execuções arquivadas, um arquivo por vez (leitura bloqueante:
+        chame fora do event loop). A memória fica limitada a um arquivo (dia × prompt).
+        """
+        since, until = _utc(since), _utc(until)
+        for part in self.partitions(prompt_id, since, until):
+            seen = set()
+            with gzip.open(part["path"], "rt", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    doc = json_util.loads(line, json_options=_JSON_OPTIONS)
+                    if doc["_id"] in seen:
+                        continue
+                    seen.add(doc["_id"])
+                    ts = execution_time(doc)
+                    if (since and ts < since) or (until and ts >= until):
+                        continue
+                    if ia_model and doc.get("ia_model") != ia_model:
+                        continue
+                    yield doc
+
+    # --- MongoDB ---
+
+    async def archive_once(self, now: Optional[datetime] = None) -> int:
+        """Move para disco as execuções fora da janela quente; retorna quantas saíram do MongoDB."""
+        now = now or datetime.now(timezone.utc)
+        cutoff = ObjectId.from_datetime(now - timedelta(days=self.hot_days))
+        # Execuções restauradas já estão no arquivo: saem pelo índice TTL de `restored_at`
+        query = {"_id": {"$lt": cutoff}, "restored_at": {"$exists": False}}
+        total = 0
+        while True:
+            docs = await db.executions.find(query).sort("_id", 1).limit(self.batch_size).to_list(length=self.batch_size)
+            if not docs:
+                break
+            groups: Dict[str, List[dict]] = defaultdict(list)
+            for doc in docs:
+                path = self._partition_path(execution_time(doc).date(), str(doc.get("prompt_id")))
+                groups[path].append(doc)
+            await asyncio.to_thread(self._write_partitions, groups)
+            res = await db.executions.delete_many({"_id": {"$in": [d["_id"] for d in docs]}})
+            total += res.deleted_count
+            if len(docs) < self.batch_size:
+                break
+        self.archived += total
+        self.last_run = now
+        if total:
+            logger.info(f"{total} execuções arquivadas em {self.root}")
+        return total
+
+    async def restore(
+        self,
+        since: datetime,
+        until: datetime,
+        prompt_id: Optional[str] = None,
+        ia_model: Optional[str] = None,
+    ) -> int:
+        """
+        Copia de volta para o MongoDB as execuções arquivadas de [since, until).
+        Elas ganham `restored_at` e expiram depois de ARCHIVE_RESTORE_TTL_HOURS
+        (índice TTL); os rollups não são recontados.
+        """
+        restored_at = datetime.now(timezone.utc)
+        docs = iter(self.iter_archived(prompt_id, since, until, ia_model))
+        total = 0
+        while True:
+            batch = await asyncio.to_thread(_take, docs, self.batch_size)
+            if not batch:
+                break
+            for doc in batch:
+                doc["restored_at"] = restored_at
+            try:
+                res = await db.executions.insert_many(batch, ordered=False)
+                total += len(res.inserted_ids)
+            except BulkWriteError as e:
+                # Já presentes no MongoDB (restaurados antes ou ainda não apagados)
+                errors = e.details.get("writeErrors", [])
+                if not all(err.get("code") == 11000 for err in errors):
+                    raise
+                total += e.details.get("nInserted", 0)
+        return total
+
+    async def run(self, interval_s: float) -> None:
+        """Loop de arquivamento (um task por processo da API)."""
+        while True:
+            try:
+                await self.archive_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Erro ao arquivar execuções: {e}")
+            await asyncio.sleep(interval_s)
+
+    def stats(self) -> dict:
+        parts = self.partitions()
+        return {
+            "hot_days": self.hot_days,
+            "archived": self.archived,
+            "last_run": self.last_run,
+            "partitions": len(parts),
+            "size_bytes": sum(p["size_bytes"] for p in parts),
+        }
+
+
+def _take(it: Iterator[dict], limit: int) -> List[dict]:
+    out = []
+    for doc in it:
+        out.append(doc)
+        if len(out) >= limit:
+            break
+    return out
+
+
+execution_archive = ExecutionArchive(
+    root=settings.ARCHIVE_DIR,
+    hot_days=settings.EXECUTION_HOT_DAYS,
+    batch_size=settings.ARCHIVE_BATCH_SIZE,
+)
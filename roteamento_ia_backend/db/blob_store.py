@@ -0,0 +1,62 @@
+import hashlib
+from typing import Any, Dict, Optional
+
+from gridfs.errors import FileExists
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from pymongo.errors import DuplicateKeyError
+
+from roteamento_ia_backend.core.singleflight import SingleFlight
+from roteamento_ia_backend.db.mongo import db
+
+BUCKET_NAME = "blobs"
+
+_bucket: Optional[AsyncIOMotorGridFSBucket] = None
+# Uploads simultâneos do mesmo conteúdo neste processo viram um só (um upload
+# concorrente com o mesmo _id abortaria apagando os chunks do outro)
+_uploads = SingleFlight()
+
+
+def _get_bucket() -> AsyncIOMotorGridFSBucket:
+    # Criado sob demanda: o bucket precisa do event loop em execução
+    global _bucket
+    if _bucket is None:
+        _bucket = AsyncIOMotorGridFSBucket(db, bucket_name=BUCKET_NAME)
+    return _bucket
+
+
+def blob_ref(sha256: str, size: int, mime_type: Optional[str]) -> Dict[str, Any]:
+    return {"sha256": sha256, "size": size, "mime_type": mime_type}
+
+
+async def put_blob(data: bytes, mime_type: Optional[str] = None, file_name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Grava o conteúdo no GridFS com o SHA-256 como `_id` e devolve a referência.
+    Conteúdo idêntico é gravado uma única vez (deduplicação).
+    """
+    sha256 = hashlib.sha256(data).hexdigest()
+
+    async def upload() -> None:
+        if await db[f"{BUCKET_NAME}.files"].find_one({"_id": sha256}, {"_id": 1}):
+            return
+        try:
+            await _get_bucket().upload_from_stream_with_id(
+                sha256,
+                file_name or sha256,
+                data,
+                metadata={"mime_type": mime_type},
+            )
+        except (FileExists, DuplicateKeyError):
+            # Outro worker gravou o mesmo conteúdo ao mesmo tempo (o GridFS
+            # converte o erro de chave duplicada em FileExists)
+            pass
+
+    await _uploads.do(sha256, upload)
+    return blob_ref(sha256, len(data), mime_type)
+
+
+async def get_blob(sha256: str) -> Optional[bytes]:
+    """Lê o conteúdo do blob; None se não existir."""
+    if not await db[f"{BUCKET_NAME}.files"].find_one({"_id": sha256}, {"_id": 1}):
+        return None
+    stream = await _get_bucket().open_download_stream(sha256)
+    return await stream.read()
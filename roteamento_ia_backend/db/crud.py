@@ -1,30 +1,213 @@
-from typing import List, Optional
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
 from bson.errors import InvalidId
-from statistics import mean
 
+from roteamento_ia_backend.core.config import settings
+from roteamento_ia_backend.core.logging import logger
 from roteamento_ia_backend.db.mongo import db
 from roteamento_ia_backend.db.models import PromptModel, ExecutionModel
+from roteamento_ia_backend.db.pagination import keyset_page
+from roteamento_ia_backend.core.templates import CompiledTemplate, compile_template, template_cache
+
+
+def _compile_prompt_data(data: dict) -> Tuple[dict, Optional[CompiledTemplate]]:
+    """
+    Compila o template antes de salvar (levanta TemplateError se for inválido).
+    Com `variables` vazio, as variáveis são extraídas dos placeholders; senão
+    precisam bater com eles.
+    """
+    if "template" not in data:
+        return data, None
+    declared = data.get("variables")
+    compiled = compile_template(data["template"], declared or None)
+    if not declared and "variables" in data:
+        data = {**data, "variables": compiled.variables}
+    return data, compiled
 
 
 async def create_prompt(data: dict) -> PromptModel:
+    data, compiled = _compile_prompt_data(data)
     res = await db.prompts.insert_one(data)
     doc = await db.prompts.find_one({"_id": res.inserted_id})
-    return PromptModel(**doc)
+    prompt = PromptModel(**doc)
+    if compiled is not None:
+        template_cache.put(prompt.id, prompt.version, compiled)
+    return prompt
+
+
+def _id_window(since: Optional[datetime], until: Optional[datetime]) -> Optional[dict]:
+    """Janela de tempo sobre o horário embutido no `_id` (servida pelo índice de `_id`)."""
+    if not since and not until:
+        return None
+    window = {}
+    if since:
+        window["$gte"] = ObjectId.from_datetime(since)
+    if until:
+        window["$lt"] = ObjectId.from_datetime(until)
+    return window
+
+
+def prompts_filter(
+    ia_model: Optional[str] = None,
+    name_prefix: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> dict:
+    query: Dict[str, Any] = {}
+    if ia_model:
+        query["ia_model"] = ia_model
+    if name_prefix:
+        # Regex ancorada e sem flags: usa o índice de `name`
+        query["name"] = {"$regex": f"^{re.escape(name_prefix)}"}
+    window = _id_window(since, until)
+    if window:
+        query["_id"] = window
+    return query
+
+
+async def get_prompts(
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    query: Optional[dict] = None,
+    projection: Optional[Dict[str, int]] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """Página de prompts em ordem de criação e o cursor da próxima (None na última)."""
+    return await keyset_page(db.prompts, query or {}, limit, cursor, order=1, projection=projection)
+
+
+class PromptCache:
+    """
+    Cache em memória dos prompts por id (LRU + TTL). Um hit não faz I/O; a
+    invalidação entre workers vem do change stream (ou do poll de versões).
+    """
+
+    def __init__(self, max_entries: int, ttl_s: float):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._data: "OrderedDict[str, Tuple[float, PromptModel]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.mode = "local"
 
+    def get(self, pid: str) -> Optional[PromptModel]:
+        item = self._data.get(pid)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                del self._data[pid]
+            self.misses += 1
+            return None
+        self._data.move_to_end(pid)
+        self.hits += 1
+        return item[1]
 
-async def get_prompts(limit: int = 100, skip: int = 0) -> List[PromptModel]:
-    docs = await db.prompts.find().skip(skip).limit(limit).to_list(length=limit)
-    return [PromptModel(**d) for d in docs]
+    def set(self, pid: str, prompt: PromptModel) -> None:
+        self._data[pid] = (time.monotonic() + self.ttl_s, prompt)
+        self._data.move_to_end(pid)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def invalidate(self, pid: str) -> None:
+        if self._data.pop(pid, None) is not None:
+            self.invalidations += 1
+
+    def cached_versions(self) -> Dict[str, int]:
+        return {pid: prompt.version for pid, (_, prompt) in self._data.items()}
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def reset(self) -> None:
+        self.clear()
+        self.hits = self.misses = self.invalidations = 0
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "invalidations": self.invalidations,
+            "invalidation_mode": self.mode,
+        }
+
+
+prompt_cache = PromptCache(settings.PROMPT_CACHE_MAX_ENTRIES, settings.PROMPT_CACHE_TTL_S)
 
 
 async def get_prompt_by_id(pid: str) -> Optional[PromptModel]:
+    if settings.PROMPT_CACHE_ENABLED:
+        cached = prompt_cache.get(pid)
+        if cached is not None:
+            return cached
     try:
         oid = ObjectId(pid)
     except InvalidId:
         return None
     doc = await db.prompts.find_one({"_id": oid})
-    return PromptModel(**doc) if doc else None
+    if not doc:
+        return None
+    prompt = PromptModel(**doc)
+    if settings.PROMPT_CACHE_ENABLED:
+        prompt_cache.set(pid, prompt)
+    return prompt
+
+
+async def _poll_prompt_versions() -> None:
+    """Fallback sem change stream: descarta prompts cacheados cuja versão mudou (ou que sumiram)."""
+    cached = prompt_cache.cached_versions()
+    if not cached:
+        return
+    oids = [ObjectId(pid) for pid in cached]
+    docs = await db.prompts.find({"_id": {"$in": oids}}, {"version": 1}).to_list(length=len(oids))
+    current = {str(d["_id"]): d.get("version", 0) for d in docs}
+    for pid, version in cached.items():
+        if current.get(pid) != version:
+            prompt_cache.invalidate(pid)
+
+
+async def watch_prompt_changes() -> None:
+    """
+    Invalida o cache de prompts quando a coleção muda em qualquer worker.
+    Usa change streams; em Mongo standalone (sem replica set) cai no poll de versões.
+    """
+    while True:
+        try:
+            async with db.prompts.watch() as stream:
+                # Mudanças durante uma desconexão não chegaram: começa do zero
+                prompt_cache.clear()
+                prompt_cache.mode = "change_stream"
+                logger.info("Cache de prompts invalidado por change stream")
+                async for change in stream:
+                    key = change.get("documentKey", {}).get("_id")
+                    if key is not None:
+                        prompt_cache.invalidate(str(key))
+                    elif change.get("operationType") in ("drop", "rename", "dropDatabase", "invalidate"):
+                        prompt_cache.clear()
+        except OperationFailure as e:
+            logger.warning(f"Change streams indisponíveis ({e}); usando poll de versões dos prompts")
+            break
+        except Exception as e:
+            # Queda de conexão: o TTL segura o cache até o stream voltar
+            prompt_cache.mode = "local"
+            logger.warning(f"Change stream de prompts interrompido: {e}")
+            await asyncio.sleep(settings.PROMPT_CACHE_POLL_INTERVAL_S)
+
+    prompt_cache.mode = "poll"
+    while True:
+        await asyncio.sleep(settings.PROMPT_CACHE_POLL_INTERVAL_S)
+        try:
+            await _poll_prompt_versions()
+        except Exception as e:
+            logger.warning(f"Falha no poll de versões dos prompts: {e}")
 
 
 async def update_prompt(pid: str, data: dict) -> bool:
@@ -32,7 +215,11 @@ async def update_prompt(pid: str, data: dict) -> bool:
         oid = ObjectId(pid)
     except InvalidId:
         return False
-    res = await db.prompts.update_one({"_id": oid}, {"$set": data})
+    data, _ = _compile_prompt_data(data)
+    # A versão muda a cada alteração: o template compilado é cacheado por (id, versão)
+    res = await db.prompts.update_one({"_id": oid}, {"$set": data, "$inc": {"version": 1}})
+    template_cache.forget(pid)
+    prompt_cache.invalidate(pid)
     return res.modified_count == 1
 
 
@@ -42,13 +229,166 @@ async def delete_prompt(pid: str) -> bool:
     except InvalidId:
         return False
     res = await db.prompts.delete_one({"_id": oid})
+    prompt_cache.invalidate(pid)
     return res.deleted_count == 1
 
 
 async def create_execution(data: dict) -> ExecutionModel:
+    data.setdefault("created_at", datetime.now(timezone.utc))
     res = await db.executions.insert_one(data)
-    doc = await db.executions.find_one({"_id": res.inserted_id})
-    return ExecutionModel(**doc)
+    await apply_execution_rollups([data])
+    # O documento gravado é o próprio `data`: não precisa de um find_one de volta
+    return ExecutionModel(**{**data, "_id": res.inserted_id})
+
+
+async def create_executions_bulk(docs: List[dict]) -> int:
+    """Insere várias execuções num único round-trip; retorna quantas foram gravadas."""
+    if not docs:
+        return 0
+    now = datetime.now(timezone.utc)
+    for doc in docs:
+        doc.setdefault("created_at", now)
+    try:
+        res = await db.executions.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        # Os rollups contam só o que de fato entrou (ex: `_id` duplicado num reenvio)
+        rejected = {err.get("index") for err in e.details.get("writeErrors", [])}
+        await apply_execution_rollups([d for i, d in enumerate(docs) if i not in rejected])
+        raise
+    await apply_execution_rollups(docs)
+    return len(res.inserted_ids)
+
+
+ROLLUP_GRANULARITIES = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+
+def _bucket_start(ts: datetime, granularity: str) -> datetime:
+    if granularity == "minute":
+        return ts.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _histogram_key(latency_ms: float) -> str:
+    for bound in settings.ROLLUP_LATENCY_BUCKETS_MS:
+        if latency_ms <= bound:
+            return f"le_{bound}"
+    return "le_inf"
+
+
+async def apply_execution_rollups(docs: List[dict]) -> None:
+    """
+    Atualiza os rollups (prompt × modelo × minuto/hora/dia) das execuções
+    gravadas. Os incrementos do lote são somados em memória antes, então cada
+    bucket recebe um único `$inc` com upsert. Falhas só são registradas: as
+    execuções brutas continuam sendo a fonte da verdade.
+    """
+    if not settings.ROLLUPS_ENABLED or not docs:
+        return
+    retention = {
+        "minute": timedelta(days=settings.ROLLUP_MINUTE_RETENTION_DAYS),
+        "hour": timedelta(days=settings.ROLLUP_HOUR_RETENTION_DAYS),
+    }
+    buckets: Dict[Tuple[str, str, str, datetime], Dict[str, float]] = {}
+    for doc in docs:
+        oid = doc.get("_id")
+        ts = oid.generation_time if isinstance(oid, ObjectId) else datetime.now(timezone.utc)
+        latency = doc.get("latency_ms")
+        inc = {"count": 1, "errors": 1 if doc.get("error") else 0, "cost_sum": doc.get("cost") or 0.0}
+        if isinstance(latency, (int, float)):
+            inc["latency_sum"] = latency
+            inc["latency_count"] = 1
+            inc[f"hist.{_histogram_key(latency)}"] = 1
+        if doc.get("ttft_ms") is not None:
+            inc["ttft_sum"] = doc["ttft_ms"]
+            inc["ttft_count"] = 1
+        for granularity in ROLLUP_GRANULARITIES:
+            key = (str(doc.get("prompt_id")), doc.get("ia_model") or "unknown", granularity, _bucket_start(ts, granularity))
+            acc = buckets.setdefault(key, {})
+            for field, value in inc.items():
+                acc[field] = acc.get(field, 0) + value
+
+    ops = []
+    for (prompt_id, ia_model, granularity, bucket), inc in buckets.items():
+        update: Dict[str, Any] = {"$inc": inc}
+        if granularity in retention:
+            update["$setOnInsert"] = {"expires_at": bucket + retention[granularity]}
+        ops.append(UpdateOne(
+            {"prompt_id": prompt_id, "ia_model": ia_model, "granularity": granularity, "bucket": bucket},
+            update,
+            upsert=True,
+        ))
+    try:
+        await db.execution_rollups.bulk_write(ops, ordered=False)
+    except Exception as e:
+        logger.error(f"Erro ao atualizar rollups de {len(docs)} execuções: {e}")
+
+
+def _histogram_quantile(hist: Dict[str, int], total: int, q: float) -> Optional[float]:
+    """Percentil aproximado: limite superior da faixa do histograma que contém o rank."""
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for bound in settings.ROLLUP_LATENCY_BUCKETS_MS:
+        seen += hist.get(f"le_{bound}", 0)
+        if seen >= rank:
+            return float(bound)
+    return None  # acima da maior faixa
+
+
+async def get_execution_timeseries(
+    prompt_id: str,
+    granularity: str,
+    since: datetime,
+    until: datetime,
+    ia_model: Optional[str] = None,
+) -> List[dict]:
+    """
+    Série temporal do prompt a partir dos rollups: o custo depende do número de
+    buckets na janela, não do número de execuções.
+    """
+    match: Dict[str, Any] = {
+        "prompt_id": prompt_id,
+        "granularity": granularity,
+        "bucket": {"$gte": _bucket_start(since, granularity), "$lt": until},
+    }
+    if ia_model:
+        match["ia_model"] = ia_model
+    hist_keys = [f"le_{b}" for b in settings.ROLLUP_LATENCY_BUCKETS_MS] + ["le_inf"]
+    sums = ["count", "errors", "cost_sum", "latency_sum", "latency_count", "ttft_sum", "ttft_count"]
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": "$bucket",
+            **{f: {"$sum": f"${f}"} for f in sums},
+            **{k: {"$sum": f"$hist.{k}"} for k in hist_keys},
+        }},
+        {"$sort": {"_id": 1}},
+    ]
+    rows = await db.execution_rollups.aggregate(pipeline).to_list(length=None)
+    points = []
+    for r in rows:
+        hist = {k: r.get(k, 0) for k in hist_keys}
+        latency_count = r.get("latency_count", 0)
+        points.append({
+            "bucket": r["_id"],
+            "count": r["count"],
+            "errors": r["errors"],
+            "error_rate": r["errors"] / r["count"] if r["count"] else 0.0,
+            "avg_latency_ms": r["latency_sum"] / latency_count if latency_count else None,
+            "avg_cost": r["cost_sum"] / r["count"] if r["count"] else 0.0,
+            "avg_ttft_ms": r["ttft_sum"] / r["ttft_count"] if r.get("ttft_count") else None,
+            "p50_latency_ms": _histogram_quantile(hist, latency_count, 0.5),
+            "p99_latency_ms": _histogram_quantile(hist, latency_count, 0.99),
+            "latency_histogram": hist,
+        })
+    return points
 
 
 async def get_executions_by_prompt(prompt_id: str) -> List[ExecutionModel]:
@@ -56,18 +396,328 @@ async def get_executions_by_prompt(prompt_id: str) -> List[ExecutionModel]:
     return [ExecutionModel(**d) for d in docs]
 
 
-async def get_prompt_metrics(prompt_id: str) -> Optional[dict]:
+def executions_filter(
+    prompt_id: Optional[str] = None,
+    ia_model: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> dict:
+    """Filtro das execuções; a janela de tempo usa o `_id` (vale também para documentos sem `created_at`)."""
+    query: Dict[str, Any] = {}
+    if prompt_id:
+        query["prompt_id"] = prompt_id
+    if ia_model:
+        query["ia_model"] = ia_model
+    window = _id_window(since, until)
+    if window:
+        query["_id"] = window
+    return query
+
+
+async def get_executions_page(
+    limit: int,
+    cursor: Optional[str] = None,
+    query: Optional[dict] = None,
+    projection: Optional[Dict[str, int]] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """Página de execuções, das mais recentes para as mais antigas."""
+    return await keyset_page(db.executions, query or {}, limit, cursor, order=-1, projection=projection)
+
+
+async def iter_executions(
+    query: dict,
+    projection: Optional[Dict[str, int]] = None,
+    batch_size: int = 500,
+) -> AsyncIterator[dict]:
+    """
+    Percorre as execuções pelo cursor, `batch_size` documentos por round-trip,
+    em ordem de `_id` (servida pelos índices `_id` e (prompt_id, _id), sem sort em memória).
+    """
+    cursor = db.executions.find(query, projection).sort("_id", 1).batch_size(batch_size)
+    async for doc in cursor:
+        yield doc
+
+
+METRIC_PERCENTILES = (50, 90, 99)
+
+
+def _metrics_match(prompt_id: str, since: Optional[datetime], until: Optional[datetime]) -> dict:
+    """Filtro das execuções do prompt; a janela de tempo usa o horário embutido no `_id`."""
+    match: Dict[str, Any] = {"prompt_id": prompt_id}
+    window = _id_window(since, until)
+    if window:
+        match["_id"] = window
+    return match
+
+
+def _latency_percentiles_facet() -> List[dict]:
+    """
+    Percentis (nearest-rank) da latência numa única ordenação: as latências
+    são ordenadas uma vez, acumuladas com `$push` e cada percentil é lido por
+    posição no array. O array vive só no servidor (limite de 16 MB do
+    documento, ~1M de amostras); apenas os percentis voltam para a aplicação.
+    """
+    size = {"$size": "$latencies"}
+    return [
+        {"$match": {"latency_ms": {"$type": "number"}}},
+        {"$sort": {"latency_ms": 1}},
+        {"$group": {"_id": None, "latencies": {"$push": "$latency_ms"}}},
+        {"$project": {"_id": 0, **{
+            f"p{p}": {"$arrayElemAt": ["$latencies", {"$max": [
+                {"$subtract": [{"$ceil": {"$divide": [{"$multiply": [p, size]}, 100]}}, 1]}, 0,
+            ]}]}
+            for p in METRIC_PERCENTILES
+        }}},
+    ]
+
+
+async def get_prompt_metrics(
+    prompt_id: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> Optional[dict]:
+    """
+    Métricas do prompt calculadas no MongoDB (sem trazer as execuções para a
+    aplicação): médias, percentis de latência, taxa de erro e quebra por
+    modelo e por tipo de input, opcionalmente numa janela [since, until).
+    """
     try:
         _ = ObjectId(prompt_id)
     except InvalidId:
         return None
-    docs = await db.executions.find({"prompt_id": prompt_id}).to_list(length=None)
-    if not docs:
+    match = _metrics_match(prompt_id, since, until)
+    is_error = {"$cond": [{"$eq": ["$error", True]}, 1, 0]}
+    pipeline = [
+        {"$match": match},
+        {"$facet": {
+            "summary": [{"$group": {
+                "_id": None,
+                "total": {"$sum": 1},
+                "avg_latency_ms": {"$avg": "$latency_ms"},
+                "avg_cost": {"$avg": "$cost"},
+                # Latência percebida: só execuções em streaming registram o primeiro token
+                "avg_ttft_ms": {"$avg": "$ttft_ms"},
+                "errors": {"$sum": is_error},
+            }}],
+            "by_model": [{"$group": {
+                "_id": "$ia_model",
+                "count": {"$sum": 1},
+                "avg_latency_ms": {"$avg": "$latency_ms"},
+                "errors": {"$sum": is_error},
+            }}],
+            "by_type": [{"$group": {
+                "_id": {"$ifNull": ["$input.content_type", {"$ifNull": ["$input.type", "unknown"]}]},
+                "count": {"$sum": 1},
+            }}],
+            "latency": _latency_percentiles_facet(),
+        }},
+    ]
+    result = await db.executions.aggregate(pipeline).to_list(length=1)
+    facets = result[0] if result else {}
+    if not facets.get("summary"):
         return None
-    latencies = [d.get("latency_ms", 0.0) for d in docs if "latency_ms" in d]
-    costs = [d.get("cost", 0.0) for d in docs]
+    summary = facets["summary"][0]
+
+    latency = facets["latency"][0] if facets.get("latency") else {}
+    percentiles = [
+        float(latency[f"p{p}"]) if latency.get(f"p{p}") is not None else None
+        for p in METRIC_PERCENTILES
+    ]
+
+    total = summary["total"]
     return {
-        "total_executions": len(docs),
-        "avg_latency_ms": mean(latencies) if latencies else 0.0,
-        "avg_cost": mean(costs) if costs else 0.0,
+        "total_executions": total,
+        "avg_latency_ms": summary["avg_latency_ms"] or 0.0,
+        "avg_cost": summary["avg_cost"] or 0.0,
+        "avg_ttft_ms": summary["avg_ttft_ms"],
+        **{f"p{p}_latency_ms": v for p, v in zip(METRIC_PERCENTILES, percentiles)},
+        "error_rate": summary["errors"] / total,
+        "by_model": {
+            str(m["_id"]): {
+                "count": m["count"],
+                "avg_latency_ms": m["avg_latency_ms"] or 0.0,
+                "error_rate": m["errors"] / m["count"],
+            }
+            for m in facets.get("by_model", [])
+        },
+        "execution_types": {str(t["_id"]): t["count"] for t in facets.get("by_type", [])},
+        "window_from": since,
+        "window_to": until,
     }
+
+
+async def get_cached_response(key: str) -> Optional[Dict[str, Any]]:
+    # O monitor de TTL do Mongo roda a cada ~60s, então filtramos expirados também
+    doc = await db.response_cache.find_one(
+        {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}}
+    )
+    return doc["entry"] if doc else None
+
+
+async def set_cached_response(key: str, entry: Dict[str, Any], expires_at: datetime) -> None:
+    await db.response_cache.update_one(
+        {"_id": key},
+        {"$set": {"entry": entry, "expires_at": expires_at}},
+        upsert=True,
+    )
+
+
+async def get_cached_extraction(key: str) -> Optional[Dict[str, Any]]:
+    doc = await db.extraction_cache.find_one(
+        {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}}
+    )
+    return doc["entry"] if doc else None
+
+
+async def set_cached_extraction(key: str, entry: Dict[str, Any], expires_at: datetime) -> None:
+    await db.extraction_cache.update_one(
+        {"_id": key},
+        {"$set": {"entry": entry, "expires_at": expires_at}},
+        upsert=True,
+    )
+
+
+async def enqueue_job(payload: dict, max_attempts: int) -> str:
+    now = datetime.now(timezone.utc)
+    res = await db.jobs.insert_one({
+        "status": "queued",
+        "payload": payload,
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "created_at": now,
+        "available_at": now,
+        "lease_until": None,
+        "worker_id": None,
+        "result": None,
+        "error": None,
+    })
+    return str(res.inserted_id)
+
+
+async def claim_job(worker_id: str, lease_s: float) -> Optional[dict]:
+    """
+    Reserva atomicamente o job mais antigo disponível: um job na fila ou um job
+    em execução cujo lease expirou (worker morreu no meio da execução).
+    """
+    now = datetime.now(timezone.utc)
+    return await db.jobs.find_one_and_update(
+        {"$or": [
+            {"status": "queued", "available_at": {"$lte": now}},
+            {"status": "running", "lease_until": {"$lt": now}},
+        ]},
+        {
+            "$set": {
+                "status": "running",
+                "worker_id": worker_id,
+                "lease_until": now + timedelta(seconds=lease_s),
+                "started_at": now,
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def renew_job_lease(job_id: ObjectId, worker_id: str, lease_s: float) -> bool:
+    res = await db.jobs.update_one(
+        {"_id": job_id, "worker_id": worker_id, "status": "running"},
+        {"$set": {"lease_until": datetime.now(timezone.utc) + timedelta(seconds=lease_s)}},
+    )
+    return res.modified_count == 1
+
+
+async def complete_job(job_id: ObjectId, worker_id: str, result: dict) -> None:
+    await db.jobs.update_one(
+        {"_id": job_id, "worker_id": worker_id},
+        {"$set": {
+            "status": "done",
+            "result": result,
+            "error": None,
+            "lease_until": None,
+            "finished_at": datetime.now(timezone.utc),
+        }},
+    )
+
+
+async def fail_job(
+    job_id: ObjectId,
+    worker_id: str,
+    error: str,
+    retry_in_s: Optional[float],
+    result: Optional[dict] = None,
+) -> None:
+    """
+    Devolve o job para a fila após `retry_in_s` ou, se None, marca como falho
+    (guardando `result`, se houver, como o da última tentativa).
+    """
+    now = datetime.now(timezone.utc)
+    if retry_in_s is None:
+        update = {"status": "failed", "finished_at": now}
+        if result is not None:
+            update["result"] = result
+    else:
+        update = {"status": "queued", "available_at": now + timedelta(seconds=retry_in_s)}
+    update.update({"error": error, "lease_until": None})
+    await db.jobs.update_one({"_id": job_id, "worker_id": worker_id}, {"$set": update})
+
+
+async def get_job(job_id: str) -> Optional[dict]:
+    try:
+        oid = ObjectId(job_id)
+    except InvalidId:
+        return None
+    return await db.jobs.find_one({"_id": oid}, {"payload": 0})
+
+
+async def get_job_queue_stats(sample_size: int = 100) -> dict:
+    """Profundidade da fila e tempos de espera (criação → início) dos jobs."""
+    now = datetime.now(timezone.utc)
+    queued = await db.jobs.count_documents({"status": "queued"})
+    running = await db.jobs.count_documents({"status": "running"})
+
+    oldest = await db.jobs.find_one(
+        {"status": "queued"}, {"created_at": 1}, sort=[("created_at", 1)]
+    )
+    oldest_wait_s = None
+    if oldest:
+        created_at = oldest["created_at"].replace(tzinfo=timezone.utc)
+        oldest_wait_s = (now - created_at).total_seconds()
+
+    recent = await db.jobs.aggregate([
+        {"$match": {"started_at": {"$exists": True}}},
+        {"$sort": {"started_at": -1}},
+        {"$limit": sample_size},
+        {"$group": {
+            "_id": None,
+            "avg_wait_ms": {"$avg": {"$subtract": ["$started_at", "$created_at"]}},
+        }},
+    ]).to_list(length=1)
+    avg_wait_s = recent[0]["avg_wait_ms"] / 1000 if recent else None
+
+    return {
+        "queued": queued,
+        "running": running,
+        "oldest_wait_s": oldest_wait_s,
+        "avg_wait_s": avg_wait_s,
+    }
+
+
+async def ensure_indexes() -> None:
+    """Cria os índices usados pela aplicação (idempotente)."""
+    await db.response_cache.create_index("expires_at", expireAfterSeconds=0)
+    await db.extraction_cache.create_index("expires_at", expireAfterSeconds=0)
+    # Listagem de prompts filtrada por modelo ou prefixo do nome, paginada por _id
+    await db.prompts.create_index([("ia_model", 1), ("_id", 1)])
+    await db.prompts.create_index("name")
+    # Export e listagem das execuções do prompt em ordem de _id
+    await db.executions.create_index([("prompt_id", 1), ("_id", 1)])
+    # Rollups: um documento por prompt × modelo × bucket; minutos e horas expiram
+    await db.execution_rollups.create_index(
+        [("prompt_id", 1), ("granularity", 1), ("bucket", 1), ("ia_model", 1)], unique=True
+    )
+    await db.execution_rollups.create_index("expires_at", expireAfterSeconds=0)
+    # Execuções restauradas do arquivo voltam a sair do MongoDB depois do TTL
+    await db.executions.create_index("restored_at", expireAfterSeconds=settings.ARCHIVE_RESTORE_TTL_HOURS * 3600)
+    await db.jobs.create_index([("status", 1), ("available_at", 1), ("created_at", 1)])
+    await db.jobs.create_index([("status", 1), ("lease_until", 1)])
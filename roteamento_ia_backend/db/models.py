@@ -1,6 +1,7 @@
 
+from datetime import datetime
 from bson import ObjectId
-from typing import List, Any, Dict
+from typing import List, Any, Dict, Optional
 
 from pydantic import BaseModel, Field
 from pydantic_core import core_schema
@@ -38,6 +39,8 @@ class PromptModel(BaseModel):
     template: str
     ia_model: str
     variables: List[str]     = []
+    fallback_models: List[str] = []
+    version: int             = 0
 
     class Config:
         # Para permitir entrada via "_id" e ainda serializar como "id"
@@ -54,6 +57,17 @@ class ExecutionModel(BaseModel):
     ia_model: str
     latency_ms: int
     cost: float
+    error: bool = False
+    cache: Optional[Dict[str, Any]] = None
+    coalesced: bool = False
+    ttft_ms: Optional[int] = None
+    streamed: bool = False
+    batch: bool = False
+    answered_by: Optional[str] = None
+    hedge: Optional[Dict[str, Any]] = None
+    routing: Optional[Dict[str, Any]] = None
+    fallback: Optional[Dict[str, Any]] = None
+    created_at: Optional[datetime] = None
 
     class Config:
         populate_by_name = True
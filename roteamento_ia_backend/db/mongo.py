@@ -1,5 +1,7 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from roteamento_ia_backend.core.config import settings
+from roteamento_ia_backend.core.metrics import MongoCommandMetrics
 
-client = AsyncIOMotorClient(settings.MONGO_URI)
+# O listener mede a latência de cada comando (exposta em /metrics)
+client = AsyncIOMotorClient(settings.MONGO_URI, event_listeners=[MongoCommandMetrics()])
 db = client[settings.MONGO_DB]
@@ -0,0 +1,57 @@
+import base64
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+
+class InvalidCursor(ValueError):
+    """Token de continuação malformado ou de outra listagem."""
+
+
+def encode_cursor(last_id: ObjectId, order: int) -> str:
+    """Token opaco com o último `_id` da página e a direção da ordenação."""
+    raw = json.dumps({"id": str(last_id), "o": order}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str, order: int) -> ObjectId:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(raw)
+        last_id = ObjectId(data["id"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise InvalidCursor("Cursor inválido")
+    if data.get("o") != order:
+        raise InvalidCursor("Cursor de outra listagem")
+    return last_id
+
+
+async def keyset_page(
+    collection,
+    query: Dict[str, Any],
+    limit: int,
+    cursor: Optional[str] = None,
+    order: int = 1,
+    projection: Optional[Dict[str, int]] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Página ordenada por `_id` a partir do cursor (`_id > último` ou `< último`),
+    em vez de skip: o custo por página é o mesmo em qualquer profundidade.
+    Busca `limit + 1` documentos para saber se existe próxima página.
+    """
+    query = dict(query)
+    if cursor:
+        bound = {"$gt" if order == 1 else "$lt": decode_cursor(cursor, order)}
+        # Soma com a janela de tempo em `_id`, se houver (o cursor está sempre dentro dela)
+        query["_id"] = {**query.get("_id", {}), **bound}
+    if projection is not None:
+        # O `_id` é sempre necessário para montar o cursor
+        projection = {k: v for k, v in projection.items() if k != "_id"} or {"_id": 1}
+    docs = await collection.find(query, projection).sort("_id", order).limit(limit + 1).to_list(length=limit + 1)
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1]["_id"], order)
+    return docs, next_cursor
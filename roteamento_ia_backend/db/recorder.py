@@ -0,0 +1,275 @@
+import asyncio
+import os
+import re
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from bson import ObjectId, json_util
+from pymongo.errors import BulkWriteError
+
+from roteamento_ia_backend.core.config import settings
+from roteamento_ia_backend.core.logging import logger
+from roteamento_ia_backend.db.crud import create_execution, create_executions_bulk
+
+
+async def _insert(docs: List[dict]) -> int:
+    """
+    Insere o lote ignorando `_id` duplicado: um lote reenviado do disco pode já
+    ter sido gravado em parte (o `_id` é gerado antes do insert).
+    """
+    try:
+        return await create_executions_bulk(docs)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if errors and all(err.get("code") == 11000 for err in errors):
+            return e.details.get("nInserted", 0)
+        raise
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ExecutionRecorder:
+    """
+    Write-behind das execuções: a request só enfileira o documento; um task em
+    background grava em lote (`insert_many`) por tamanho ou intervalo.
+
+    Com a fila cheia (Mongo lento), o chamador espera no máximo `max_wait_s` e,
+    depois disso, o documento vai para um arquivo JSONL local, reenviado
+    quando o Mongo voltar a responder.
+
+    Cada processo (worker do uvicorn) grava no seu próprio arquivo
+    (`<spill_path>` com o pid no nome). Para reenviar, o arquivo é renomeado
+    para `.replay-<ns>` e só é apagado depois de reenviado ou regravado no
+    arquivo de spill; no start, o processo também assume os arquivos de
+    processos que já morreram. Linhas ilegíveis vão para `<spill_path>.dead`.
+    """
+
+    def __init__(self, max_queue: int, batch_size: int, flush_interval_s: float,
+                 max_wait_s: float, spill_path: str):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.max_wait_s = max_wait_s
+        self.spill_path = spill_path
+        root, ext = os.path.splitext(spill_path)
+        self._spill_root, self._spill_ext = root, ext
+        self._spill_pattern = re.compile(
+            re.escape(os.path.basename(root)) + r"\.(\d+)" + re.escape(ext) + r"(\.replay-\d+)?$"
+        )
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Lote em montagem quando o task foi cancelado (gravado pelo stop)
+        self._interrupted: List[dict] = []
+        self.flushed = 0
+        self.spilled = 0
+
+    @property
+    def spill_file(self) -> str:
+        """Arquivo de spill deste processo."""
+        return f"{self._spill_root}.{os.getpid()}{self._spill_ext}"
+
+    @property
+    def dead_letter_file(self) -> str:
+        return f"{self._spill_root}.dead{self._spill_ext}"
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        await self._replay_spill(orphans=True)
+        self._task = asyncio.create_task(self._run())
+        logger.info("Gravação em lote das execuções iniciada")
+
+    async def stop(self) -> None:
+        """Para o task e grava tudo o que ainda estiver na fila."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        docs, self._interrupted = self._interrupted, []
+        await self._flush(docs)
+        while not self._queue.empty():
+            await self._flush(self._take(self.batch_size))
+
+    async def record(self, doc: dict) -> None:
+        """Enfileira a execução; sem recorder ativo (ex: scripts), grava direto."""
+        # _id gerado aqui: o documento já é identificável antes de chegar ao banco
+        doc.setdefault("_id", ObjectId())
+        doc.setdefault("created_at", datetime.now(timezone.utc))
+        if not self.running:
+            await create_execution(doc)
+            return
+        try:
+            self._queue.put_nowait(doc)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put(doc), timeout=self.max_wait_s)
+            except asyncio.TimeoutError:
+                self._spill([doc])
+
+    def _take(self, limit: int) -> List[dict]:
+        docs = []
+        while len(docs) < limit and not self._queue.empty():
+            docs.append(self._queue.get_nowait())
+        return docs
+
+    async def _run(self) -> None:
+        while True:
+            docs = [await self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval_s
+            try:
+                while len(docs) < self.batch_size:
+                    docs.extend(self._take(self.batch_size - len(docs)))
+                    remaining = deadline - time.monotonic()
+                    if len(docs) >= self.batch_size or remaining <= 0:
+                        break
+                    try:
+                        docs.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                # Cancelamento enquanto o lote enche (shutdown): já saiu da fila, o stop grava
+                self._interrupted = docs
+                raise
+            # Cancelamento durante o flush (shutdown): o lote vai para o disco
+            try:
+                ok = await self._flush(docs)
+            except asyncio.CancelledError:
+                self._spill(docs)
+                raise
+            if ok and os.path.exists(self.spill_file):
+                await self._replay_spill()
+
+    async def _flush(self, docs: List[dict]) -> bool:
+        if not docs:
+            return True
+        try:
+            self.flushed += await _insert(docs)
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao gravar {len(docs)} execuções no MongoDB: {e}")
+            await asyncio.to_thread(self._spill, docs)
+            return False
+
+    def _spill(self, docs: List[dict]) -> bool:
+        try:
+            os.makedirs(os.path.dirname(self.spill_file) or ".", exist_ok=True)
+            with open(self.spill_file, "a", encoding="utf-8") as f:
+                f.write("".join(json_util.dumps(doc) + "\n" for doc in docs))
+            self.spilled += len(docs)
+            return True
+        except OSError as e:
+            logger.error(f"Execuções descartadas: falha ao gravar em {self.spill_file}: {e}")
+            return False
+
+    def _claim_spill(self, orphans: bool) -> Tuple[List[dict], List[str]]:
+        """
+        Renomeia para `.replay-<ns>` o arquivo deste processo (e, com `orphans`,
+        os de processos mortos e replays interrompidos) e lê os documentos.
+        O rename é atômico: se outro worker assumiu o arquivo antes, é ignorado.
+        """
+        directory = os.path.dirname(self.spill_path) or "."
+        if orphans:
+            if not os.path.isdir(directory):
+                return [], []
+            paths = []
+            for name in sorted(os.listdir(directory)):
+                match = self._spill_pattern.match(name)
+                pid = int(match.group(1)) if match else None
+                if pid is not None and (pid == os.getpid() or not _pid_alive(pid)):
+                    paths.append(os.path.join(directory, name))
+        else:
+            paths = [self.spill_file]
+
+        docs, claimed = [], []
+        for path in paths:
+            target = f"{self.spill_file}.replay-{time.time_ns()}"
+            try:
+                os.replace(path, target)
+            except FileNotFoundError:
+                continue
+            claimed.append(target)
+            with open(target, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        docs.append(json_util.loads(line))
+                    except Exception:
+                        # Linha cortada por uma queda no meio da gravação
+                        self._dead_letter(line)
+        return docs, claimed
+
+    def _dead_letter(self, line: str) -> None:
+        with open(self.dead_letter_file, "a", encoding="utf-8") as f:
+            f.write(line if line.endswith("\n") else line + "\n")
+        logger.error(f"Linha ilegível do spill de execuções movida para {self.dead_letter_file}")
+
+    @staticmethod
+    def _remove(paths: List[str]) -> None:
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    async def _replay_spill(self, orphans: bool = False) -> None:
+        """
+        Reenvia as execuções gravadas em disco. Falhas nunca sobem para o
+        start/flusher: o que não entrou volta para o arquivo de spill.
+        """
+        try:
+            docs, claimed = await asyncio.to_thread(self._claim_spill, orphans)
+        except Exception as e:
+            logger.error(f"Falha ao ler as execuções em disco: {e}")
+            return
+        if not claimed:
+            return
+        sent = 0
+        try:
+            for sent in range(0, len(docs), self.batch_size):
+                self.flushed += await _insert(docs[sent:sent + self.batch_size])
+            sent = len(docs)
+            logger.info(f"{len(docs)} execuções reenviadas do disco")
+        except Exception as e:
+            logger.error(f"Reenvio das execuções em disco falhou: {e}")
+            if not await asyncio.to_thread(self._spill, docs[sent:]):
+                # Sem onde regravar: os arquivos .replay ficam para o próximo start
+                return
+        try:
+            await asyncio.to_thread(self._remove, claimed)
+        except Exception as e:
+            logger.error(f"Falha ao apagar arquivos de replay: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "flushed": self.flushed,
+            "spilled": self.spilled,
+            "running": self.running,
+        }
+
+
+execution_recorder = ExecutionRecorder(
+    max_queue=settings.RECORDER_MAX_QUEUE,
+    batch_size=settings.RECORDER_BATCH_SIZE,
+    flush_interval_s=settings.RECORDER_FLUSH_INTERVAL_S,
+    max_wait_s=settings.RECORDER_MAX_WAIT_S,
+    spill_path=settings.RECORDER_SPILL_PATH,
+)
+
+
+async def record_execution(doc: dict) -> None:
+    await execution_recorder.record(doc)
@@ -1,4 +1,5 @@
 from typing import List, Any, Dict, Optional, Union
+from datetime import datetime, timezone
 from pydantic import BaseModel, Field, model_validator
 from fastapi import UploadFile
 
@@ -7,6 +8,8 @@ class PromptCreate(BaseModel):
     template: str
     ia_model: str
     variables: List[str] = Field(default_factory=list)
+    # Models tried in order when ia_model fails or its circuit is open
+    fallback_models: List[str] = Field(default_factory=list)
 
 
 class PromptOut(BaseModel):
@@ -15,6 +18,31 @@ class PromptOut(BaseModel):
     template: str
     ia_model: str
     variables: List[str]
+    fallback_models: List[str] = Field(default_factory=list)
+
+
+class PromptListItem(BaseModel):
+    """
+    Prompt in a listing. With `fields`, only the requested attributes are
+    returned (unset ones are omitted from the response).
+    """
+    id: str
+    name: Optional[str] = None
+    template: Optional[str] = None
+    ia_model: Optional[str] = None
+    variables: Optional[List[str]] = None
+    fallback_models: Optional[List[str]] = None
+
+
+class PromptPage(BaseModel):
+    """
+    One page of prompts, in creation order.
+
+    Attributes:
+        next_cursor: Opaque token for the next page (None on the last page)
+    """
+    items: List[PromptListItem]
+    next_cursor: Optional[str] = None
 
 
 class InputPayload(BaseModel):
@@ -57,6 +85,8 @@ class ExecutionIn(BaseModel):
 
     input: Optional[InputPayload] = None
     input_file: Optional[UploadFile] = None
+    hedge: Optional[bool] = None  # None uses the server default (HEDGE_ENABLED)
+    pages: Optional[str] = None  # PDF page selection, e.g. "1-3,7" (all pages when empty)
 
     @model_validator(mode="after")
     def check_either_input_or_file(cls, m):
@@ -67,13 +97,77 @@ class ExecutionIn(BaseModel):
         return m
 
 
+class BatchExecutionIn(BaseModel):
+    """
+    Model for batch execution request: one prompt run against many text inputs.
+
+    Attributes:
+        inputs: Text inputs; each one becomes a separate execution
+        concurrency: Maximum provider calls in flight (capped by the server limit)
+    """
+    prompt_id: str
+    ia_model: Optional[str] = None
+    variables: Dict[str, Any] = Field(default_factory=dict)
+    inputs: List[str] = Field(..., min_length=1)
+    concurrency: Optional[int] = Field(default=None, ge=1)
+
+
 class ExecutionOut(BaseModel):
     """
     Model for execution response.
+
+    Attributes:
+        cache_hit: Whether the output came from the response cache
+        cache_tier: Cache tier that served the output ("memory" or "mongo")
+        saved_latency_ms: Provider latency avoided by the cache hit
+        answered_by: Model that produced the output (differs from the requested one when a hedge or fallback won)
+        hedged: Whether a hedged request to a secondary model was fired
+        fallback: Whether the output came from a model of the fallback chain
+        error: Whether every provider call failed (the output is the error message)
     """
     output: Any
     latency_ms: int
     cost: float
+    cache_hit: bool = False
+    cache_tier: Optional[str] = None
+    saved_latency_ms: Optional[int] = None
+    answered_by: Optional[str] = None
+    hedged: bool = False
+    fallback: bool = False
+    error: bool = False
+
+
+class JobSubmitted(BaseModel):
+    id: str
+    status: str
+
+
+class JobOut(BaseModel):
+    """
+    Model for an asynchronous execution job.
+
+    Attributes:
+        status: "queued", "running", "done" or "failed"
+        attempts: How many times a worker has claimed the job
+        result: The execution output once the job is done, or of the last
+            attempt when the provider failed every retry (`result.error`)
+    """
+    id: str
+    status: str
+    attempts: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[ExecutionOut] = None
+    error: Optional[str] = None
+
+
+class JobQueueStats(BaseModel):
+    workers: int  # Workers per application process
+    queued: int
+    running: int
+    oldest_wait_s: Optional[float] = None  # Age of the oldest queued job
+    avg_wait_s: Optional[float] = None  # Mean queue wait of recently started jobs
 
 
 class ExecutionMetadata(BaseModel):
@@ -90,8 +184,97 @@ class ExecutionMetadata(BaseModel):
     created_at: str
 
 
+class ModelMetrics(BaseModel):
+    count: int
+    avg_latency_ms: float
+    error_rate: float
+
+
 class PromptMetrics(BaseModel):
     total_executions: int
     avg_latency_ms: float
     avg_cost: float
-    execution_types: Optional[Dict[str, int]] = None  # Count by input type
\ No newline at end of file
+    avg_ttft_ms: Optional[float] = None  # Time-to-first-token of streamed executions
+    p50_latency_ms: Optional[float] = None
+    p90_latency_ms: Optional[float] = None
+    p99_latency_ms: Optional[float] = None
+    error_rate: float = 0.0  # Share of executions whose model call failed
+    by_model: Dict[str, ModelMetrics] = Field(default_factory=dict)
+    execution_types: Optional[Dict[str, int]] = None  # Count by input type
+    window_from: Optional[datetime] = None
+    window_to: Optional[datetime] = None
+
+
+class TimeSeriesPoint(BaseModel):
+    """
+    One rollup bucket. Percentiles are estimated from the latency histogram
+    (upper bound of the histogram range holding the rank).
+    """
+    bucket: datetime
+    count: int
+    errors: int
+    error_rate: float
+    avg_latency_ms: Optional[float] = None
+    avg_cost: float
+    avg_ttft_ms: Optional[float] = None
+    p50_latency_ms: Optional[float] = None
+    p99_latency_ms: Optional[float] = None
+    latency_histogram: Dict[str, int]
+
+
+class PromptTimeSeries(BaseModel):
+    prompt_id: str
+    granularity: str
+    ia_model: Optional[str] = None
+    window_from: datetime
+    window_to: datetime
+    points: List[TimeSeriesPoint]
+
+
+class ArchivePartition(BaseModel):
+    """One archive file: the executions of one prompt on one (UTC) day."""
+    day: str
+    prompt_id: str
+    size_bytes: int
+
+
+class ArchiveStats(BaseModel):
+    enabled: bool
+    hot_days: int  # Executions younger than this stay in MongoDB
+    archived: int  # Executions moved to disk by this process
+    last_run: Optional[datetime] = None
+    partitions: int
+    size_bytes: int
+
+
+class ArchiveRestoreIn(BaseModel):
+    """Time range of archived executions to copy back into MongoDB."""
+    since: datetime = Field(..., alias="from")
+    until: datetime = Field(..., alias="to")
+    prompt_id: Optional[str] = None
+    ia_model: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_window(self):
+        # Dates without a timezone are taken as UTC
+        self.since = self.since if self.since.tzinfo else self.since.replace(tzinfo=timezone.utc)
+        self.until = self.until if self.until.tzinfo else self.until.replace(tzinfo=timezone.utc)
+        if self.since >= self.until:
+            raise ValueError("'from' must be before 'to'")
+        return self
+
+
+class ArchiveRestoreOut(BaseModel):
+    restored: int
+    expires_in_hours: int  # Restored executions leave MongoDB again after this
+
+
+class ExecutionPage(BaseModel):
+    """
+    One page of executions, newest first.
+
+    Attributes:
+        next_cursor: Opaque token for the next page (None on the last page)
+    """
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
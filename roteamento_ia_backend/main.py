@@ -1,7 +1,16 @@
+import asyncio
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
-from roteamento_ia_backend.routers import prompts, execute
+from roteamento_ia_backend.routers import prompts, execute, jobs, executions
 from roteamento_ia_backend.core.logging import logger
+from roteamento_ia_backend.core.openai.openai_client import init_openai_client, close_openai_client
+from roteamento_ia_backend.db.crud import ensure_indexes, watch_prompt_changes
+from roteamento_ia_backend.core.config import settings
+from roteamento_ia_backend.core.job_worker import job_workers
+from roteamento_ia_backend.core.extraction_pool import extraction_pool
+from roteamento_ia_backend.db.recorder import execution_recorder
+from roteamento_ia_backend.db.archive import execution_archive
+from roteamento_ia_backend.core.metrics import metrics_middleware, metrics_response, mark_process_dead
 from fastapi.middleware.cors import CORSMiddleware
 
 origins = [
@@ -13,10 +22,31 @@ origins = [
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # startup
+    await init_openai_client()
+    try:
+        await ensure_indexes()
+    except Exception as e:
+        logger.error(f"Falha ao criar indices no MongoDB: {e}")
+    await execution_recorder.start()
+    extraction_pool.start()
+    if job_workers.workers > 0:
+        await job_workers.start()
+    prompt_watcher = asyncio.create_task(watch_prompt_changes()) if settings.PROMPT_CACHE_ENABLED else None
+    archiver = asyncio.create_task(execution_archive.run(settings.ARCHIVE_INTERVAL_S)) if settings.ARCHIVE_ENABLED else None
     logger.info("Aplicacao iniciada")
     yield
     # shutdown
     logger.info("Aplicacao encerrando")
+    for task in (prompt_watcher, archiver):
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    await job_workers.stop()
+    # Depois dos workers: as execuções dos jobs interrompidos também são gravadas
+    await execution_recorder.stop()
+    extraction_pool.stop()
+    await close_openai_client()
+    mark_process_dead()
 
 app = FastAPI(
     title="Roteamento de IA",
@@ -33,5 +63,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.middleware("http")(metrics_middleware)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Métricas no formato Prometheus (agregando todos os workers em modo multiprocess)."""
+    return metrics_response()
+
 app.include_router(prompts.router, prefix="/prompts", tags=["prompts"])
-app.include_router(execute.router, prefix="/execute", tags=["execute"])
\ No newline at end of file
+app.include_router(execute.router, prefix="/execute", tags=["execute"])
+app.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+app.include_router(executions.router, prefix="/executions", tags=["executions"])
\ No newline at end of file
@@ -1,33 +1,63 @@
 # File: roteamento_ia_backend/routers/execute.py
 from fastapi import APIRouter, HTTPException, Path, Form, File, UploadFile
-from typing import Tuple, Optional, Dict, Any
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Tuple, Optional, Dict, Any, List
 import time, json
+import base64
+import asyncio
 import logging
 
-from roteamento_ia_backend.db.schemas import InputPayload, ExecutionIn, ExecutionOut
-from roteamento_ia_backend.db.crud import get_prompt_by_id, create_execution
-from roteamento_ia_backend.core.openai.openai_service import generate_openai_completion
-from roteamento_ia_backend.core.gemini.gemini_service import generate_gemini_completion
-from roteamento_ia_backend.utils.file_utils import extract_text_from_pdf, extract_text_from_image, file_to_base64, prepare_file_for_ai
+from roteamento_ia_backend.db.schemas import InputPayload, ExecutionIn, ExecutionOut, BatchExecutionIn
+from roteamento_ia_backend.db.crud import get_prompt_by_id, create_executions_bulk
+from roteamento_ia_backend.db.recorder import record_execution
+from roteamento_ia_backend.db.blob_store import put_blob
+from roteamento_ia_backend.core.openai.openai_service import generate_openai_completion, stream_openai_completion
+from roteamento_ia_backend.core.gemini.gemini_service import generate_gemini_completion, stream_gemini_completion
+from roteamento_ia_backend.utils.file_utils import extract_text_from_pdf, extract_text_from_image, file_to_base64, prepare_file_for_ai, parse_page_ranges
 from roteamento_ia_backend.core.logging import logger
+from roteamento_ia_backend.core.config import settings
+from roteamento_ia_backend.core.response_cache import response_cache, make_cache_key
+from roteamento_ia_backend.core.singleflight import inflight_executions
+from roteamento_ia_backend.core.rate_limit import rate_limiter, estimate_tokens, provider_for_model, RateLimitTimeout
+from roteamento_ia_backend.core.metrics import EXECUTIONS_IN_FLIGHT, observe_provider_call, provider_status
+from roteamento_ia_backend.core.model_stats import model_stats
+from roteamento_ia_backend.core.hedging import hedge_plan, hedged_call
+from roteamento_ia_backend.core.routing import model_router
+from roteamento_ia_backend.core.circuit_breaker import breakers
+from roteamento_ia_backend.core.templates import template_cache, MissingVariablesError, TemplateError
 
 router = APIRouter()
 
+def _route_model(requested: str, final_prompt: str, user_input: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Resolve o modelo concreto: nomes de modelo passam direto, classes ("fast",
+    "cheap", "vision"...) são decididas pelo motor de roteamento.
+    """
+    return model_router.route(
+        requested,
+        estimate_tokens(final_prompt, max_output_tokens=0),
+        needs_vision=user_input["type"] == "image",
+    )
+
 async def _select_model_fn(ia_model: str) -> Tuple:
-    """Retorna a função de geração e flag de async com base no modelo."""
+    """Retorna a função de geração (do modelo já roteado) e flag de async."""
     if ia_model.lower().startswith("gpt"):
         return generate_openai_completion, True
-    return generate_gemini_completion, False
+    return generate_gemini_completion, True
 
-async def _execute_common(payload: ExecutionIn) -> ExecutionOut:
-    """Lógica comum de execução a partir de um ExecutionIn validado."""
-    ia_model = payload.ia_model or "gemini-1.5"
-    vars_dict = payload.variables
+async def _select_stream_fn(ia_model: str):
+    """Retorna a função de geração em streaming com base no modelo."""
+    if ia_model.lower().startswith("gpt"):
+        return stream_openai_completion
+    return stream_gemini_completion
 
-    # Extrai apenas o texto ou conteúdo dos inputs
-    user_input = {}
-    input_payload = {}
-    
+async def _prepare_input(payload: ExecutionIn) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Extrai o conteúdo do input (texto ou arquivo).
+
+    Returns:
+        Tuple: (user_input enviado à IA, input_payload persistido na execução)
+    """
     if payload.input:
         input_payload = payload.input.dict()
         # Extrai apenas o texto do input
@@ -35,85 +65,362 @@ async def _execute_common(payload: ExecutionIn) -> ExecutionOut:
             "type": "text", 
             "content": input_payload.get('data', '')
         }
-    else:
-        input_file = payload.input_file  # garantido pelo model_validator
-        
-        # Use the enhanced file processing utility
-        file_data = await prepare_file_for_ai(input_file)
+        return user_input, input_payload
+
+    input_file = payload.input_file  # garantido pelo model_validator
+    
+    # Use the enhanced file processing utility
+    file_data = await prepare_file_for_ai(input_file, parse_page_ranges(payload.pages), payload.ia_model)
+    
+    user_input = {
+        "type": file_data["content_type"],  # "text" or "image"
+        "content": file_data["content"]     # extracted text or base64 image
+    }
         
-        user_input = {
-            "type": file_data["content_type"],  # "text" or "image"
-            "content": file_data["content"]     # extracted text or base64 image
-        }
-            
-        input_payload = {
-            "file_name": file_data["file_name"],
-            "mime_type": file_data["mime_type"],
-            "content_type": file_data["content_type"],
-            "content": file_data["content"],
-        }
+    input_payload = {
+        "file_name": file_data["file_name"],
+        "mime_type": file_data["mime_type"],
+        "content_type": file_data["content_type"],
+        "content": file_data["content"],
+    }
+    if payload.pages:
+        input_payload["pages"] = payload.pages
+    if "image" in file_data:
+        # Tamanhos original/enviado e dimensões da imagem pré-processada
+        input_payload["image"] = file_data["image"]
+    if settings.BLOB_STORE_ENABLED:
+        input_payload = await _store_input_blobs(input_file, input_payload)
+    return user_input, input_payload
 
-    # Busca e renderiza o prompt
-    prompt = await get_prompt_by_id(payload.prompt_id)
+async def _store_input_blobs(input_file: UploadFile, input_payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Guarda o arquivo original (e o texto extraído, se grande) no blob store e
+    deixa na execução só as referências por SHA-256. Sem blob store disponível,
+    mantém o conteúdo inline como antes.
+    """
+    try:
+        await input_file.seek(0)
+        raw = await input_file.read()
+        stored = {k: v for k, v in input_payload.items() if k != "content"}
+        stored["blob"] = await put_blob(raw, input_payload["mime_type"], input_payload["file_name"])
+        content = input_payload["content"]
+        if input_payload["content_type"] == "image":
+            if input_payload.get("image", {}).get("preprocessed"):
+                # A imagem enviada é a versão reduzida/recomprimida: guarda também essa
+                header, data = content.split(",", 1)
+                sent_mime = header[len("data:"):].split(";", 1)[0]
+                stored["content_blob"] = await put_blob(base64.b64decode(data), sent_mime)
+            # Sem pré-processamento, o data URI é o próprio arquivo em base64: a referência basta
+            return stored
+        if len(content) <= settings.INPUT_INLINE_MAX_CHARS:
+            stored["content"] = content
+        else:
+            stored["content_blob"] = await put_blob(content.encode("utf-8"), "text/plain")
+        return stored
+    except Exception as e:
+        logger.error(f"Erro ao gravar arquivo no blob store; conteúdo mantido inline: {e}")
+        return input_payload
+
+async def _render_prompt(prompt_id: str, vars_dict: Dict[str, Any]) -> Tuple[Any, str]:
+    """Busca o prompt e renderiza o template com as variáveis informadas."""
+    prompt = await get_prompt_by_id(prompt_id)
     if not prompt:
         raise HTTPException(status_code=404, detail="Prompt não encontrado")
     
     try:
-        rendered = prompt.template.format(**vars_dict)
+        # Template compilado uma vez por (prompt, versão); aqui é só substituição
+        compiled = template_cache.get(prompt.id, prompt.version, prompt.template)
+        rendered = compiled.render(vars_dict)
+    except MissingVariablesError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except KeyError as e:
         raise HTTPException(
             status_code=400, 
             detail=f"Variável {str(e)} mencionada no template, mas não fornecida nos parâmetros"
         )
+    except TemplateError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return prompt, rendered
 
-    # Seleciona engine de IA
-    generate_fn, is_async = await _select_model_fn(ia_model)
-    
-    # Customiza o prompt final dependendo do tipo de input
-    if user_input["type"] == "text":
-        final_prompt = f"{rendered}\n\nUser Input: {user_input['content']}"
-    elif user_input["type"] == "image":
+def _build_final_prompt(rendered: str, user_input: Dict[str, Any]) -> str:
+    """Customiza o prompt final dependendo do tipo de input."""
+    if user_input["type"] == "image":
         # Para imagens, incorporamos os dados base64 diretamente
-        final_prompt = f"{rendered}\n\nAnalyze the following image:\n{user_input['content']}"
-    else:
-        final_prompt = f"{rendered}\n\nUser Input: {user_input['content']}"
+        return f"{rendered}\n\nAnalyze the following image:\n{user_input['content']}"
+    return f"{rendered}\n\nUser Input: {user_input['content']}"
+
+async def _execute_common(payload: ExecutionIn) -> ExecutionOut:
+    """Lógica comum de execução a partir de um ExecutionIn validado."""
+    with EXECUTIONS_IN_FLIGHT.labels("execute").track_inprogress():
+        return await _execute(payload)
+
+async def _execute(payload: ExecutionIn) -> ExecutionOut:
+    requested_model = payload.ia_model or "gemini-1.5"
 
-    # Executa IA e mede latência
+    # Extrai apenas o texto ou conteúdo dos inputs
+    user_input, input_payload = await _prepare_input(payload)
+
+    # Busca e renderiza o prompt
+    prompt, rendered = await _render_prompt(payload.prompt_id, payload.variables)
+    final_prompt = _build_final_prompt(rendered, user_input)
+
+    # Roteia o modelo (modelo concreto ou classe) e seleciona engine de IA
+    routing = _route_model(requested_model, final_prompt, user_input)
+    ia_model = routing["model"]
+    generate_fn, is_async = await _select_model_fn(ia_model)
+
+    # Chave que identifica execuções idênticas (cache e coalescência)
+    request_key = None
+    if settings.RESPONSE_CACHE_ENABLED or settings.SINGLEFLIGHT_ENABLED:
+        request_key = make_cache_key(payload.prompt_id, rendered, user_input["content"], ia_model)
+
+    # Consulta o cache de respostas antes de chamar o provedor
+    cached = None
     start = time.time()
-    try:
-        logger.info(f"Executando modelo {ia_model} com prompt: {rendered[:100]}...")
-        
-        if is_async:
-            result = await generate_fn(final_prompt, ia_model)
-        else:
-            result = generate_fn(final_prompt, ia_model)
-            
-        # Converte resultado para formato serializável se necessário
-        serializable_result = _ensure_serializable(result)
-        logger.info(f"Resposta recebida do modelo {ia_model} com {len(str(serializable_result))} caracteres")
-        
-    except Exception as e:
-        logger.error(f"Erro ao executar modelo {ia_model}: {str(e)}")
-        serializable_result = f"Erro ao executar modelo {ia_model}: {str(e)}"
-        
-    latency_ms = int((time.time() - start) * 1000)
+    if settings.RESPONSE_CACHE_ENABLED:
+        cached = await response_cache.get(request_key)
+
+    cache_info = None
+    coalesced = False
+    answered_by = ia_model
+    hedge_info = None
+    fallback_info = None
+    failed = False
+    if cached:
+        entry, tier = cached
+        serializable_result = entry["output"]
+        latency_ms = int((time.time() - start) * 1000)
+        cache_info = {
+            "hit": True,
+            "tier": tier,
+            "saved_latency_ms": max(entry["latency_ms"] - latency_ms, 0),
+        }
+        logger.info(f"Cache hit ({tier}) para o modelo {ia_model}")
+    else:
+        # Executa IA e mede latência
+        hedge = settings.HEDGE_ENABLED if payload.hedge is None else payload.hedge
+        chain = _fallback_chain(prompt, ia_model)
+        start = time.time()
+        try:
+            if settings.SINGLEFLIGHT_ENABLED:
+                # Requisições idênticas em andamento compartilham uma única chamada ao provedor
+                call, coalesced = await inflight_executions.do(
+                    request_key,
+                    lambda: _call_with_fallback(generate_fn, is_async, final_prompt, ia_model, hedge, chain),
+                )
+            else:
+                call = await _call_with_fallback(generate_fn, is_async, final_prompt, ia_model, hedge, chain)
+        except RateLimitTimeout as e:
+            # Sobrecarga não é resposta do modelo: devolve 503 em vez de gravar um erro
+            raise _rate_limited(e)
+        latency_ms = int((time.time() - start) * 1000)
+        serializable_result = call["output"]
+        answered_by = call["answered_by"]
+        hedge_info = call["hedge"]
+        fallback_info = call.get("fallback")
+        failed = call["failed"]
+
+        # Apenas respostas bem-sucedidas entram no cache (uma vez por chamada real)
+        if settings.RESPONSE_CACHE_ENABLED and not call["failed"] and not coalesced:
+            await response_cache.set(request_key, {"output": serializable_result, "latency_ms": latency_ms})
+
     cost = 0.0
 
     # Persiste métricas de execução
     try:
-        await create_execution({
+        execution_doc = {
             "prompt_id": payload.prompt_id,
             "input": input_payload,
             "output": serializable_result,
             "ia_model": ia_model,
             "latency_ms": latency_ms,
             "cost": cost,
-        })
+            "error": failed,
+            "routing": routing,
+        }
+        if cache_info:
+            execution_doc["cache"] = cache_info
+        if coalesced:
+            execution_doc["coalesced"] = True
+        if answered_by != ia_model:
+            execution_doc["answered_by"] = answered_by
+        if hedge_info:
+            execution_doc["hedge"] = hedge_info
+        if fallback_info:
+            execution_doc["fallback"] = fallback_info
+        # Enfileira para gravação em lote: a request não espera o MongoDB
+        await record_execution(execution_doc)
     except Exception as e:
         logger.error(f"Erro ao salvar execução no banco de dados: {str(e)}")
         # Não falha a request se não conseguir salvar métricas
 
-    return ExecutionOut(output=serializable_result, latency_ms=latency_ms, cost=cost)
+    return ExecutionOut(
+        output=serializable_result,
+        latency_ms=latency_ms,
+        cost=cost,
+        cache_hit=bool(cache_info),
+        cache_tier=cache_info["tier"] if cache_info else None,
+        saved_latency_ms=cache_info["saved_latency_ms"] if cache_info else None,
+        answered_by=answered_by,
+        hedged=bool(hedge_info and hedge_info["fired"]),
+        fallback=bool(fallback_info and fallback_info["used"]),
+        error=failed,
+    )
+
+async def _invoke_model(generate_fn, is_async: bool, final_prompt: str, ia_model: str) -> Tuple[Any, bool]:
+    """
+    Chama o provedor de IA e retorna `(resultado serializável, falhou)`.
+    Erros do provedor viram uma mensagem de erro como output, sem derrubar a request.
+
+    A chamada respeita os limites de concorrência e de taxa do provedor/modelo;
+    se a espera por vaga passar do máximo, levanta RateLimitTimeout.
+    """
+    async with rate_limiter.limit(ia_model, estimate_tokens(final_prompt)):
+        start = time.time()
+        try:
+            logger.info(f"Executando modelo {ia_model} com prompt: {final_prompt[:100]}...")
+            
+            if is_async:
+                result = await generate_fn(final_prompt, ia_model)
+            else:
+                result = generate_fn(final_prompt, ia_model)
+                
+            # Converte resultado para formato serializável se necessário
+            serializable_result = _ensure_serializable(result)
+            logger.info(f"Resposta recebida do modelo {ia_model} com {len(str(serializable_result))} caracteres")
+            rate_limiter.record_result(ia_model)
+            model_stats.record(ia_model, int((time.time() - start) * 1000), ok=True)
+            observe_provider_call(provider_for_model(ia_model), ia_model, "ok", time.time() - start)
+            return serializable_result, False
+
+        except asyncio.CancelledError:
+            # Perdeu para o hedge (ou a request caiu): conta como amostra de latência mínima
+            model_stats.record_cancelled(ia_model, int((time.time() - start) * 1000))
+            raise
+            
+        except Exception as e:
+            logger.error(f"Erro ao executar modelo {ia_model}: {str(e)}")
+            # Um 429 reduz a taxa do limitador (respeitando o Retry-After)
+            rate_limiter.record_result(ia_model, e)
+            model_stats.record(ia_model, int((time.time() - start) * 1000), ok=False)
+            observe_provider_call(provider_for_model(ia_model), ia_model, provider_status(e), time.time() - start)
+            return f"Erro ao executar modelo {ia_model}: {str(e)}", True
+
+async def _call_model(generate_fn, is_async: bool, final_prompt: str, ia_model: str, hedge: bool) -> Dict[str, Any]:
+    """
+    Chama o modelo, opcionalmente com hedging: se o primário demorar mais que o
+    percentil configurado da sua latência recente, o secundário também é acionado
+    e a primeira resposta bem-sucedida vence.
+
+    Returns:
+        Dict: `output`, `failed`, `answered_by` (modelo que respondeu) e `hedge`
+        (None quando o hedging não se aplicava).
+    """
+    plan = hedge_plan(ia_model) if hedge else None
+    if plan is None:
+        output, failed = await _invoke_model(generate_fn, is_async, final_prompt, ia_model)
+        return {"output": output, "failed": failed, "answered_by": ia_model, "hedge": None}
+
+    secondary_model, delay_s = plan
+    secondary_fn, secondary_is_async = await _select_model_fn(secondary_model)
+
+    async def secondary():
+        try:
+            return await _invoke_model(secondary_fn, secondary_is_async, final_prompt, secondary_model)
+        except RateLimitTimeout as e:
+            # Sem vaga no secundário: o hedge simplesmente não ajuda
+            return str(e), True
+
+    (output, failed), fired, secondary_won = await hedged_call(
+        lambda: _invoke_model(generate_fn, is_async, final_prompt, ia_model),
+        secondary,
+        delay_s,
+        is_success=lambda r: not r[1],
+    )
+    if fired:
+        logger.info(f"Hedge disparado para {ia_model} após {delay_s * 1000:.0f}ms; respondeu {secondary_model if secondary_won else ia_model}")
+    return {
+        "output": output,
+        "failed": failed,
+        "answered_by": secondary_model if secondary_won else ia_model,
+        "hedge": {
+            "fired": fired,
+            "delay_ms": int(delay_s * 1000),
+            "secondary_model": secondary_model,
+        },
+    }
+
+def _fallback_chain(prompt, ia_model: str) -> List[str]:
+    """Cadeia de fallback do prompt ou, se vazia, a padrão do modelo (sem o próprio modelo)."""
+    chain = getattr(prompt, "fallback_models", None) or settings.FALLBACK_MODELS.get(ia_model, [])
+    return [m for m in chain if m != ia_model]
+
+async def _call_with_fallback(generate_fn, is_async: bool, final_prompt: str, ia_model: str, hedge: bool, chain: List[str]) -> Dict[str, Any]:
+    """
+    Chama o modelo (via `_call_model`) e, se ele falhar ou estiver com o circuito
+    aberto, tenta os modelos da cadeia em ordem, pulando os de circuito aberto.
+
+    Returns:
+        Dict: o mesmo de `_call_model` mais `fallback` (None sem cadeia), com
+        a cadeia, as tentativas que falharam e se um fallback respondeu.
+    """
+    if not chain:
+        return {**await _call_model(generate_fn, is_async, final_prompt, ia_model, hedge), "fallback": None}
+
+    tried = []
+    call = None
+    rate_limited = None
+    if breakers.allows(ia_model):
+        try:
+            call = await _call_model(generate_fn, is_async, final_prompt, ia_model, hedge)
+        except RateLimitTimeout as e:
+            rate_limited = e
+            tried.append({"model": ia_model, "error": str(e)})
+        else:
+            if not call["failed"]:
+                return {**call, "fallback": {"chain": chain, "tried": [], "used": False}}
+            tried.append({"model": ia_model, "error": call["output"]})
+    else:
+        tried.append({"model": ia_model, "error": "circuito aberto"})
+
+    for model in chain:
+        if not breakers.allows(model):
+            tried.append({"model": model, "error": "circuito aberto"})
+            continue
+        fn, fn_is_async = await _select_model_fn(model)
+        try:
+            output, failed = await _invoke_model(fn, fn_is_async, final_prompt, model)
+        except RateLimitTimeout as e:
+            tried.append({"model": model, "error": str(e)})
+            continue
+        if not failed:
+            logger.info(f"Fallback: {model} respondeu no lugar de {ia_model}")
+            return {
+                "output": output,
+                "failed": False,
+                "answered_by": model,
+                "hedge": call["hedge"] if call else None,
+                "fallback": {"chain": chain, "tried": tried, "used": True},
+            }
+        tried.append({"model": model, "error": output})
+
+    # Nenhum modelo respondeu: sobrecarga do primário vira 503, senão grava o erro
+    if rate_limited:
+        raise rate_limited
+    return {
+        "output": call["output"] if call else tried[0]["error"],
+        "failed": True,
+        "answered_by": ia_model,
+        "hedge": call["hedge"] if call else None,
+        "fallback": {"chain": chain, "tried": tried, "used": False},
+    }
+
+def _rate_limited(e: RateLimitTimeout) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=str(e),
+        headers={"Retry-After": str(max(int(e.retry_after_s), 1))},
+    )
 
 def _ensure_serializable(result: Any) -> Any:
     """
@@ -158,26 +465,31 @@ def _ensure_serializable(result: Any) -> Any:
         # Em caso de erro, retorna uma representação genérica do objeto
         return f"Resposta não serializável: {type(result).__name__}"
 
-@router.post("", response_model=ExecutionOut)
-async def execute_default(
-    prompt_id: str = Form(...),
-    ia_model: str = Form("gemini-1.5"),
-    variables: str = Form("{}"),
-    input_text: Optional[str] = Form(None),
-    input_file: Optional[UploadFile] = File(None),
-):
-    """
-    Executa um prompt de IA (texto ou arquivo) via multipart/form-data.
-    """
+def _build_payload(
+    prompt_id: str,
+    ia_model: str,
+    variables: str,
+    input_text: Optional[str],
+    input_file: Optional[UploadFile],
+    hedge: Optional[bool] = None,
+    pages: Optional[str] = None,
+) -> ExecutionIn:
+    """Valida os campos do multipart/form-data e monta o ExecutionIn."""
     try:
         vars_dict = json.loads(variables)
     except json.JSONDecodeError:
         raise HTTPException(status_code=400, detail="O campo `variables` deve ser um JSON válido")
+    try:
+        parse_page_ranges(pages)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Campo `pages` inválido: {e}")
     
     payload_data: Dict[str, Any] = {
         "prompt_id": prompt_id,
         "ia_model": ia_model,
         "variables": vars_dict,
+        "hedge": hedge,
+        "pages": pages,
     }
     
     if input_text:
@@ -187,9 +499,240 @@ async def execute_default(
     else:
         raise HTTPException(status_code=400, detail="É preciso enviar `input_text` ou um `input_file`")
 
-    payload = ExecutionIn(**payload_data)
+    return ExecutionIn(**payload_data)
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """Formata um evento Server-Sent Events."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _stream_common(payload: ExecutionIn) -> StreamingResponse:
+    """
+    Executa o prompt em streaming (SSE): envia cada trecho da resposta assim que
+    chega e, ao final, persiste a execução com `latency_ms` e `ttft_ms`.
+    """
+    requested_model = payload.ia_model or "gemini-1.5"
+
+    # Erros de input/prompt são levantados antes de abrir o stream (viram 4xx normais)
+    user_input, input_payload = await _prepare_input(payload)
+    prompt, rendered = await _render_prompt(payload.prompt_id, payload.variables)
+    final_prompt = _build_final_prompt(rendered, user_input)
+    routing = _route_model(requested_model, final_prompt, user_input)
+    ia_model = routing["model"]
+    stream_fn = await _select_stream_fn(ia_model)
+
+    async def event_stream() -> AsyncIterator[str]:
+        chunks = []
+        ttft_ms = None
+        output = None
+        start = time.time()
+        in_flight = EXECUTIONS_IN_FLIGHT.labels("stream")
+        in_flight.inc()
+        try:
+            async with rate_limiter.limit(ia_model, estimate_tokens(final_prompt)):
+                logger.info(f"Executando modelo {ia_model} em streaming com prompt: {final_prompt[:100]}...")
+                async for text in stream_fn(final_prompt, ia_model):
+                    if ttft_ms is None:
+                        ttft_ms = int((time.time() - start) * 1000)
+                    chunks.append(text)
+                    yield _sse("token", {"text": text})
+            rate_limiter.record_result(ia_model)
+            observe_provider_call(provider_for_model(ia_model), ia_model, "ok", time.time() - start)
+        except Exception as e:
+            logger.error(f"Erro ao executar modelo {ia_model} em streaming: {str(e)}")
+            rate_limiter.record_result(ia_model, e)
+            observe_provider_call(provider_for_model(ia_model), ia_model, provider_status(e), time.time() - start)
+            output = f"Erro ao executar modelo {ia_model}: {str(e)}"
+            yield _sse("error", {"detail": output})
+        finally:
+            in_flight.dec()
+
+        latency_ms = int((time.time() - start) * 1000)
+        failed = output is not None
+        if output is None:
+            output = "".join(chunks)
+        cost = 0.0
+
+        # Persiste métricas de execução
+        try:
+            await record_execution({
+                "prompt_id": payload.prompt_id,
+                "input": input_payload,
+                "output": output,
+                "ia_model": ia_model,
+                "latency_ms": latency_ms,
+                "ttft_ms": ttft_ms,
+                "cost": cost,
+                "error": failed,
+                "streamed": True,
+                "routing": routing,
+            })
+        except Exception as e:
+            logger.error(f"Erro ao salvar execução no banco de dados: {str(e)}")
+
+        yield _sse("done", {"latency_ms": latency_ms, "ttft_ms": ttft_ms, "cost": cost})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Evita que proxies (nginx) acumulem o stream em buffer
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def _batch_results(payload: BatchExecutionIn, rendered: str, requested_model: str) -> AsyncIterator[str]:
+    """
+    Distribui os inputs entre `concurrency` workers e produz uma linha NDJSON
+    por resultado, na ordem em que terminam. As execuções são gravadas em lotes.
+    O modelo é roteado uma vez para o lote inteiro.
+    """
+    routing = _route_model(requested_model, rendered, {"type": "text"})
+    ia_model = routing["model"]
+    generate_fn, is_async = await _select_model_fn(ia_model)
+    concurrency = min(
+        payload.concurrency or settings.BATCH_DEFAULT_CONCURRENCY,
+        settings.BATCH_MAX_CONCURRENCY,
+        len(payload.inputs),
+    )
+
+    pending = iter(enumerate(payload.inputs))
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def worker():
+        for index, text in pending:
+            user_input = {"type": "text", "content": text}
+            final_prompt = _build_final_prompt(rendered, user_input)
+            start = time.time()
+            try:
+                with EXECUTIONS_IN_FLIGHT.labels("batch").track_inprogress():
+                    output, failed = await _invoke_model(generate_fn, is_async, final_prompt, ia_model)
+            except RateLimitTimeout as e:
+                output, failed = str(e), True
+            latency_ms = int((time.time() - start) * 1000)
+            await results.put((index, text, output, failed, latency_ms))
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    buffer = []
+
+    async def flush():
+        docs = buffer[:]
+        buffer.clear()
+        try:
+            await create_executions_bulk(docs)
+        except Exception as e:
+            logger.error(f"Erro ao salvar lote de {len(docs)} execuções no banco de dados: {str(e)}")
+
+    try:
+        for _ in range(len(payload.inputs)):
+            index, text, output, failed, latency_ms = await results.get()
+            cost = 0.0
+            buffer.append({
+                "prompt_id": payload.prompt_id,
+                "input": {"type": "text", "data": text},
+                "output": output,
+                "ia_model": ia_model,
+                "latency_ms": latency_ms,
+                "cost": cost,
+                "error": failed,
+                "batch": True,
+                "routing": routing,
+            })
+            if len(buffer) >= settings.BATCH_INSERT_CHUNK:
+                await flush()
+
+            line = {"index": index, "output": output, "latency_ms": latency_ms, "cost": cost, "error": failed}
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+    finally:
+        # Cliente desconectou ou o lote terminou: encerra os workers e grava o restante
+        for w in workers:
+            w.cancel()
+        if buffer:
+            await flush()
+
+@router.post("", response_model=ExecutionOut)
+async def execute_default(
+    prompt_id: str = Form(...),
+    ia_model: str = Form("gemini-1.5"),
+    variables: str = Form("{}"),
+    input_text: Optional[str] = Form(None),
+    input_file: Optional[UploadFile] = File(None),
+    hedge: Optional[bool] = Form(None),
+    pages: Optional[str] = Form(None, description="Páginas do PDF (ex: 1-3,7)"),
+):
+    """
+    Executa um prompt de IA (texto ou arquivo) via multipart/form-data.
+    """
+    payload = _build_payload(prompt_id, ia_model, variables, input_text, input_file, hedge, pages)
     return await _execute_common(payload)
 
+@router.post("/stream")
+async def execute_stream_default(
+    prompt_id: str = Form(...),
+    ia_model: str = Form("gemini-1.5"),
+    variables: str = Form("{}"),
+    input_text: Optional[str] = Form(None),
+    input_file: Optional[UploadFile] = File(None),
+    pages: Optional[str] = Form(None, description="Páginas do PDF (ex: 1-3,7)"),
+):
+    """
+    Executa um prompt de IA e devolve a resposta em streaming (Server-Sent Events).
+
+    Eventos: `token` (trecho da resposta), `error` e `done` (latência total e time-to-first-token).
+    """
+    payload = _build_payload(prompt_id, ia_model, variables, input_text, input_file, pages=pages)
+    return await _stream_common(payload)
+
+@router.post("/stream/{ia_model}")
+async def execute_stream_with_model(
+    ia_model: str = Path(..., description="Nome do modelo de IA (ex: gemini-1.5)"),
+    prompt_id: str = Form(...),
+    variables: str = Form("{}"),
+    input_text: Optional[str] = Form(None),
+    input_file: Optional[UploadFile] = File(None),
+    pages: Optional[str] = Form(None, description="Páginas do PDF (ex: 1-3,7)"),
+):
+    """
+    Executa um prompt em streaming (SSE) usando o modelo especificado na URL.
+    """
+    payload = _build_payload(prompt_id, ia_model, variables, input_text, input_file, pages=pages)
+    return await _stream_common(payload)
+
+@router.get("/limits")
+async def limits():
+    """Estado atual dos limitadores por provedor/modelo (vagas, filas e taxas)."""
+    return rate_limiter.snapshot()
+
+@router.get("/breakers")
+async def breakers_state():
+    """Estado dos circuit breakers por provedor/modelo (closed, open, half_open)."""
+    return breakers.snapshot()
+
+@router.get("/routing")
+async def routing_state():
+    """Classes de roteamento, tabela de custos e estatísticas (EWMA) usadas nas decisões."""
+    return model_router.snapshot()
+
+@router.post("/batch")
+async def execute_batch(payload: BatchExecutionIn):
+    """
+    Executa um prompt contra vários inputs de texto.
+
+    O prompt é buscado e renderizado uma única vez; cada resultado é devolvido
+    como uma linha NDJSON (`index`, `output`, `latency_ms`, `cost`, `error`)
+    assim que fica pronto.
+    """
+    if len(payload.inputs) > settings.BATCH_MAX_INPUTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"O lote aceita no máximo {settings.BATCH_MAX_INPUTS} inputs",
+        )
+
+    ia_model = payload.ia_model or "gemini-1.5"
+    prompt, rendered = await _render_prompt(payload.prompt_id, payload.variables)
+
+    return StreamingResponse(
+        _batch_results(payload, rendered, ia_model),
+        media_type="application/x-ndjson",
+    )
+
 @router.post("/{ia_model}", response_model=ExecutionOut)
 async def execute_with_model(
     ia_model: str = Path(..., description="Nome do modelo de IA (ex: gemini-1.5)"),
@@ -197,27 +740,11 @@ async def execute_with_model(
     variables: str = Form("{}"),
     input_text: Optional[str] = Form(None),
     input_file: Optional[UploadFile] = File(None),
+    hedge: Optional[bool] = Form(None),
+    pages: Optional[str] = Form(None, description="Páginas do PDF (ex: 1-3,7)"),
 ):
     """
     Executa um prompt de IA usando o modelo especificado na URL via multipart/form-data.
     """
-    try:
-        vars_dict = json.loads(variables)
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=400, detail="O campo `variables` deve ser um JSON válido")
-        
-    payload_data: Dict[str, Any] = {
-        "prompt_id": prompt_id,
-        "ia_model": ia_model,
-        "variables": vars_dict,
-    }
-    
-    if input_text:
-        payload_data["input"] = InputPayload(type="text", data=input_text)
-    elif input_file:
-        payload_data["input_file"] = input_file
-    else:
-        raise HTTPException(status_code=400, detail="É preciso enviar `input_text` ou um `input_file`")
-
-    payload = ExecutionIn(**payload_data)
-    return await _execute_common(payload)
\ No newline at end of file
+    payload = _build_payload(prompt_id, ia_model, variables, input_text, input_file, hedge, pages)
+    return await _execute_common(payload)
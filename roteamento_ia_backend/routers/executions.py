@@ -0,0 +1,227 @@
+import asyncio
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from bson import ObjectId
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from roteamento_ia_backend.core.config import settings
+from roteamento_ia_backend.db.archive import execution_archive
+from roteamento_ia_backend.db.crud import executions_filter, get_executions_page, iter_executions
+from roteamento_ia_backend.db.pagination import InvalidCursor
+from roteamento_ia_backend.db.schemas import (
+    ArchivePartition, ArchiveRestoreIn, ArchiveRestoreOut, ArchiveStats, ExecutionPage,
+)
+from roteamento_ia_backend.routers.params import parse_fields, utc_window
+
+router = APIRouter()
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+# Colunas do CSV quando `fields` não é informado (input/output ficam de fora)
+CSV_DEFAULT_FIELDS = [
+    "_id", "prompt_id", "ia_model", "answered_by", "latency_ms", "ttft_ms",
+    "cost", "error", "streamed", "batch", "created_at",
+]
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, (ObjectId, bytes)):
+        return str(obj)
+    raise TypeError(f"Tipo não serializável: {type(obj).__name__}")
+
+
+def _json_line(doc: dict) -> str:
+    return json.dumps(doc, default=_json_default, ensure_ascii=False) + "\n"
+
+
+def _lookup(doc: dict, path: str) -> Any:
+    value: Any = doc
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=_json_default, ensure_ascii=False)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+async def _export_chunks(query: dict, fields: Optional[List[str]], fmt: str) -> AsyncIterator[str]:
+    """
+    Gera o export em blocos de EXPORT_BATCH_SIZE documentos: só um batch do
+    cursor fica em memória, independente do tamanho do resultado.
+    """
+    if fmt == "csv":
+        fields = fields or CSV_DEFAULT_FIELDS
+    projection = None
+    if fields:
+        projection = {f: 1 for f in fields}
+        if "_id" not in fields:
+            projection["_id"] = 0
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    if writer:
+        writer.writerow(fields)
+    pending = 0
+    async for doc in iter_executions(query, projection, settings.EXPORT_BATCH_SIZE):
+        if writer:
+            writer.writerow([_csv_value(_lookup(doc, f)) for f in fields])
+        else:
+            buffer.write(_json_line(doc))
+        pending += 1
+        if pending >= settings.EXPORT_BATCH_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+async def _gzipped(chunks: AsyncIterator[str]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)  # formato gzip
+    async for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _require_archive() -> None:
+    # Sem volume persistente, arquivar apagaria execuções do MongoDB para um disco efêmero
+    if not settings.ARCHIVE_ENABLED:
+        raise HTTPException(409, "Arquivamento desabilitado (ARCHIVE_ENABLED=false)")
+
+
+@router.get("/", response_model=ExecutionPage)
+async def list_executions(
+    limit: int = Query(50, ge=1, le=settings.PAGE_MAX_LIMIT),
+    cursor: Optional[str] = Query(None, description="next_cursor da página anterior"),
+    prompt_id: Optional[str] = None,
+    ia_model: Optional[str] = None,
+    since: Optional[datetime] = Query(None, alias="from", description="Início da janela (ISO 8601)"),
+    until: Optional[datetime] = Query(None, alias="to", description="Fim da janela, exclusivo (ISO 8601)"),
+    fields: Optional[str] = Query(None, description="Campos separados por vírgula (ex: ia_model,latency_ms)"),
+):
+    """
+    Execuções das mais recentes para as mais antigas, paginadas por cursor
+    (keyset em `_id`): o custo de cada página não depende da profundidade.
+    """
+    since, until = utc_window(since, until)
+    selected = parse_fields(fields)
+    projection = {f: 1 for f in selected} if selected else None
+    try:
+        docs, next_cursor = await get_executions_page(
+            limit, cursor, executions_filter(prompt_id, ia_model, since, until), projection
+        )
+    except InvalidCursor as e:
+        raise HTTPException(400, str(e))
+    return ExecutionPage(items=[json.loads(_json_line(d)) for d in docs], next_cursor=next_cursor)
+
+
+@router.get("/export")
+async def export(
+    format: str = Query("ndjson", description="ndjson ou csv"),
+    prompt_id: Optional[str] = None,
+    ia_model: Optional[str] = None,
+    since: Optional[datetime] = Query(None, alias="from", description="Início da janela (ISO 8601)"),
+    until: Optional[datetime] = Query(None, alias="to", description="Fim da janela, exclusivo (ISO 8601)"),
+    fields: Optional[str] = Query(None, description="Campos separados por vírgula (ex: _id,ia_model,latency_ms)"),
+    gzip: bool = Query(False, description="Comprime o arquivo (.gz)"),
+):
+    """
+    Exporta as execuções do MongoDB em NDJSON ou CSV, em streaming (cursor em
+    batches). Execuções já arquivadas saem por `/executions/archive/query`.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(400, f"format deve ser um de: {', '.join(EXPORT_FORMATS)}")
+    since, until = utc_window(since, until)
+    query = executions_filter(prompt_id, ia_model, since, until)
+    chunks = _export_chunks(query, parse_fields(fields), format)
+
+    file_name = f"executions.{format}"
+    media_type = EXPORT_FORMATS[format]
+    if gzip:
+        chunks = _gzipped(chunks)
+        file_name += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{file_name}"'},
+    )
+
+
+@router.get("/archive", response_model=List[ArchivePartition])
+async def list_archive(
+    prompt_id: Optional[str] = None,
+    since: Optional[datetime] = Query(None, alias="from", description="Início da janela (ISO 8601)"),
+    until: Optional[datetime] = Query(None, alias="to", description="Fim da janela, exclusivo (ISO 8601)"),
+):
+    """Arquivos de execuções antigas (um por dia × prompt)."""
+    since, until = utc_window(since, until)
+    parts = await asyncio.to_thread(execution_archive.partitions, prompt_id, since, until)
+    return [
+        ArchivePartition(day=p["day"].isoformat(), prompt_id=p["prompt_id"], size_bytes=p["size_bytes"])
+        for p in parts
+    ]
+
+
+@router.get("/archive/stats", response_model=ArchiveStats)
+async def archive_stats():
+    stats = await asyncio.to_thread(execution_archive.stats)
+    return ArchiveStats(enabled=settings.ARCHIVE_ENABLED, **stats)
+
+
+@router.get("/archive/query")
+async def query_archive(
+    prompt_id: Optional[str] = None,
+    ia_model: Optional[str] = None,
+    since: Optional[datetime] = Query(None, alias="from", description="Início da janela (ISO 8601)"),
+    until: Optional[datetime] = Query(None, alias="to", description="Fim da janela, exclusivo (ISO 8601)"),
+):
+    """
+    Execuções arquivadas em NDJSON (uma por linha), lidas direto dos arquivos
+    sem voltar ao MongoDB. A leitura é feita em streaming, arquivo por arquivo.
+    """
+    since, until = utc_window(since, until)
+
+    # Gerador síncrono: o Starlette itera fora do event loop (leitura gzip bloqueante)
+    def lines() -> Iterator[str]:
+        for doc in execution_archive.iter_archived(prompt_id, since, until, ia_model):
+            yield _json_line(doc)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.post("/archive/restore", response_model=ArchiveRestoreOut)
+async def restore_archive(body: ArchiveRestoreIn):
+    """
+    Copia execuções arquivadas de volta para o MongoDB (ex: para rodar
+    `/prompts/{id}/metrics` num período antigo). Elas expiram sozinhas.
+    """
+    _require_archive()
+    restored = await execution_archive.restore(body.since, body.until, body.prompt_id, body.ia_model)
+    return ArchiveRestoreOut(restored=restored, expires_in_hours=settings.ARCHIVE_RESTORE_TTL_HOURS)
+
+
+@router.post("/archive/run")
+async def run_archive():
+    """Executa um ciclo de arquivamento agora, sem esperar o intervalo."""
+    _require_archive()
+    return {"archived": await execution_archive.archive_once()}
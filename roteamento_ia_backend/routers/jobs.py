@@ -0,0 +1,76 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Form, File, UploadFile, status
+
+from roteamento_ia_backend.core.config import settings
+from roteamento_ia_backend.db.schemas import JobSubmitted, JobOut, JobQueueStats
+from roteamento_ia_backend.db.crud import enqueue_job, get_job, get_job_queue_stats
+from roteamento_ia_backend.db.blob_store import put_blob
+from roteamento_ia_backend.routers.execute import _build_payload
+
+router = APIRouter()
+
+@router.post("/", response_model=JobSubmitted, status_code=status.HTTP_202_ACCEPTED)
+async def submit(
+    prompt_id: str = Form(...),
+    ia_model: str = Form("gemini-1.5"),
+    variables: str = Form("{}"),
+    input_text: Optional[str] = Form(None),
+    input_file: Optional[UploadFile] = File(None),
+    pages: Optional[str] = Form(None, description="Páginas do PDF (ex: 1-3,7)"),
+):
+    """
+    Enfileira uma execução (mesmos campos do /execute) e retorna o id do job
+    imediatamente. Consulte o resultado em `GET /jobs/{job_id}`.
+    """
+    payload = _build_payload(prompt_id, ia_model, variables, input_text, input_file, pages=pages)
+
+    job_payload = {
+        "prompt_id": payload.prompt_id,
+        "ia_model": payload.ia_model,
+        "variables": payload.variables,
+    }
+    if payload.input:
+        job_payload["input_text"] = payload.input.data
+    else:
+        data = await payload.input_file.read()
+        if not data:
+            raise HTTPException(status_code=400, detail="Empty file")
+        if len(data) > settings.JOB_MAX_FILE_BYTES:
+            raise HTTPException(status_code=413, detail="Arquivo excede o tamanho máximo para jobs")
+        job_payload["file"] = {
+            "file_name": payload.input_file.filename,
+            "mime_type": payload.input_file.content_type,
+        }
+        if settings.BLOB_STORE_ENABLED:
+            # O job guarda só a referência: o arquivo vai para o blob store (deduplicado)
+            ref = await put_blob(data, payload.input_file.content_type, payload.input_file.filename)
+            job_payload["file"]["blob"] = ref["sha256"]
+        else:
+            # Blob store desligado: os bytes ficam no próprio job (até JOB_MAX_FILE_BYTES)
+            job_payload["file"]["data"] = data
+        if payload.pages:
+            job_payload["pages"] = payload.pages
+
+    job_id = await enqueue_job(job_payload, settings.JOB_MAX_ATTEMPTS)
+    return JobSubmitted(id=job_id, status="queued")
+
+@router.get("/stats", response_model=JobQueueStats)
+async def stats():
+    """Profundidade da fila e tempo de espera, para dimensionar os workers."""
+    return JobQueueStats(workers=settings.JOB_WORKERS, **await get_job_queue_stats())
+
+@router.get("/{job_id}", response_model=JobOut)
+async def retrieve(job_id: str):
+    job = await get_job(job_id)
+    if not job:
+        raise HTTPException(404, "Job not found")
+    return JobOut(
+        id=str(job["_id"]),
+        status=job["status"],
+        attempts=job["attempts"],
+        created_at=job["created_at"],
+        started_at=job.get("started_at"),
+        finished_at=job.get("finished_at"),
+        result=job.get("result"),
+        error=job.get("error"),
+    )
@@ -0,0 +1,38 @@
+import re
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+
+_FIELD_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z0-9_]+)*$")
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Lista de campos do parâmetro `fields` (separados por vírgula), pronta para projeção."""
+    if not fields:
+        return None
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    invalid = [f for f in names if not _FIELD_NAME.match(f)]
+    if invalid:
+        raise HTTPException(400, f"Campos inválidos em 'fields': {', '.join(invalid)}")
+    names = list(dict.fromkeys(names))
+    # `a` e `a.b` juntos colidem na projeção do MongoDB: `a` já inclui `a.b`
+    return [
+        f for f in names
+        if not any(f.startswith(parent + ".") for parent in names if parent != f)
+    ]
+
+
+def as_utc(ts: Optional[datetime]) -> Optional[datetime]:
+    """Datas sem fuso são tratadas como UTC."""
+    if ts is None:
+        return None
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def utc_window(since: Optional[datetime], until: Optional[datetime]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Janela `from`/`to` em UTC; 400 se `from` não for anterior a `to`."""
+    since, until = as_utc(since), as_utc(until)
+    if since and until and since >= until:
+        raise HTTPException(400, "'from' deve ser anterior a 'to'")
+    return since, until
@@ -1,36 +1,82 @@
-from typing import List
-from fastapi import APIRouter, HTTPException, status
-from roteamento_ia_backend.db.schemas import PromptCreate, PromptOut, PromptMetrics
+from datetime import datetime, timezone
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, status
+from roteamento_ia_backend.db.schemas import PromptCreate, PromptOut, PromptListItem, PromptPage, PromptMetrics, PromptTimeSeries
 from roteamento_ia_backend.db.crud import (
     create_prompt, get_prompts, get_prompt_by_id,
-    update_prompt, delete_prompt, get_prompt_metrics
+    update_prompt, delete_prompt, get_prompt_metrics, prompt_cache,
+    get_execution_timeseries, prompts_filter, ROLLUP_GRANULARITIES
 )
+from roteamento_ia_backend.db.models import PromptModel
+from roteamento_ia_backend.db.pagination import InvalidCursor
+from roteamento_ia_backend.core.config import settings
+from roteamento_ia_backend.core.templates import TemplateError
+from roteamento_ia_backend.routers.params import as_utc, parse_fields, utc_window
+
+PROMPT_FIELDS = [f for f in PromptListItem.model_fields if f != "id"]
 
 router = APIRouter()
 
 @router.post("/", response_model=PromptOut, status_code=status.HTTP_201_CREATED)
 async def create(p: PromptCreate):
-    new = await create_prompt(p.dict())
+    try:
+        new = await create_prompt(p.dict())
+    except TemplateError as e:
+        raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY, str(e))
     return PromptOut(
         id=str(new.id),
         name=new.name,
         template=new.template,
         ia_model=new.ia_model,
-        variables=new.variables
+        variables=new.variables,
+        fallback_models=new.fallback_models
     )
 
-@router.get("/", response_model=List[PromptOut])
-async def list_all():
-    docs = await get_prompts()
-    return [
-        PromptOut(
-            id=str(d.id),
-            name=d.name,
-            template=d.template,
-            ia_model=d.ia_model,
-            variables=d.variables
-        ) for d in docs
-    ]
+@router.get("/", response_model=PromptPage, response_model_exclude_unset=True)
+async def list_all(
+    limit: int = Query(100, ge=1, le=settings.PAGE_MAX_LIMIT),
+    cursor: Optional[str] = Query(None, description="`next_cursor` da página anterior"),
+    ia_model: Optional[str] = None,
+    name_prefix: Optional[str] = None,
+    since: Optional[datetime] = Query(None, alias="from", description="Criados a partir de (ISO 8601)"),
+    until: Optional[datetime] = Query(None, alias="to", description="Criados antes de (ISO 8601)"),
+    fields: Optional[str] = Query(None, description="Campos separados por vírgula (ex: name,ia_model)"),
+):
+    """
+    Lista os prompts em ordem de criação, paginada por cursor: o token da
+    próxima página vem em `next_cursor` (None na última).
+    """
+    since, until = utc_window(since, until)
+    selected = parse_fields(fields)
+    if selected:
+        unknown = [f for f in selected if f not in PROMPT_FIELDS]
+        if unknown:
+            raise HTTPException(400, f"Campos inválidos em 'fields': {', '.join(unknown)}")
+    projection = {f: 1 for f in selected} if selected else None
+    try:
+        docs, next_cursor = await get_prompts(limit, cursor, prompts_filter(ia_model, name_prefix, since, until), projection)
+    except InvalidCursor as e:
+        raise HTTPException(400, str(e))
+
+    if selected:
+        items = [PromptListItem(id=str(d["_id"]), **{f: d[f] for f in selected if f in d}) for d in docs]
+    else:
+        items = [
+            PromptListItem(
+                id=str(d.id),
+                name=d.name,
+                template=d.template,
+                ia_model=d.ia_model,
+                variables=d.variables,
+                fallback_models=d.fallback_models
+            ) for d in (PromptModel(**doc) for doc in docs)
+        ]
+    return PromptPage(items=items, next_cursor=next_cursor)
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Hits, misses e invalidações do cache de prompts em memória deste worker."""
+    return prompt_cache.stats()
 
 @router.get("/{prompt_id}", response_model=PromptOut)
 async def retrieve(prompt_id: str):
@@ -42,12 +88,16 @@ async def retrieve(prompt_id: str):
         name=p.name,
         template=p.template,
         ia_model=p.ia_model,
-        variables=p.variables
+        variables=p.variables,
+        fallback_models=p.fallback_models
     )
 
 @router.put("/{prompt_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def update(prompt_id: str, p: PromptCreate):
-    ok = await update_prompt(prompt_id, p.dict())
+    try:
+        ok = await update_prompt(prompt_id, p.dict())
+    except TemplateError as e:
+        raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY, str(e))
     if not ok:
         raise HTTPException(404, "Prompt not found")
 
@@ -58,8 +108,40 @@ async def remove(prompt_id: str):
         raise HTTPException(404, "Prompt not found")
 
 @router.get("/{prompt_id}/metrics", response_model=PromptMetrics)
-async def metrics(prompt_id: str):
-    m = await get_prompt_metrics(prompt_id)
+async def metrics(
+    prompt_id: str,
+    since: Optional[datetime] = Query(None, alias="from", description="Início da janela (ISO 8601)"),
+    until: Optional[datetime] = Query(None, alias="to", description="Fim da janela, exclusivo (ISO 8601)"),
+):
+    since, until = utc_window(since, until)
+    m = await get_prompt_metrics(prompt_id, since, until)
     if m is None:
         raise HTTPException(404, "Nenhuma execução encontrada para esse prompt")
     return m
+
+@router.get("/{prompt_id}/timeseries", response_model=PromptTimeSeries)
+async def timeseries(
+    prompt_id: str,
+    granularity: str = Query("hour", description="minute, hour ou day"),
+    since: Optional[datetime] = Query(None, alias="from", description="Início da janela (ISO 8601)"),
+    until: Optional[datetime] = Query(None, alias="to", description="Fim da janela, exclusivo (ISO 8601)"),
+    ia_model: Optional[str] = Query(None, description="Filtra por modelo; sem filtro soma todos"),
+):
+    """Série temporal servida pelos rollups pré-agregados (não varre as execuções)."""
+    if granularity not in ROLLUP_GRANULARITIES:
+        raise HTTPException(400, f"granularity deve ser uma de: {', '.join(ROLLUP_GRANULARITIES)}")
+    step = ROLLUP_GRANULARITIES[granularity]
+    # Datas sem fuso são tratadas como UTC (como os buckets)
+    until = as_utc(until) or datetime.now(timezone.utc)
+    since, until = utc_window(since or until - step * 60, until)
+    if (until - since) / step > settings.ROLLUP_MAX_POINTS:
+        raise HTTPException(400, f"Janela grande demais para granularity={granularity} (máx. {settings.ROLLUP_MAX_POINTS} pontos)")
+    points = await get_execution_timeseries(prompt_id, granularity, since, until, ia_model)
+    return PromptTimeSeries(
+        prompt_id=prompt_id,
+        granularity=granularity,
+        ia_model=ia_model,
+        window_from=since,
+        window_to=until,
+        points=points,
+    )
@@ -1,22 +1,311 @@
 import io
+import os
+import re
+import asyncio
+import tempfile
 import base64
+from collections import deque
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 import pdfplumber
 import pytesseract
-from PIL import Image
+from PIL import Image, ImageCms, ImageOps, UnidentifiedImageError
 from fastapi import UploadFile, HTTPException
 
-async def extract_text_from_pdf(file: UploadFile) -> str:
+from roteamento_ia_backend.core.config import settings
+from roteamento_ia_backend.core.extraction_cache import extraction_cache
+from roteamento_ia_backend.core.extraction_pool import extraction_pool
+from roteamento_ia_backend.core.metrics import IMAGE_BYTES, track_extraction
+from roteamento_ia_backend.core.rate_limit import provider_for_model
+
+# Bump when the extraction logic changes so cached texts are not reused
+EXTRACTOR_REVISION = 1
+PDF_EXTRACTOR = f"pdfplumber-{pdfplumber.__version__}-r{EXTRACTOR_REVISION}"
+
+@lru_cache(maxsize=1)
+def _ocr_extractor() -> str:
+    # Results depend on the Tesseract engine, not only on the Python wrapper
+    try:
+        engine = str(pytesseract.get_tesseract_version())
+    except Exception:
+        engine = "unknown"
+    return f"tesseract-{engine}-r{EXTRACTOR_REVISION}"
+
+_PAGE_RANGE = re.compile(r"^\s*(\d+)\s*(?:-\s*(\d+)\s*)?$")
+
+def parse_page_ranges(spec: Optional[str]) -> Optional[List[Tuple[int, int]]]:
+    """
+    Parses a 1-based page selection such as "1-3,7" into inclusive ranges.
+
+    Raises:
+        ValueError: If the selection is malformed
+    """
+    if not spec or not spec.strip():
+        return None
+    ranges = []
+    for part in spec.split(","):
+        match = _PAGE_RANGE.match(part)
+        if not match:
+            raise ValueError(f"Invalid page selection: '{part.strip()}'")
+        start = int(match.group(1))
+        end = int(match.group(2) or start)
+        if start < 1 or end < start:
+            raise ValueError(f"Invalid page range: '{part.strip()}'")
+        ranges.append((start, end))
+    return ranges
+
+def _pdf_page_count(path: str) -> int:
+    # Runs in an extraction pool process: module-level so it can be pickled
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
+
+def _pdf_pages_text(path: str, page_numbers: List[int], max_chars: int) -> List[Tuple[int, str]]:
+    """Extracts the given pages in order, stopping once `max_chars` is reached (0 = no limit)."""
+    out = []
+    total = 0
+    with pdfplumber.open(path) as pdf:
+        for number in page_numbers:
+            page = pdf.pages[number - 1]
+            text = page.extract_text() or ""
+            # Drops the parsed layout objects before moving to the next page
+            page.close()
+            out.append((number, text))
+            total += len(text)
+            if max_chars and total >= max_chars:
+                break
+    return out
+
+def _write_temp_pdf(content: bytes) -> str:
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+        tmp.write(content)
+    return tmp.name
+
+def _remove_temp_pdf(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        # Windows keeps files open by a pool worker locked; the temp dir is cleaned later
+        pass
+
+async def iter_pdf_pages(
+    content: bytes,
+    pages: Optional[List[Tuple[int, int]]] = None,
+    max_chars: int = 0,
+) -> AsyncIterator[Tuple[int, str]]:
+    """
+    Yields (page_number, text) in page order as the extraction progresses.
+
+    Pages are split into chunks of PDF_PAGES_PER_TASK extracted in parallel by
+    the extraction pool (at most one chunk per pool worker at a time). Once
+    `max_chars` characters have been yielded the remaining chunks are not
+    started, so the cost follows the pages actually used.
+
+    The PDF is written once to a temporary file and every task receives its
+    path: passing the bytes would pickle the whole document into the worker
+    for each chunk. Each chunk still re-opens (and re-parses the xref of) the
+    file.
+
+    Raises:
+        HTTPException: 400 if `pages` selects no page of the document
+    """
+    path = await asyncio.to_thread(_write_temp_pdf, content)
+    running: deque = deque()
+    try:
+        page_count = await extraction_pool.run(_pdf_page_count, path)
+        selected = [
+            n for n in range(1, page_count + 1)
+            if pages is None or any(start <= n <= end for start, end in pages)
+        ]
+        if pages is not None and not selected:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Page selection matches no page of the document ({page_count} pages)",
+            )
+        size = max(settings.PDF_PAGES_PER_TASK, 1)
+        chunks = iter([selected[i:i + size] for i in range(0, len(selected), size)])
+
+        def submit() -> None:
+            chunk = next(chunks, None)
+            if chunk:
+                running.append(asyncio.ensure_future(
+                    extraction_pool.run(_pdf_pages_text, path, chunk, max_chars)
+                ))
+
+        for _ in range(max(extraction_pool.workers, 1)):
+            submit()
+        emitted = 0
+        while running:
+            result = await running.popleft()
+            submit()
+            for number, text in result:
+                if max_chars and emitted + len(text) >= max_chars:
+                    yield number, text[:max_chars - emitted]
+                    return
+                emitted += len(text)
+                yield number, text
+    finally:
+        for task in running:
+            task.cancel()
+        _remove_temp_pdf(path)
+
+def _ocr_text(content: bytes, max_side: int = 0) -> str:
+    # OCR runs on a grayscale copy capped at `max_side` pixels (0 = original size)
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(content))).convert("L")
+    if max_side and max(image.size) > max_side:
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+    return pytesseract.image_to_string(image)
+
+_IMAGE_MIME_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+# Formats every provider accepts as-is
+_PASSTHROUGH_FORMATS = {"jpeg": "image/jpeg", "png": "image/png", "webp": "image/webp", "gif": "image/gif"}
+
+def image_limits(ia_model: Optional[str]) -> Tuple[int, int]:
+    """
+    Maximum (long side, short side) in pixels for images sent to `ia_model`.
+
+    Looks up the model name, then its provider, then "default". Routing
+    classes ("fast", "vision"...) are resolved after the input is prepared,
+    so they get the "default" limits.
+    """
+    limits = settings.IMAGE_MAX_DIMENSIONS
+    if ia_model and ia_model in limits:
+        return tuple(limits[ia_model])
+    if ia_model and ia_model not in settings.ROUTING_CLASSES:
+        provider = provider_for_model(ia_model)
+        if provider in limits:
+            return tuple(limits[provider])
+    return tuple(limits.get("default", (0, 0)))
+
+_SRGB = ImageCms.createProfile("sRGB")
+
+def _to_srgb(image: Image.Image, icc_profile: bytes) -> Image.Image:
+    """
+    Converts `image` from its embedded ICC profile to sRGB, so the colors
+    survive re-encoding without the profile. Images the profile cannot be
+    applied to (corrupt profile, palette or mismatched color space) are
+    returned unchanged.
+    """
+    if image.mode not in ("RGB", "RGBA", "CMYK", "L"):
+        return image
+    try:
+        return ImageCms.profileToProfile(
+            image,
+            ImageCms.ImageCmsProfile(io.BytesIO(icc_profile)),
+            _SRGB,
+            outputMode="RGBA" if image.mode == "RGBA" else "RGB",
+        )
+    except (ImageCms.PyCMSError, OSError):
+        return image
+
+def _prepare_image(content: bytes, max_long: int, max_short: int, fmt: str, quality: int) -> Tuple[bytes, str, Dict[str, Any]]:
+    """
+    Downscales the image to fit (max_long, max_short), applies the EXIF
+    orientation, converts an embedded ICC profile to sRGB and re-encodes it
+    as `fmt` without metadata. Runs in an extraction pool process.
+
+    Returns:
+        tuple: (image bytes, MIME type, details for the execution record)
+    """
+    source = Image.open(io.BytesIO(content))
+    source_format = (source.format or "").lower()
+    has_metadata = bool(source.info.get("exif") or source.getexif())
+    image = ImageOps.exif_transpose(source)
+    width, height = image.size
+    scale = 1.0
+    if max_long and max(width, height) > max_long:
+        scale = max_long / max(width, height)
+    if max_short and min(width, height) * scale > max_short:
+        scale = max_short / min(width, height)
+    if scale < 1.0:
+        image = image.resize((max(round(width * scale), 1), max(round(height * scale), 1)), Image.LANCZOS)
+    icc_profile = source.info.get("icc_profile")
+    if icc_profile:
+        image = _to_srgb(image, icc_profile)
+
+    if fmt == "jpeg" and image.mode != "RGB":
+        # JPEG has no alpha channel: flatten onto white instead of black
+        rgba = image.convert("RGBA")
+        image = Image.new("RGB", rgba.size, (255, 255, 255))
+        image.paste(rgba, mask=rgba.getchannel("A"))
+    elif image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if image.mode in ("LA", "PA", "P") else "RGB")
+
+    # Pillow only writes EXIF/ICC metadata when it is passed to save() explicitly
+    out = io.BytesIO()
+    if fmt == "jpeg":
+        image.save(out, format="JPEG", quality=quality, optimize=True)
+    else:
+        image.save(out, format="WEBP", quality=quality, method=4)
+    data, mime_type = out.getvalue(), _IMAGE_MIME_TYPES[fmt]
+
+    preprocessed = not (
+        # Already within the limits, without metadata and smaller than the re-encoded copy
+        scale == 1.0 and not has_metadata and len(data) >= len(content)
+        and source_format in _PASSTHROUGH_FORMATS
+    )
+    if not preprocessed:
+        data, mime_type, fmt = content, _PASSTHROUGH_FORMATS[source_format], source_format
+    return data, mime_type, {
+        "original_bytes": len(content),
+        "sent_bytes": len(data),
+        "original_width": width,
+        "original_height": height,
+        "width": image.size[0],
+        "height": image.size[1],
+        "format": fmt,
+        "preprocessed": preprocessed,
+    }
+
+async def preprocess_image(content: bytes, ia_model: Optional[str] = None) -> Tuple[bytes, str, Dict[str, Any]]:
+    """
+    Prepares an image for `ia_model` in the extraction pool (see `_prepare_image`)
+    and records the original and sent sizes in the IMAGE_BYTES metric.
+
+    Raises:
+        HTTPException: 503/504 when the pool is saturated or times out
     """
-    Extracts text content from a PDF file.
+    max_long, max_short = image_limits(ia_model)
+    data, mime_type, info = await extraction_pool.run(
+        _prepare_image, content, max_long, max_short, settings.IMAGE_FORMAT, settings.IMAGE_QUALITY
+    )
+    IMAGE_BYTES.labels("original").inc(info["original_bytes"])
+    IMAGE_BYTES.labels("sent").inc(info["sent_bytes"])
+    return data, mime_type, info
+
+async def extract_text_from_pdf(
+    file: UploadFile,
+    pages: Optional[List[Tuple[int, int]]] = None,
+    max_chars: Optional[int] = None,
+) -> str:
+    """
+    Extracts text content from a PDF file in the extraction pool.
+
+    Args:
+        pages: Optional 1-based page ranges to extract (see `parse_page_ranges`)
+        max_chars: Character budget; defaults to PDF_MAX_CHARS (0 = no limit)
+
+    Raises:
+        HTTPException: 400 for empty or invalid PDFs; 503/504 when the pool is
+            saturated or the extraction times out
     """
     content = await file.read()
     if not content:
         raise HTTPException(status_code=400, detail="Empty PDF file")
     
+    budget = settings.PDF_MAX_CHARS if max_chars is None else max_chars
+
+    async def extract() -> str:
+        with track_extraction(file.content_type, "pdfplumber"):
+            texts = [text async for _, text in iter_pdf_pages(content, pages, budget)]
+        return "\n".join(texts)
+
     try:
-        with pdfplumber.open(io.BytesIO(content)) as pdf:
-            text = "\n".join(page.extract_text() or "" for page in pdf.pages)
-        return text
+        if not settings.EXTRACTION_CACHE_ENABLED:
+            return await extract()
+        options = {"pages": pages, "max_chars": budget}
+        return await extraction_cache.get_or_extract(content, "pdfplumber", PDF_EXTRACTOR, options, extract)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=400, 
@@ -25,16 +314,25 @@ async def extract_text_from_pdf(file: UploadFile) -> str:
 
 async def extract_text_from_image(file: UploadFile) -> str:
     """
-    Extracts text content from an image using OCR.
+    Extracts text content from an image using OCR in the extraction pool,
+    on a grayscale copy downscaled to IMAGE_OCR_MAX_SIDE.
     """
     content = await file.read()
     if not content:
         raise HTTPException(status_code=400, detail="Empty image file")
     
+    async def extract() -> str:
+        with track_extraction(file.content_type, "pytesseract"):
+            return await extraction_pool.run(_ocr_text, content, max_side)
+
+    max_side = settings.IMAGE_OCR_MAX_SIDE
     try:
-        image = Image.open(io.BytesIO(content))
-        text = pytesseract.image_to_string(image)
-        return text
+        if not settings.EXTRACTION_CACHE_ENABLED:
+            return await extract()
+        options = {"max_side": max_side}
+        return await extraction_cache.get_or_extract(content, "pytesseract", _ocr_extractor(), options, extract)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=400, 
@@ -59,26 +357,41 @@ async def file_to_base64(file: UploadFile) -> str:
         raise HTTPException(status_code=400, detail="Empty file")
     return base64.b64encode(data).decode("utf-8")
 
-async def process_file_content(file: UploadFile) -> tuple[str, str]:
+async def _image_data_uri(file: UploadFile, ia_model: Optional[str]) -> Tuple[str, Optional[Dict[str, Any]]]:
     """
-    Processes a file based on its MIME type and returns extracted content and content type.
-    
-    Args:
-        file (UploadFile): The uploaded file to process
-        
-    Returns:
-        tuple[str, str]: A tuple containing (extracted_content, content_type)
-            - For PDFs and images with text: (extracted_text, "text")
-            - For images without text: (base64_encoded_image, "image")
+    Base64 data URI of the image as sent to the AI (preprocessed when
+    IMAGE_PREPROCESS_ENABLED) and the size details, if it was preprocessed.
     """
+    await file.seek(0)
+    if settings.IMAGE_PREPROCESS_ENABLED:
+        content = await file.read()
+        try:
+            data, mime_type, info = await preprocess_image(content, ia_model)
+            return f"data:{mime_type};base64,{base64.b64encode(data).decode('utf-8')}", info
+        except HTTPException as e:
+            if e.status_code >= 500:
+                raise
+        except (UnidentifiedImageError, OSError):
+            # Not decodable by Pillow: the provider still gets the original file
+            pass
+        await file.seek(0)
+    base64_image = await file_to_base64(file)
+    return f"data:{file.content_type};base64,{base64_image}", None
+
+async def _process_file(
+    file: UploadFile,
+    pages: Optional[List[Tuple[int, int]]] = None,
+    ia_model: Optional[str] = None,
+) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+    """Same as `process_file_content`, plus the image size details (or None)."""
     mime_type = file.content_type
     
     # Reset file position to start
     await file.seek(0)
     
     if mime_type == "application/pdf":
-        text = await extract_text_from_pdf(file)
-        return text, "text"
+        text = await extract_text_from_pdf(file, pages)
+        return text, "text", None
     
     elif mime_type.startswith("image/"):
         # First try to extract text via OCR
@@ -87,17 +400,14 @@ async def process_file_content(file: UploadFile) -> tuple[str, str]:
             text = await extract_text_from_image(file)
             # If OCR found meaningful text
             if text and len(text.strip()) > 10:
-                return text, "text"
-            # Otherwise, treat as pure image
-            else:
-                await file.seek(0)
-                base64_image = await file_to_base64(file)
-                return f"data:{mime_type};base64,{base64_image}", "image"
-        except Exception:
-            # If OCR fails, fall back to treating as pure image
-            await file.seek(0)
-            base64_image = await file_to_base64(file)
-            return f"data:{mime_type};base64,{base64_image}", "image"
+                return text, "text", None
+        except Exception as e:
+            # Saturated pool or timeout: retry later instead of silently skipping OCR
+            if isinstance(e, HTTPException) and e.status_code >= 500:
+                raise
+        # Otherwise (or if OCR fails), treat as pure image
+        data_uri, image_info = await _image_data_uri(file, ia_model)
+        return data_uri, "image", image_info
     
     else:
         # For other file types, just read as text if possible
@@ -105,20 +415,47 @@ async def process_file_content(file: UploadFile) -> tuple[str, str]:
             await file.seek(0)
             content = await file.read()
             text = content.decode("utf-8", errors="replace")
-            return text, "text"
+            return text, "text", None
         except Exception as e:
             raise HTTPException(
                 status_code=400,
                 detail=f"Unsupported file type: {mime_type}. Error: {str(e)}"
             )
 
-async def prepare_file_for_ai(file: UploadFile) -> dict:
+async def process_file_content(
+    file: UploadFile,
+    pages: Optional[List[Tuple[int, int]]] = None,
+    ia_model: Optional[str] = None,
+) -> tuple[str, str]:
+    """
+    Processes a file based on its MIME type and returns extracted content and content type.
+    
+    Args:
+        file (UploadFile): The uploaded file to process
+        pages: Optional PDF page ranges (ignored for other file types)
+        ia_model: Target model, used for the image size limits
+        
+    Returns:
+        tuple[str, str]: A tuple containing (extracted_content, content_type)
+            - For PDFs and images with text: (extracted_text, "text")
+            - For images without text: (base64 data URI of the preprocessed image, "image")
+    """
+    content, content_type, _ = await _process_file(file, pages, ia_model)
+    return content, content_type
+
+async def prepare_file_for_ai(
+    file: UploadFile,
+    pages: Optional[List[Tuple[int, int]]] = None,
+    ia_model: Optional[str] = None,
+) -> dict:
     """
     Prepares a file for sending to AI models by extracting its content
     and determining the appropriate format.
     
     Args:
         file (UploadFile): The uploaded file
+        pages: Optional PDF page ranges to extract
+        ia_model: Target model, used for the image size limits
         
     Returns:
         dict: A dictionary with the following keys:
@@ -126,6 +463,7 @@ async def prepare_file_for_ai(file: UploadFile) -> dict:
             - mime_type: The MIME type of the file
             - content_type: Either "text" or "image"
             - content: The extracted content (text or base64 data URI)
+            - image: Original/sent sizes and dimensions, for preprocessed images
     """
     # Store original filename and MIME type
     file_name = file.filename
@@ -136,14 +474,24 @@ async def prepare_file_for_ai(file: UploadFile) -> dict:
     
     # Process file based on MIME type
     try:
-        content, content_type = await process_file_content(file)
+        content, content_type, image_info = await _process_file(file, pages, ia_model)
         
-        return {
+        file_data = {
             "file_name": file_name,
             "mime_type": mime_type,
             "content_type": content_type,
             "content": content
         }
+        if image_info:
+            file_data["image"] = image_info
+        return file_data
+    except HTTPException as e:
+        if e.status_code >= 500:
+            raise
+        raise HTTPException(
+            status_code=400,
+            detail=f"Error processing file {file_name}: {str(e)}"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=400,
@@ -19,6 +19,23 @@ from roteamento_ia_backend.main import app
 # Note: We'll use pytest-asyncio's built-in event_loop fixture
 # instead of defining our own to avoid the deprecation warning
 
+@pytest.fixture(autouse=True)
+def clear_prompt_cache():
+    """Prompts are mocked per test with the same ids: never reuse a cached one."""
+    from roteamento_ia_backend.db.crud import prompt_cache
+    prompt_cache.reset()
+    yield
+    prompt_cache.reset()
+
+@pytest.fixture(autouse=True)
+def memory_only_extraction_cache():
+    """Extracted texts are never shared between tests, and the Mongo tier is never reached."""
+    from roteamento_ia_backend.core.extraction_cache import extraction_cache
+    extraction_cache.memory.clear()
+    with patch.object(extraction_cache, "use_mongo", False):
+        yield
+    extraction_cache.memory.clear()
+
 @pytest.fixture
 def client():
     with TestClient(app) as test_client:
@@ -58,7 +75,7 @@ def mock_mongo_db():
 @pytest.fixture
 def mock_openai_client():
     """Mock OpenAI client."""
-    with patch('roteamento_ia_backend.core.openai.openai_service.client') as mock_client:
+    with patch('roteamento_ia_backend.core.openai.openai_client.client') as mock_client:
         # Mock the chat.completions.create method
         chat_mock = AsyncMock()
         mock_client.chat.completions.create = chat_mock
@@ -74,7 +91,7 @@ def mock_openai_client():
 @pytest.fixture
 def mock_gemini_client():
     """Mock Gemini client."""
-    with patch('roteamento_ia_backend.core.gemini.gemini_client.GeminiClient.generate') as mock_generate:
+    with patch('roteamento_ia_backend.core.gemini.gemini_client.GeminiClient.agenerate', new_callable=AsyncMock) as mock_generate:
         # Set up a sample response
         mock_generate.return_value = "Mocked Gemini response"
         
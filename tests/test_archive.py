@@ -0,0 +1,106 @@
+import gzip
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch, AsyncMock, MagicMock
+from bson import ObjectId
+from fastapi import HTTPException
+
+from roteamento_ia_backend.db.archive import ExecutionArchive
+from roteamento_ia_backend.db.schemas import ArchiveRestoreIn
+from roteamento_ia_backend.routers.executions import restore_archive, run_archive
+
+NOW = datetime(2026, 3, 31, 12, 0, tzinfo=timezone.utc)
+PROMPT_ID = str(ObjectId())
+
+
+def _execution(days_ago: float, ia_model: str = "gpt-4o") -> dict:
+    ts = NOW - timedelta(days=days_ago)
+    return {
+        "_id": ObjectId.from_datetime(ts),
+        "prompt_id": PROMPT_ID,
+        "ia_model": ia_model,
+        "latency_ms": 100,
+        "created_at": ts,
+    }
+
+
+def _mock_find(mock_db, batches):
+    cursor = MagicMock()
+    cursor.sort.return_value = cursor
+    cursor.limit.return_value = cursor
+    cursor.to_list = AsyncMock(side_effect=batches)
+    mock_db.executions.find.return_value = cursor
+
+
+@pytest.mark.asyncio
+async def test_archive_moves_old_executions_to_daily_files(tmp_path):
+    """Test that executions outside the hot window are written per day × prompt and deleted"""
+    archive = ExecutionArchive(str(tmp_path), hot_days=30, batch_size=100)
+    old = [_execution(40), _execution(40.1), _execution(45)]
+    with patch('roteamento_ia_backend.db.archive.db') as mock_db:
+        _mock_find(mock_db, [old])
+        mock_db.executions.delete_many = AsyncMock(return_value=MagicMock(deleted_count=3))
+
+        archived = await archive.archive_once(now=NOW)
+
+    assert archived == 3
+    query = mock_db.executions.find.call_args[0][0]
+    assert query["_id"]["$lt"] == ObjectId.from_datetime(NOW - timedelta(days=30))
+    assert mock_db.executions.delete_many.call_args[0][0] == {"_id": {"$in": [d["_id"] for d in old]}}
+
+    parts = archive.partitions()
+    assert [p["day"].isoformat() for p in parts] == ["2026-02-14", "2026-02-19"]
+    assert all(p["prompt_id"] == PROMPT_ID for p in parts)
+    docs = list(archive.iter_archived(PROMPT_ID))
+    assert [d["_id"] for d in docs] == [old[2]["_id"], old[0]["_id"], old[1]["_id"]]
+    assert docs[0]["created_at"] == old[2]["created_at"]
+
+
+def test_archived_batches_are_read_once_and_filtered(tmp_path):
+    """Test that a batch written twice (crash before delete) is read once, with time/model filters"""
+    archive = ExecutionArchive(str(tmp_path), hot_days=30, batch_size=100)
+    docs = [_execution(40), _execution(40.2, ia_model="gemini-2.0-flash")]
+    groups = {archive._partition_path(docs[0]["created_at"].date(), PROMPT_ID): docs}
+    archive._write_partitions(groups)
+    archive._write_partitions(groups)
+
+    # Dois membros gzip no mesmo arquivo
+    with gzip.open(archive.partitions()[0]["path"], "rt") as f:
+        assert len(f.readlines()) == 4
+    assert len(list(archive.iter_archived())) == 2
+    assert len(list(archive.iter_archived(ia_model="gemini-2.0-flash"))) == 1
+    assert list(archive.iter_archived(since=NOW - timedelta(days=40.1))) == [docs[0]]
+    assert list(archive.iter_archived(prompt_id=str(ObjectId()))) == []
+
+
+@pytest.mark.asyncio
+async def test_restore_marks_documents_for_expiry(tmp_path):
+    """Test that restored executions are inserted with restored_at"""
+    archive = ExecutionArchive(str(tmp_path), hot_days=30, batch_size=1)
+    docs = [_execution(40), _execution(41)]
+    archive._write_partitions({archive._partition_path(d["created_at"].date(), PROMPT_ID): [d] for d in docs})
+
+    with patch('roteamento_ia_backend.db.archive.db') as mock_db:
+        mock_db.executions.insert_many = AsyncMock(side_effect=lambda batch, ordered: MagicMock(inserted_ids=[d["_id"] for d in batch]))
+
+        restored = await archive.restore(NOW - timedelta(days=60), NOW, PROMPT_ID)
+
+    assert restored == 2
+    assert mock_db.executions.insert_many.call_count == 2  # em lotes de batch_size
+    inserted = mock_db.executions.insert_many.call_args[0][0][0]
+    assert isinstance(inserted["restored_at"], datetime)
+
+
+@pytest.mark.asyncio
+async def test_archive_endpoints_require_archive_enabled():
+    """Test that run and restore refuse to touch MongoDB while archiving is disabled"""
+    body = ArchiveRestoreIn(**{"from": NOW - timedelta(days=60), "to": NOW})
+    with patch('roteamento_ia_backend.routers.executions.settings.ARCHIVE_ENABLED', False), \
+         patch('roteamento_ia_backend.routers.executions.execution_archive') as mock_archive:
+        for call in (run_archive(), restore_archive(body)):
+            with pytest.raises(HTTPException) as excinfo:
+                await call
+            assert excinfo.value.status_code == 409
+
+    mock_archive.archive_once.assert_not_called()
+    mock_archive.restore.assert_not_called()
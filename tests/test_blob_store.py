@@ -0,0 +1,129 @@
+import hashlib
+import io
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+from fastapi import UploadFile
+from gridfs.errors import FileExists
+from starlette.datastructures import Headers
+
+from roteamento_ia_backend.core.job_worker import _load_job_file
+from roteamento_ia_backend.db.blob_store import put_blob
+from roteamento_ia_backend.routers.execute import _store_input_blobs
+from roteamento_ia_backend.routers.jobs import submit
+
+PNG = b"\x89PNG fake image bytes"
+SHA = hashlib.sha256(PNG).hexdigest()
+
+
+@pytest.mark.asyncio
+async def test_put_blob_uses_sha256_as_id():
+    """Test that new content is uploaded to GridFS under its SHA-256"""
+    bucket = MagicMock()
+    bucket.upload_from_stream_with_id = AsyncMock()
+    with patch('roteamento_ia_backend.db.blob_store.db') as mock_db, \
+         patch('roteamento_ia_backend.db.blob_store._get_bucket', return_value=bucket):
+        mock_db.__getitem__.return_value.find_one = AsyncMock(return_value=None)
+        ref = await put_blob(PNG, "image/png", "cat.png")
+
+    assert ref == {"sha256": SHA, "size": len(PNG), "mime_type": "image/png"}
+    assert bucket.upload_from_stream_with_id.call_args[0][0] == SHA
+
+
+@pytest.mark.asyncio
+async def test_put_blob_deduplicates_identical_uploads():
+    """Test that content already stored is not uploaded again"""
+    bucket = MagicMock()
+    bucket.upload_from_stream_with_id = AsyncMock()
+    with patch('roteamento_ia_backend.db.blob_store.db') as mock_db, \
+         patch('roteamento_ia_backend.db.blob_store._get_bucket', return_value=bucket):
+        mock_db.__getitem__.return_value.find_one = AsyncMock(return_value={"_id": SHA})
+        ref = await put_blob(PNG, "image/png")
+
+    assert ref["sha256"] == SHA
+    bucket.upload_from_stream_with_id.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_put_blob_tolerates_concurrent_upload_from_another_worker():
+    """Test that losing the upload race to another process still returns the reference"""
+    bucket = MagicMock()
+    bucket.upload_from_stream_with_id = AsyncMock(side_effect=FileExists("file with id already exists"))
+    with patch('roteamento_ia_backend.db.blob_store.db') as mock_db, \
+         patch('roteamento_ia_backend.db.blob_store._get_bucket', return_value=bucket):
+        mock_db.__getitem__.return_value.find_one = AsyncMock(return_value=None)
+        ref = await put_blob(PNG, "image/png")
+
+    assert ref == {"sha256": SHA, "size": len(PNG), "mime_type": "image/png"}
+
+
+def _upload(data, mime_type, name):
+    return UploadFile(file=io.BytesIO(data), filename=name, headers=Headers({"content-type": mime_type}))
+
+
+@pytest.mark.asyncio
+async def test_image_execution_keeps_only_the_reference():
+    """Test that the base64 data URI is not stored in the execution"""
+    input_payload = {
+        "file_name": "cat.png", "mime_type": "image/png",
+        "content_type": "image", "content": "data:image/png;base64,AAAA",
+    }
+    with patch('roteamento_ia_backend.routers.execute.put_blob', new_callable=AsyncMock,
+               return_value={"sha256": SHA, "size": len(PNG), "mime_type": "image/png"}) as mock_put:
+        stored = await _store_input_blobs(_upload(PNG, "image/png", "cat.png"), input_payload)
+
+    assert "content" not in stored
+    assert stored["blob"]["sha256"] == SHA
+    assert mock_put.call_args[0][0] == PNG  # the original upload, not the data URI
+
+
+@pytest.mark.asyncio
+async def test_large_extracted_text_goes_to_the_blob_store():
+    """Test that small extracted text stays inline and large text is stored by reference"""
+    async def fake_put(data, mime_type=None, file_name=None):
+        return {"sha256": hashlib.sha256(data).hexdigest(), "size": len(data), "mime_type": mime_type}
+
+    small = {"file_name": "a.pdf", "mime_type": "application/pdf", "content_type": "text", "content": "short"}
+    large = {**small, "content": "x" * 10_000}
+    with patch('roteamento_ia_backend.routers.execute.put_blob', side_effect=fake_put), \
+         patch('roteamento_ia_backend.routers.execute.settings.INPUT_INLINE_MAX_CHARS', 4096):
+        stored_small = await _store_input_blobs(_upload(b"%PDF", "application/pdf", "a.pdf"), small)
+        stored_large = await _store_input_blobs(_upload(b"%PDF", "application/pdf", "a.pdf"), large)
+
+    assert stored_small["content"] == "short"
+    assert "content" not in stored_large
+    assert stored_large["content_blob"]["size"] == 10_000
+
+
+@pytest.mark.asyncio
+async def test_blob_store_failure_keeps_content_inline():
+    """Test that the execution still records its input when the blob store fails"""
+    input_payload = {"file_name": "a.txt", "mime_type": "text/plain", "content_type": "text", "content": "hi"}
+    with patch('roteamento_ia_backend.routers.execute.put_blob', new_callable=AsyncMock, side_effect=Exception("down")):
+        stored = await _store_input_blobs(_upload(b"hi", "text/plain", "a.txt"), input_payload)
+
+    assert stored == input_payload
+
+
+@pytest.mark.asyncio
+async def test_job_file_is_loaded_from_the_blob_store():
+    """Test that a queued job holding a blob reference gets its bytes back"""
+    job_payload = {"prompt_id": "p", "file": {"file_name": "cat.png", "mime_type": "image/png", "blob": SHA}}
+    with patch('roteamento_ia_backend.core.job_worker.get_blob', new_callable=AsyncMock, return_value=PNG):
+        loaded = await _load_job_file(job_payload)
+
+    assert loaded["file"]["data"] == PNG
+
+
+@pytest.mark.asyncio
+async def test_job_upload_stays_inline_when_blob_store_is_disabled():
+    """Test that POST /jobs does not write to GridFS with BLOB_STORE_ENABLED=False"""
+    with patch('roteamento_ia_backend.routers.jobs.settings.BLOB_STORE_ENABLED', False), \
+         patch('roteamento_ia_backend.routers.jobs.put_blob', new_callable=AsyncMock) as mock_put, \
+         patch('roteamento_ia_backend.routers.jobs.enqueue_job', new_callable=AsyncMock, return_value="job-1") as mock_enqueue:
+        await submit(prompt_id="p", ia_model="gpt-4o", variables="{}", input_text=None,
+                     input_file=_upload(PNG, "image/png", "cat.png"), pages=None)
+
+    mock_put.assert_not_called()
+    job_file = mock_enqueue.call_args[0][0]["file"]
+    assert job_file == {"file_name": "cat.png", "mime_type": "image/png", "data": PNG}
+    assert (await _load_job_file({"file": job_file}))["file"]["data"] == PNG
@@ -0,0 +1,155 @@
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock
+
+from roteamento_ia_backend.core.circuit_breaker import (
+    BreakerRegistry, CircuitBreaker, CircuitOpenError, call_with_resilience,
+    CLOSED, OPEN, HALF_OPEN,
+)
+from roteamento_ia_backend.core.config import settings
+from roteamento_ia_backend.routers.execute import _call_with_fallback
+
+
+class ServerError(Exception):
+    status_code = 500
+
+
+class BadRequest(Exception):
+    status_code = 400
+
+
+@pytest.fixture
+def registry():
+    """Isolated breaker registry with a small window"""
+    reg = BreakerRegistry()
+    with patch.object(settings, 'BREAKER_WINDOW', 4), \
+         patch.object(settings, 'BREAKER_MIN_CALLS', 4), \
+         patch.object(settings, 'BREAKER_OPEN_S', 30), \
+         patch.object(settings, 'PROVIDER_RETRY_BASE_S', 0), \
+         patch('roteamento_ia_backend.core.circuit_breaker.breakers', reg), \
+         patch('roteamento_ia_backend.routers.execute.breakers', reg):
+        yield reg
+
+
+def test_breaker_opens_on_failure_rate(registry):
+    """Test that the breaker opens once the failure rate in the window passes the limit"""
+    breaker = CircuitBreaker("gemini:gemini-pro")
+    breaker.record(True, 100)
+    breaker.record(False, 100)
+    breaker.record(True, 100)
+    assert breaker.state == CLOSED  # below the minimum number of calls
+
+    breaker.record(False, 100)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_breaker_opens_on_slow_calls(registry):
+    """Test that successful but slow calls also open the breaker"""
+    breaker = CircuitBreaker("openai:gpt-4o")
+    for _ in range(4):
+        breaker.record(True, settings.BREAKER_SLOW_CALL_MS + 1)
+    assert breaker.state == OPEN
+
+
+def test_breaker_half_open_recovers_or_reopens(registry):
+    """Test the half-open probe: success closes the breaker, failure reopens it"""
+    breaker = CircuitBreaker("gemini:gemini-pro")
+    breaker._transition(OPEN)
+    breaker.opened_at -= settings.BREAKER_OPEN_S
+
+    assert breaker.allows()
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    breaker.record(False, 100)
+    assert breaker.state == OPEN
+
+    breaker.opened_at -= settings.BREAKER_OPEN_S
+    breaker.before_call()
+    breaker.record(True, 100)
+    assert breaker.state == CLOSED
+
+
+@pytest.mark.asyncio
+async def test_call_with_resilience_retries_transient_errors(registry):
+    """Test that 5xx errors are retried and 4xx errors are not"""
+    fn = AsyncMock(side_effect=[ServerError("boom"), "ok"])
+    with patch.object(settings, 'PROVIDER_RETRIES', 1):
+        assert await call_with_resilience("gemini-pro", fn) == "ok"
+        assert fn.await_count == 2
+
+        bad = AsyncMock(side_effect=BadRequest("invalid"))
+        with pytest.raises(BadRequest):
+            await call_with_resilience("gemini-pro", bad)
+        assert bad.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_call_with_resilience_fails_fast_when_open(registry):
+    """Test that an open circuit rejects the call without reaching the provider"""
+    registry.get("gemini:gemini-pro")._transition(OPEN)
+    fn = AsyncMock(return_value="ok")
+
+    with pytest.raises(CircuitOpenError):
+        await call_with_resilience("gemini-pro", fn)
+    fn.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_call_with_fallback_uses_next_model(registry):
+    """Test that a failed primary falls back to the next model of the chain"""
+    primary = AsyncMock(side_effect=ServerError("down"))
+    fallback_fn = AsyncMock(return_value="fallback answer")
+
+    with patch('roteamento_ia_backend.routers.execute._select_model_fn',
+               AsyncMock(return_value=(fallback_fn, True))):
+        call = await _call_with_fallback(primary, True, "prompt", "gemini-pro", False, ["gpt-4o-mini"])
+
+    assert call["output"] == "fallback answer"
+    assert call["answered_by"] == "gpt-4o-mini"
+    assert call["fallback"]["used"] is True
+    assert call["fallback"]["tried"][0]["model"] == "gemini-pro"
+
+
+@pytest.mark.asyncio
+async def test_call_with_fallback_skips_open_circuits(registry):
+    """Test that models with an open circuit are skipped without being called"""
+    registry.get("gemini:gemini-pro")._transition(OPEN)
+    registry.get("openai:gpt-4o-mini")._transition(OPEN)
+    primary = AsyncMock(return_value="primary")
+    last = AsyncMock(return_value="last answer")
+
+    with patch('roteamento_ia_backend.routers.execute._select_model_fn',
+               AsyncMock(return_value=(last, True))):
+        call = await _call_with_fallback(primary, True, "prompt", "gemini-pro", False, ["gpt-4o-mini", "gpt-4o"])
+
+    primary.assert_not_called()
+    assert call["answered_by"] == "gpt-4o"
+    assert [t["error"] for t in call["fallback"]["tried"]] == ["circuito aberto", "circuito aberto"]
+
+
+@pytest.mark.asyncio
+async def test_client_closing_stream_is_not_a_failure(registry):
+    """Test that aclose() on a partly consumed stream records nothing and frees the half-open slot"""
+    breaker = CircuitBreaker("gemini:gemini-pro")
+
+    async def stream():
+        async with breaker.track():
+            for token in ("a", "b", "c"):
+                yield token
+
+    for _ in range(settings.BREAKER_WINDOW):
+        gen = stream()
+        assert await gen.__anext__() == "a"
+        await gen.aclose()  # client disconnected
+
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["calls_in_window"] == 0
+
+    breaker._transition(HALF_OPEN)
+    gen = stream()
+    await gen.__anext__()
+    assert breaker.half_open_in_flight == 1
+    await gen.aclose()
+    assert breaker.half_open_in_flight == 0
@@ -57,7 +57,7 @@ async def test_select_model_fn():
     for model in gemini_models:
         fn, is_async = await _select_model_fn(model)
         assert fn.__name__ == "generate_gemini_completion"
-        assert is_async is False
+        assert is_async is True
 
 @pytest.mark.asyncio
 async def test_execute_common_with_text_input(sample_execution_payload, mock_prompt):
@@ -66,7 +66,7 @@ async def test_execute_common_with_text_input(sample_execution_payload, mock_pro
     with patch('roteamento_ia_backend.routers.execute.get_prompt_by_id') as mock_get_prompt, \
          patch('roteamento_ia_backend.routers.execute._select_model_fn') as mock_select_fn, \
          patch('roteamento_ia_backend.core.openai.openai_service.generate_openai_completion') as mock_generate, \
-         patch('roteamento_ia_backend.routers.execute.create_execution') as mock_create_execution, \
+         patch('roteamento_ia_backend.routers.execute.record_execution') as mock_create_execution, \
          patch('roteamento_ia_backend.db.schemas.InputPayload.model_dump') as mock_model_dump:
         
         # Setup mocks
@@ -117,7 +117,7 @@ async def test_execute_common_with_file_input(mock_prompt, mock_file):
     with patch('roteamento_ia_backend.routers.execute.get_prompt_by_id') as mock_get_prompt, \
          patch('roteamento_ia_backend.routers.execute._select_model_fn') as mock_select_fn, \
          patch('roteamento_ia_backend.core.gemini.gemini_service.generate_gemini_completion') as mock_generate, \
-         patch('roteamento_ia_backend.routers.execute.create_execution') as mock_create_execution, \
+         patch('roteamento_ia_backend.routers.execute.record_execution') as mock_create_execution, \
          patch('roteamento_ia_backend.utils.file_utils.file_to_base64') as mock_file_to_base64:
         
         # Setup mocks
@@ -210,7 +210,7 @@ async def test_execute_common_ai_model_error(sample_execution_payload, mock_prom
     with patch('roteamento_ia_backend.routers.execute.get_prompt_by_id') as mock_get_prompt, \
          patch('roteamento_ia_backend.routers.execute._select_model_fn') as mock_select_fn, \
          patch('roteamento_ia_backend.core.openai.openai_service.generate_openai_completion') as mock_generate, \
-         patch('roteamento_ia_backend.routers.execute.create_execution') as mock_create_execution, \
+         patch('roteamento_ia_backend.routers.execute.record_execution') as mock_create_execution, \
          patch('roteamento_ia_backend.db.schemas.InputPayload.model_dump') as mock_model_dump:
         
         # Setup mocks
@@ -231,4 +231,119 @@ async def test_execute_common_ai_model_error(sample_execution_payload, mock_prom
         assert result.cost == 0.0
         
         # Verify execution was still recorded
-        mock_create_execution.assert_called_once()
\ No newline at end of file
+        mock_create_execution.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_generate_gemini_completion_uses_async_client():
+    """Test that the Gemini service awaits the native async client instead of the sync one"""
+    from roteamento_ia_backend.core.gemini.gemini_service import generate_gemini_completion
+
+    with patch('roteamento_ia_backend.core.gemini.gemini_client.GeminiClient.agenerate', new_callable=AsyncMock) as mock_agenerate, \
+         patch('roteamento_ia_backend.core.gemini.gemini_client.GeminiClient.generate') as mock_generate:
+        mock_agenerate.return_value = "Mocked Gemini response"
+
+        result = await generate_gemini_completion("Hello", "gemini-2.0-flash")
+
+        assert result == "Mocked Gemini response"
+        mock_agenerate.assert_awaited_once_with("Hello", model="gemini-2.0-flash")
+        mock_generate.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_generate_openai_completion_uses_shared_async_client(mock_openai_client):
+    """Test that the OpenAI service awaits the process-wide async client"""
+    from roteamento_ia_backend.core.openai.openai_service import generate_openai_completion
+
+    result = await generate_openai_completion("Hello", "gpt-3.5-turbo")
+
+    assert result == "Mocked OpenAI response"
+    mock_openai_client.chat.completions.create.assert_awaited_once()
+    assert mock_openai_client.chat.completions.create.call_args.kwargs["model"] == "gpt-3.5-turbo"
+
+
+@pytest.mark.asyncio
+async def test_openai_client_lifecycle(monkeypatch):
+    """Test creating and closing the shared OpenAI client"""
+    from roteamento_ia_backend.core.openai import openai_client
+
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    created = await openai_client.init_openai_client()
+    try:
+        assert openai_client.get_openai_client() is created
+    finally:
+        await openai_client.close_openai_client()
+
+    with pytest.raises(RuntimeError):
+        openai_client.get_openai_client()
+
+
+@pytest.mark.asyncio
+async def test_stream_common_emits_sse_and_records_ttft(sample_execution_payload, mock_prompt):
+    """Test that the streaming execution emits SSE events and stores ttft_ms"""
+    from roteamento_ia_backend.routers.execute import _stream_common
+
+    async def fake_stream(prompt, model):
+        for token in ["Olá", ", ", "mundo"]:
+            yield token
+
+    with patch('roteamento_ia_backend.routers.execute.get_prompt_by_id', new_callable=AsyncMock) as mock_get_prompt, \
+         patch('roteamento_ia_backend.routers.execute._select_stream_fn', new_callable=AsyncMock) as mock_select_stream, \
+         patch('roteamento_ia_backend.routers.execute.record_execution', new_callable=AsyncMock) as mock_create_execution:
+        mock_get_prompt.return_value = mock_prompt
+        mock_select_stream.return_value = fake_stream
+
+        response = await _stream_common(sample_execution_payload)
+        assert response.media_type == "text/event-stream"
+        body = "".join([chunk async for chunk in response.body_iterator])
+
+        events = [block for block in body.split("\n\n") if block]
+        assert [e.splitlines()[0] for e in events] == ["event: token"] * 3 + ["event: done"]
+        done = json.loads(events[-1].splitlines()[1][len("data: "):])
+        assert isinstance(done["ttft_ms"], int)
+        assert done["ttft_ms"] <= done["latency_ms"]
+
+        stored = mock_create_execution.call_args[0][0]
+        assert stored["output"] == "Olá, mundo"
+        assert stored["ttft_ms"] == done["ttft_ms"]
+        assert stored["streamed"] is True
+
+
+@pytest.mark.asyncio
+async def test_batch_results_bounded_fan_out_and_bulk_insert(mock_prompt):
+    """Test that batch executions respect the concurrency limit and are stored in bulk"""
+    import asyncio
+    from roteamento_ia_backend.routers.execute import _batch_results
+    from roteamento_ia_backend.db.schemas import BatchExecutionIn
+
+    payload = BatchExecutionIn(
+        prompt_id="6507e86b5a458dd52809d552",
+        ia_model="gpt-3.5-turbo",
+        variables={"name": "John"},
+        inputs=[f"input {i}" for i in range(5)],
+        concurrency=2,
+    )
+    in_flight = 0
+    max_in_flight = 0
+
+    async def fake_generate(prompt, model):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return prompt.rsplit("User Input: ", 1)[1].upper()
+
+    with patch('roteamento_ia_backend.routers.execute._select_model_fn', new_callable=AsyncMock) as mock_select_fn, \
+         patch('roteamento_ia_backend.routers.execute.create_executions_bulk', new_callable=AsyncMock) as mock_bulk, \
+         patch('roteamento_ia_backend.routers.execute.settings.BATCH_INSERT_CHUNK', 2):
+        mock_select_fn.return_value = (fake_generate, True)
+
+        lines = [json.loads(line) async for line in _batch_results(payload, "Rendered", "gpt-3.5-turbo")]
+
+        assert sorted(line["index"] for line in lines) == [0, 1, 2, 3, 4]
+        assert {line["output"] for line in lines} == {f"INPUT {i}" for i in range(5)}
+        assert max_in_flight == 2
+        assert mock_bulk.await_count == 3
+        stored = [doc for call in mock_bulk.call_args_list for doc in call[0][0]]
+        assert len(stored) == 5
+        assert all(doc["prompt_id"] == payload.prompt_id for doc in stored)
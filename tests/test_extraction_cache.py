@@ -0,0 +1,93 @@
+import io
+import pytest
+from unittest.mock import patch, AsyncMock
+from fastapi import UploadFile
+from starlette.datastructures import Headers
+
+from roteamento_ia_backend.core.extraction_cache import ExtractionCache, make_extraction_key
+from roteamento_ia_backend.core.metrics import EXTRACTION_CACHE_REQUESTS, EXTRACTION_CACHE_SAVED
+from roteamento_ia_backend.utils.file_utils import extract_text_from_image, extract_text_from_pdf, parse_page_ranges
+
+
+def _upload(data: bytes, mime_type: str, name: str) -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename=name, headers=Headers({"content-type": mime_type}))
+
+
+def test_key_depends_on_content_extractor_and_options():
+    """Test that the key changes with the file bytes, the extractor version and the options"""
+    base = make_extraction_key(b"pdf", "pdfplumber-0.11", {"pages": None, "max_chars": 10})
+
+    assert base == make_extraction_key(b"pdf", "pdfplumber-0.11", {"max_chars": 10, "pages": None})
+    assert base != make_extraction_key(b"pdf2", "pdfplumber-0.11", {"pages": None, "max_chars": 10})
+    assert base != make_extraction_key(b"pdf", "pdfplumber-0.12", {"pages": None, "max_chars": 10})
+    assert base != make_extraction_key(b"pdf", "pdfplumber-0.11", {"pages": [(1, 2)], "max_chars": 10})
+
+
+@pytest.mark.asyncio
+async def test_repeated_upload_skips_extraction():
+    """Test that the second extraction of the same bytes is served from memory and counted"""
+    cache = ExtractionCache(max_entries=10, ttl_s=60, use_mongo=False)
+    extract = AsyncMock(return_value="texto")
+    hits = EXTRACTION_CACHE_REQUESTS.labels("test", "memory")
+    before = hits._value.get()
+
+    assert await cache.get_or_extract(b"same", "test", "v1", None, extract) == "texto"
+    assert await cache.get_or_extract(b"same", "test", "v1", None, extract) == "texto"
+
+    extract.assert_awaited_once()
+    assert hits._value.get() == before + 1
+    assert EXTRACTION_CACHE_SAVED.labels("test")._value.get() >= 0
+
+
+@pytest.mark.asyncio
+async def test_mongo_tier_is_shared_and_promoted():
+    """Test that a miss in memory is served by Mongo and promoted to memory"""
+    cache = ExtractionCache(max_entries=10, ttl_s=60, use_mongo=True)
+    entry = {"text": "do mongo", "seconds": 2.5, "extractor": "v1"}
+    extract = AsyncMock()
+    with patch('roteamento_ia_backend.core.extraction_cache.get_cached_extraction', new_callable=AsyncMock,
+               return_value=entry) as mock_get:
+        assert await cache.get_or_extract(b"doc", "test", "v1", None, extract) == "do mongo"
+        assert await cache.get_or_extract(b"doc", "test", "v1", None, extract) == "do mongo"
+
+    mock_get.assert_awaited_once()
+    extract.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_failed_extraction_is_not_cached():
+    """Test that an extraction error is raised and retried on the next upload"""
+    cache = ExtractionCache(max_entries=10, ttl_s=60, use_mongo=True)
+    extract = AsyncMock(side_effect=[RuntimeError("tesseract crashed"), "ok"])
+    with patch('roteamento_ia_backend.core.extraction_cache.get_cached_extraction', new_callable=AsyncMock, return_value=None), \
+         patch('roteamento_ia_backend.core.extraction_cache.set_cached_extraction', new_callable=AsyncMock) as mock_set:
+        with pytest.raises(RuntimeError):
+            await cache.get_or_extract(b"img", "test", "v1", None, extract)
+        assert await cache.get_or_extract(b"img", "test", "v1", None, extract) == "ok"
+
+    assert mock_set.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_pdf_page_selection_is_part_of_the_key():
+    """Test that the same PDF with another page selection is extracted again"""
+    with patch('roteamento_ia_backend.utils.file_utils._pdf_page_count', return_value=3), \
+         patch('roteamento_ia_backend.utils.file_utils._pdf_pages_text',
+               side_effect=lambda content, numbers, max_chars: [(n, f"p{n}") for n in numbers]) as mock_pages:
+        first = await extract_text_from_pdf(_upload(b"%PDF", "application/pdf", "a.pdf"))
+        again = await extract_text_from_pdf(_upload(b"%PDF", "application/pdf", "a.pdf"))
+        subset = await extract_text_from_pdf(_upload(b"%PDF", "application/pdf", "a.pdf"), parse_page_ranges("2"))
+
+    assert first == again == "p1\np2\np3"
+    assert subset == "p2"
+    assert mock_pages.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_ocr_result_is_cached():
+    """Test that re-uploading the same screenshot does not rerun Tesseract"""
+    with patch('roteamento_ia_backend.utils.file_utils._ocr_text', return_value="texto da imagem") as mock_ocr:
+        for _ in range(3):
+            assert await extract_text_from_image(_upload(b"\x89PNG", "image/png", "a.png")) == "texto da imagem"
+
+    mock_ocr.assert_called_once()
@@ -0,0 +1,104 @@
+import asyncio
+import io
+import os
+import time
+import pytest
+from unittest.mock import patch, AsyncMock
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+
+from roteamento_ia_backend.core.extraction_pool import ExtractionPool
+from roteamento_ia_backend.utils.file_utils import prepare_file_for_ai, process_file_content
+
+
+@pytest.mark.asyncio
+async def test_runs_in_thread_when_pool_not_started():
+    """Test that extraction still works (off the event loop) without a process pool"""
+    pool = ExtractionPool(workers=2, max_pending=4, timeout_s=5, max_tasks_per_child=10)
+
+    assert await pool.run(sum, [1, 2, 3]) == 6
+    assert pool.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_rejects_when_queue_is_full():
+    """Test that extractions beyond max_pending get a 503 with Retry-After"""
+    pool = ExtractionPool(workers=0, max_pending=1, timeout_s=5, max_tasks_per_child=10)
+    first = asyncio.create_task(pool.run(time.sleep, 0.2))
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(HTTPException) as excinfo:
+        await pool.run(sum, [1])
+    assert excinfo.value.status_code == 503
+    assert excinfo.value.headers["Retry-After"] == "1"
+    assert pool.rejected == 1
+
+    await first
+    assert await pool.run(sum, [1]) == 1
+
+
+@pytest.mark.asyncio
+async def test_timeout_keeps_slot_until_extraction_finishes():
+    """Test that a timed-out extraction returns 504 but still counts as pending"""
+    pool = ExtractionPool(workers=0, max_pending=4, timeout_s=0.05, max_tasks_per_child=10)
+
+    with pytest.raises(HTTPException) as excinfo:
+        await pool.run(time.sleep, 0.3)
+    assert excinfo.value.status_code == 504
+    assert pool.pending == 1
+
+    await asyncio.sleep(0.4)
+    assert pool.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_hung_extraction_is_killed_and_pool_recovers():
+    """Test that a timed-out extraction kills its process, frees the slot and the pool keeps working"""
+    pool = ExtractionPool(workers=1, max_pending=1, timeout_s=1, max_tasks_per_child=10)
+    pool.start()
+    try:
+        with pytest.raises(HTTPException) as excinfo:
+            await pool.run(time.sleep, 3600)  # never finishes on its own
+        assert excinfo.value.status_code == 504
+
+        for _ in range(100):
+            if pool.pending == 0:
+                break
+            await asyncio.sleep(0.05)
+        assert pool.pending == 0
+        # max_pending=1: only possible once the hung slot was released
+        assert await pool.run(sum, [1, 2]) == 3
+    finally:
+        pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_process_workers_are_recycled():
+    """Test that each process is replaced after max_tasks_per_child extractions"""
+    pool = ExtractionPool(workers=1, max_pending=4, timeout_s=60, max_tasks_per_child=1)
+    pool.start()
+    try:
+        pids = [await pool.run(os.getpid) for _ in range(2)]
+    finally:
+        pool.stop()
+
+    assert os.getpid() not in pids
+    assert pids[0] != pids[1]
+
+
+def _upload(data: bytes, mime_type: str, name: str) -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename=name, headers=Headers({"content-type": mime_type}))
+
+
+@pytest.mark.asyncio
+async def test_saturated_pool_is_not_reported_as_bad_file():
+    """Test that a 503 from the pool propagates instead of becoming a 400 or an image fallback"""
+    busy = HTTPException(status_code=503, detail="busy")
+    with patch('roteamento_ia_backend.utils.file_utils.extraction_pool.run', new_callable=AsyncMock, side_effect=busy):
+        with pytest.raises(HTTPException) as excinfo:
+            await prepare_file_for_ai(_upload(b"%PDF-1.4", "application/pdf", "a.pdf"))
+        assert excinfo.value.status_code == 503
+
+        with pytest.raises(HTTPException) as excinfo:
+            await process_file_content(_upload(b"\x89PNG", "image/png", "a.png"))
+        assert excinfo.value.status_code == 503
@@ -0,0 +1,133 @@
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock
+
+from roteamento_ia_backend.core.hedging import hedged_call, hedge_plan
+from roteamento_ia_backend.core.model_stats import ModelStatsRegistry
+from roteamento_ia_backend.routers.execute import _call_model
+
+
+def _ok(result):
+    return result != "error"
+
+
+def test_model_stats_percentile_requires_min_samples():
+    """Test the rolling latency percentile per model"""
+    stats = ModelStatsRegistry(window=100)
+    for latency in range(1, 101):
+        stats.record("gemini-pro", latency, ok=True)
+    stats.record("gemini-pro", 10_000, ok=False)  # failures do not count as latency samples
+
+    assert stats.percentile("gemini-pro", 95) == 95.0
+    assert stats.percentile("gemini-pro", 50, min_samples=200) is None
+    assert stats.percentile("unknown", 95) is None
+
+
+def test_hedge_plan_uses_provider_secondary():
+    """Test that the hedge delay comes from the model's latency percentile"""
+    stats = ModelStatsRegistry(window=100)
+    for _ in range(30):
+        stats.record("gemini-pro", 400, ok=True)
+
+    with patch('roteamento_ia_backend.core.hedging.model_stats', stats):
+        assert hedge_plan("gemini-pro") == ("gpt-4o-mini", 0.4)
+        assert hedge_plan("gemini-flash") is None  # no samples yet
+
+
+@pytest.mark.asyncio
+async def test_hedged_call_does_not_fire_for_fast_primary():
+    """Test that no hedge is sent when the primary answers within the delay"""
+    secondary = AsyncMock(return_value="secondary")
+
+    async def primary():
+        return "primary"
+
+    result, fired, secondary_won = await hedged_call(primary, secondary, 0.05, _ok)
+
+    assert (result, fired, secondary_won) == ("primary", False, False)
+    secondary.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_hedged_call_secondary_wins_and_primary_is_cancelled():
+    """Test that a faster secondary wins and the slow primary is cancelled"""
+    cancelled = asyncio.Event()
+
+    async def primary():
+        try:
+            await asyncio.sleep(1)
+            return "primary"
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def secondary():
+        return "secondary"
+
+    result, fired, secondary_won = await hedged_call(primary, secondary, 0.01, _ok)
+    await asyncio.sleep(0)
+
+    assert (result, fired, secondary_won) == ("secondary", True, True)
+    assert cancelled.is_set()
+
+
+@pytest.mark.asyncio
+async def test_hedged_call_ignores_failed_secondary():
+    """Test that a failing secondary does not beat a slower successful primary"""
+    async def primary():
+        await asyncio.sleep(0.03)
+        return "primary"
+
+    async def secondary():
+        return "error"
+
+    result, fired, secondary_won = await hedged_call(primary, secondary, 0.01, _ok)
+
+    assert (result, fired, secondary_won) == ("primary", True, False)
+
+
+@pytest.mark.asyncio
+async def test_call_model_records_hedge_winner():
+    """Test that _call_model reports which model answered and whether a hedge fired"""
+    async def slow_primary(prompt, model):
+        await asyncio.sleep(1)
+        return "slow"
+
+    fast_secondary = AsyncMock(return_value="fast")
+
+    with patch('roteamento_ia_backend.routers.execute.hedge_plan', return_value=("gpt-4o-mini", 0.01)), \
+         patch('roteamento_ia_backend.routers.execute._select_model_fn', new_callable=AsyncMock) as mock_select_fn:
+        mock_select_fn.return_value = (fast_secondary, True)
+
+        call = await _call_model(slow_primary, True, "prompt", "gemini-pro", hedge=True)
+
+    assert call["output"] == "fast"
+    assert call["failed"] is False
+    assert call["answered_by"] == "gpt-4o-mini"
+    assert call["hedge"] == {"fired": True, "delay_ms": 10, "secondary_model": "gpt-4o-mini"}
+
+
+@pytest.mark.asyncio
+async def test_hedge_delay_does_not_drift_down_when_secondary_wins():
+    """Test that cancelled primaries still feed the latency window used for the hedge delay"""
+    stats = ModelStatsRegistry(window=20)
+    for _ in range(20):
+        stats.record("gemini-pro", 30, ok=True)
+    initial_p95 = stats.percentile("gemini-pro", 95)
+    rounds = iter([0.0, 1.0] * 20)  # half the calls fast, half stuck in the tail
+
+    async def primary(prompt, model):
+        await asyncio.sleep(next(rounds))
+        return "primary"
+
+    fast_secondary = AsyncMock(return_value="fast")
+    with patch('roteamento_ia_backend.core.hedging.model_stats', stats), \
+         patch('roteamento_ia_backend.routers.execute.model_stats', stats), \
+         patch('roteamento_ia_backend.routers.execute._select_model_fn', new_callable=AsyncMock) as mock_select_fn:
+        mock_select_fn.return_value = (fast_secondary, True)
+        for _ in range(40):
+            await _call_model(primary, True, "prompt", "gemini-pro", hedge=True)
+            await asyncio.sleep(0)  # lets the cancelled primary record its elapsed time
+
+    # Without the cancelled samples the window holds only the fast calls and p95 falls to ~0
+    assert stats.percentile("gemini-pro", 95) >= initial_p95 * 0.9
@@ -0,0 +1,207 @@
+import base64
+import io
+import struct
+import pytest
+from unittest.mock import AsyncMock, patch
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+from pydantic import ValidationError
+from starlette.datastructures import Headers
+
+from roteamento_ia_backend.core.config import Settings
+from roteamento_ia_backend.utils.file_utils import (
+    _ocr_text, _prepare_image, image_limits, prepare_file_for_ai,
+)
+
+
+def _image_bytes(size, fmt="JPEG", mode="RGB", exif=None):
+    out = io.BytesIO()
+    # RGBA images are fully transparent
+    image = Image.new(mode, size, "red" if mode == "RGB" else (0, 0, 0, 0))
+    kwargs = {"exif": exif} if exif is not None else {}
+    image.save(out, format=fmt, **kwargs)
+    return out.getvalue()
+
+
+def _s15_fixed(value):
+    return struct.pack(">i", round(value * 65536))
+
+
+def _swapped_rgb_profile() -> bytes:
+    """A minimal ICC v2 RGB profile: sRGB primaries with red and blue swapped, linear curves"""
+    def xyz(x, y, z):
+        return b"XYZ " + b"\0" * 4 + _s15_fixed(x) + _s15_fixed(y) + _s15_fixed(z)
+
+    text = b"swapped\0"
+    desc = b"desc" + b"\0" * 4 + struct.pack(">I", len(text)) + text + b"\0" * 79
+    curve = b"curv" + b"\0" * 4 + struct.pack(">IH", 1, 0x0100) + b"\0\0"
+    tags = [
+        (b"desc", desc), (b"wtpt", xyz(0.9642, 1.0, 0.8249)),
+        (b"rXYZ", xyz(0.1431, 0.0606, 0.7141)), (b"gXYZ", xyz(0.3851, 0.7169, 0.0971)),
+        (b"bXYZ", xyz(0.4361, 0.2225, 0.0139)),
+        (b"rTRC", curve), (b"gTRC", curve), (b"bTRC", curve),
+    ]
+    offset = 128 + 4 + 12 * len(tags)
+    table, data = b"", b""
+    for signature, body in tags:
+        body += b"\0" * (-len(body) % 4)
+        table += signature + struct.pack(">II", offset + len(data), len(body))
+        data += body
+    header = (
+        struct.pack(">I", offset + len(data)) + b"\0" * 4 + struct.pack(">I", 0x02100000)
+        + b"mntrRGB XYZ " + b"\0" * 12 + b"acsp" + b"\0" * 28
+        + _s15_fixed(0.9642) + _s15_fixed(1.0) + _s15_fixed(0.8249)
+    )
+    header += b"\0" * (128 - len(header))
+    return header + struct.pack(">I", len(tags)) + table + data
+
+
+def _upload(data: bytes, mime_type: str, name: str) -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename=name, headers=Headers({"content-type": mime_type}))
+
+
+def test_image_limits_by_model_provider_and_default():
+    """Test that limits are looked up by model, then provider, then default"""
+    limits = {"default": [1000, 500], "openai": [2048, 768], "gpt-4o-mini": [512, 512]}
+    with patch('roteamento_ia_backend.utils.file_utils.settings.IMAGE_MAX_DIMENSIONS', limits):
+        assert image_limits("gpt-4o-mini") == (512, 512)
+        assert image_limits("gpt-4o") == (2048, 768)
+        assert image_limits("gemini-1.5") == (1000, 500)
+        # Routing classes are resolved later: conservative default
+        assert image_limits("vision") == (1000, 500)
+        assert image_limits(None) == (1000, 500)
+
+
+def test_large_photo_is_downscaled_and_recompressed():
+    """Test that both the long and short side limits are applied"""
+    content = _image_bytes((4000, 3000))
+    data, mime_type, info = _prepare_image(content, 2048, 768, "webp", 80)
+
+    assert mime_type == "image/webp"
+    assert Image.open(io.BytesIO(data)).size == (1024, 768)
+    assert info["original_width"] == 4000 and info["width"] == 1024
+    assert info["original_bytes"] == len(content)
+    assert info["sent_bytes"] == len(data)
+    assert info["preprocessed"] is True
+
+
+def test_exif_is_stripped_and_orientation_applied():
+    """Test that EXIF metadata is removed after applying the rotation"""
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotated 90° clockwise
+    exif[0x010F] = "PhoneMaker"
+    content = _image_bytes((200, 100), exif=exif.tobytes())
+
+    data, mime_type, info = _prepare_image(content, 2048, 2048, "jpeg", 85)
+    sent = Image.open(io.BytesIO(data))
+
+    assert mime_type == "image/jpeg"
+    assert sent.size == (100, 200)
+    assert not sent.getexif()
+    assert info["preprocessed"] is True
+
+
+def test_transparent_png_is_flattened_for_jpeg():
+    """Test that the alpha channel becomes white instead of black in JPEG"""
+    content = _image_bytes((400, 400), fmt="PNG", mode="RGBA")
+    data, mime_type, _ = _prepare_image(content, 200, 200, "jpeg", 90)
+    assert mime_type == "image/jpeg"
+    pixel = Image.open(io.BytesIO(data)).getpixel((100, 100))
+    assert all(channel > 240 for channel in pixel)
+
+
+def test_icc_profile_is_converted_to_srgb():
+    """Test that colors are converted to sRGB before the profile is dropped"""
+    out = io.BytesIO()
+    Image.new("RGB", (400, 400), (255, 0, 0)).save(out, format="PNG", icc_profile=_swapped_rgb_profile())
+
+    data, _, info = _prepare_image(out.getvalue(), 200, 200, "webp", 90)
+    sent = Image.open(io.BytesIO(data))
+
+    assert info["preprocessed"] is True
+    assert not sent.info.get("icc_profile")
+    red, green, blue = sent.convert("RGB").getpixel((100, 100))
+    # Under this profile the stored "red" is the sRGB blue primary
+    assert blue > 240 and red < 15 and green < 15
+
+
+def test_corrupt_icc_profile_keeps_pixels():
+    """Test that a profile Pillow cannot apply leaves the colors unchanged"""
+    out = io.BytesIO()
+    Image.new("RGB", (400, 400), (255, 0, 0)).save(out, format="PNG", icc_profile=b"not a profile")
+
+    data, _, _ = _prepare_image(out.getvalue(), 200, 200, "jpeg", 90)
+    red, green, blue = Image.open(io.BytesIO(data)).getpixel((100, 100))
+    assert red > 240 and green < 15 and blue < 15
+
+
+def test_image_format_is_validated_in_settings():
+    """Test that IMAGE_FORMAT is normalized and unsupported formats fail at startup"""
+    assert Settings(MONGO_URI="mongodb://localhost", IMAGE_FORMAT=" JPEG ").IMAGE_FORMAT == "jpeg"
+    with pytest.raises(ValidationError):
+        Settings(MONGO_URI="mongodb://localhost", IMAGE_FORMAT="png")
+
+
+def test_small_clean_image_is_sent_as_is():
+    """Test that re-encoding is skipped when it would not make the image smaller"""
+    # A 1-bit checkerboard: tiny as PNG, the worst case for lossy WebP/JPEG
+    checkerboard = Image.new("1", (64, 64))
+    checkerboard.putdata([(x + y) % 2 for y in range(64) for x in range(64)])
+    out = io.BytesIO()
+    checkerboard.save(out, format="PNG", optimize=True)
+    content = out.getvalue()
+
+    data, mime_type, info = _prepare_image(content, 2048, 768, "webp", 85)
+
+    assert info["preprocessed"] is False
+    assert data == content
+    assert mime_type == "image/png"
+    assert info["sent_bytes"] == info["original_bytes"] == len(content)
+
+
+def test_ocr_runs_on_downscaled_grayscale_copy():
+    """Test that OCR receives the reduced copy, not the original image"""
+    content = _image_bytes((4000, 1000))
+    with patch('roteamento_ia_backend.utils.file_utils.pytesseract.image_to_string', return_value="") as ocr:
+        _ocr_text(content, 2000)
+    image = ocr.call_args[0][0]
+    assert image.size == (2000, 500)
+    assert image.mode == "L"
+
+
+@pytest.mark.asyncio
+async def test_prepare_file_for_ai_reports_image_sizes():
+    """Test that images without text go out preprocessed with their sizes"""
+    content = _image_bytes((3000, 3000))
+    with patch('roteamento_ia_backend.utils.file_utils._ocr_text', return_value=""):
+        file_data = await prepare_file_for_ai(_upload(content, "image/jpeg", "photo.jpg"), ia_model="gpt-4o")
+
+    assert file_data["content_type"] == "image"
+    assert file_data["content"].startswith("data:image/webp;base64,")
+    sent = base64.b64decode(file_data["content"].split(",", 1)[1])
+    assert Image.open(io.BytesIO(sent)).size == (768, 768)
+    assert file_data["image"]["original_bytes"] == len(content)
+    assert file_data["image"]["sent_bytes"] == len(sent)
+
+
+@pytest.mark.asyncio
+async def test_undecodable_image_falls_back_to_original():
+    """Test that files Pillow cannot open are still sent unchanged"""
+    content = b"not really an image"
+    with patch('roteamento_ia_backend.utils.file_utils._ocr_text', return_value=""):
+        file_data = await prepare_file_for_ai(_upload(content, "image/png", "broken.png"))
+
+    assert file_data["content"] == f"data:image/png;base64,{base64.b64encode(content).decode()}"
+    assert "image" not in file_data
+
+
+@pytest.mark.asyncio
+async def test_unexpected_preprocess_errors_are_not_swallowed():
+    """Test that only Pillow decode errors fall back to the original file; other errors fail the request"""
+    content = _image_bytes((100, 100))
+    with patch('roteamento_ia_backend.utils.file_utils._ocr_text', return_value=""), \
+         patch('roteamento_ia_backend.utils.file_utils.preprocess_image', new_callable=AsyncMock,
+               side_effect=RuntimeError("bug")):
+        with pytest.raises(HTTPException) as excinfo:
+            await prepare_file_for_ai(_upload(content, "image/jpeg", "photo.jpg"))
+    assert "bug" in excinfo.value.detail
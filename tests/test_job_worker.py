@@ -0,0 +1,121 @@
+import pytest
+from unittest.mock import patch, AsyncMock
+from bson import ObjectId
+from fastapi import HTTPException
+
+from roteamento_ia_backend.core.job_worker import JobWorkerPool, _payload_from_job
+from roteamento_ia_backend.db.schemas import ExecutionOut
+
+
+@pytest.fixture
+def pool():
+    return JobWorkerPool(workers=1, poll_interval_s=0.01, lease_s=30)
+
+
+@pytest.fixture
+def sample_job():
+    return {
+        "_id": ObjectId("6507e86b5a458dd52809d570"),
+        "status": "running",
+        "attempts": 1,
+        "max_attempts": 3,
+        "payload": {
+            "prompt_id": "6507e86b5a458dd52809d552",
+            "ia_model": "gpt-3.5-turbo",
+            "variables": {"name": "John"},
+            "input_text": "Hello, world!",
+        },
+    }
+
+
+def test_payload_from_job_rebuilds_file_input():
+    """Test that a queued file payload becomes an UploadFile again"""
+    payload = _payload_from_job({
+        "prompt_id": "6507e86b5a458dd52809d552",
+        "variables": {},
+        "file": {"file_name": "doc.pdf", "mime_type": "application/pdf", "data": b"%PDF"},
+    })
+
+    assert payload.input is None
+    assert payload.input_file.filename == "doc.pdf"
+    assert payload.input_file.content_type == "application/pdf"
+    assert payload.input_file.file.read() == b"%PDF"
+
+
+@pytest.mark.asyncio
+async def test_process_completes_job(pool, sample_job):
+    """Test that a successful execution marks the job as done with its result"""
+    result = ExecutionOut(output="ok", latency_ms=10, cost=0.0)
+    with patch('roteamento_ia_backend.routers.execute._execute_common', new_callable=AsyncMock) as mock_execute, \
+         patch('roteamento_ia_backend.core.job_worker.complete_job', new_callable=AsyncMock) as mock_complete:
+        mock_execute.return_value = result
+
+        await pool._process("w1", sample_job)
+
+        executed = mock_execute.call_args[0][0]
+        assert executed.prompt_id == sample_job["payload"]["prompt_id"]
+        assert executed.input.data == "Hello, world!"
+        mock_complete.assert_awaited_once_with(sample_job["_id"], "w1", result.model_dump())
+
+
+@pytest.mark.asyncio
+async def test_process_does_not_retry_client_errors(pool, sample_job):
+    """Test that HTTP errors (e.g. prompt not found) fail the job without retry"""
+    with patch('roteamento_ia_backend.routers.execute._execute_common', new_callable=AsyncMock) as mock_execute, \
+         patch('roteamento_ia_backend.core.job_worker.fail_job', new_callable=AsyncMock) as mock_fail:
+        mock_execute.side_effect = HTTPException(status_code=404, detail="Prompt não encontrado")
+
+        await pool._process("w1", sample_job)
+
+        mock_fail.assert_awaited_once_with(sample_job["_id"], "w1", "Prompt não encontrado", None)
+
+
+@pytest.mark.asyncio
+async def test_process_retries_unexpected_errors(pool, sample_job):
+    """Test that unexpected errors send the job back to the queue with a delay"""
+    with patch('roteamento_ia_backend.routers.execute._execute_common', new_callable=AsyncMock) as mock_execute, \
+         patch('roteamento_ia_backend.core.job_worker.fail_job', new_callable=AsyncMock) as mock_fail, \
+         patch('roteamento_ia_backend.core.job_worker.settings.JOB_RETRY_DELAY_S', 5.0):
+        mock_execute.side_effect = RuntimeError("mongo down")
+
+        await pool._process("w1", sample_job)
+        mock_fail.assert_awaited_once_with(sample_job["_id"], "w1", "mongo down", 5.0)
+
+        # Last attempt: no more retries
+        mock_fail.reset_mock()
+        sample_job["attempts"] = 3
+        await pool._process("w1", sample_job)
+        mock_fail.assert_awaited_once_with(sample_job["_id"], "w1", "mongo down", None)
+
+
+@pytest.mark.asyncio
+async def test_process_fails_jobs_over_max_attempts(pool, sample_job):
+    """Test that a job reclaimed after its last attempt is failed without executing"""
+    sample_job["attempts"] = 4
+    with patch('roteamento_ia_backend.routers.execute._execute_common', new_callable=AsyncMock) as mock_execute, \
+         patch('roteamento_ia_backend.core.job_worker.fail_job', new_callable=AsyncMock) as mock_fail:
+
+        await pool._process("w1", sample_job)
+
+        mock_execute.assert_not_called()
+        assert mock_fail.call_args[0][3] is None
+
+
+@pytest.mark.asyncio
+async def test_process_retries_provider_failures(pool, sample_job):
+    """Test that a failed provider call is retried instead of completing the job"""
+    result = ExecutionOut(output="Erro ao executar modelo gpt-3.5-turbo: 503", latency_ms=10, cost=0.0, error=True)
+    with patch('roteamento_ia_backend.routers.execute._execute_common', new_callable=AsyncMock, return_value=result), \
+         patch('roteamento_ia_backend.core.job_worker.complete_job', new_callable=AsyncMock) as mock_complete, \
+         patch('roteamento_ia_backend.core.job_worker.fail_job', new_callable=AsyncMock) as mock_fail, \
+         patch('roteamento_ia_backend.core.job_worker.settings.JOB_RETRY_DELAY_S', 5.0):
+        await pool._process("w1", sample_job)
+        mock_fail.assert_awaited_once_with(sample_job["_id"], "w1", result.output, 5.0, result.model_dump())
+
+        # Last attempt: the job fails and keeps the result with error=True
+        mock_fail.reset_mock()
+        sample_job["attempts"] = 3
+        await pool._process("w1", sample_job)
+        mock_fail.assert_awaited_once_with(sample_job["_id"], "w1", result.output, None, result.model_dump())
+
+    mock_complete.assert_not_called()
@@ -0,0 +1,83 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch, AsyncMock
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from roteamento_ia_backend.core.metrics import (
+    MongoCommandMetrics, metrics_middleware, metrics_response, track_extraction,
+)
+from roteamento_ia_backend.routers.execute import _invoke_model
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_provider_calls_are_observed_with_status():
+    """Test that provider call latency is recorded per model and status"""
+    labels = {"provider": "gemini", "model": "gemini-metrics", "status": "ok"}
+    before = _sample("provider_call_duration_seconds_count", **labels)
+
+    await _invoke_model(AsyncMock(return_value="ok"), True, "prompt", "gemini-metrics")
+
+    class TooMany(Exception):
+        status_code = 429
+
+    await _invoke_model(AsyncMock(side_effect=TooMany()), True, "prompt", "gemini-metrics")
+
+    assert _sample("provider_call_duration_seconds_count", **labels) == before + 1
+    assert _sample("provider_call_duration_seconds_count", **{**labels, "status": "rate_limited"}) >= 1
+
+
+def test_extraction_time_is_observed_by_mime_type():
+    """Test the file extraction timer"""
+    labels = {"mime_type": "application/pdf", "method": "pdfplumber"}
+    before = _sample("file_extraction_duration_seconds_count", **labels)
+
+    with track_extraction("application/pdf", "pdfplumber"):
+        pass
+
+    assert _sample("file_extraction_duration_seconds_count", **labels) == before + 1
+
+
+def test_mongo_listener_records_command_latency():
+    """Test that Mongo commands are measured with their collection"""
+    listener = MongoCommandMetrics()
+    labels = {"command": "find", "collection": "prompts", "status": "ok"}
+    before = _sample("mongo_operation_duration_seconds_count", **labels)
+
+    listener.started(SimpleNamespace(command_name="find", command={"find": "prompts"}, request_id=1))
+    listener.succeeded(SimpleNamespace(command_name="find", request_id=1, duration_micros=1500))
+
+    assert _sample("mongo_operation_duration_seconds_count", **labels) == before + 1
+
+
+def test_request_latency_uses_route_template():
+    """Test that request latency is labelled with the route template, not the URL"""
+    app = FastAPI()
+    app.middleware("http")(metrics_middleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: str):
+        return {"id": item_id}
+
+    labels = {"method": "GET", "route": "/items/{item_id}", "status": "200"}
+    before = _sample("http_request_duration_seconds_count", **labels)
+    with TestClient(app) as client:
+        client.get("/items/1")
+        client.get("/items/2")
+
+    assert _sample("http_request_duration_seconds_count", **labels) == before + 2
+
+
+def test_metrics_response_in_multiprocess_mode(tmp_path, monkeypatch):
+    """Test that /metrics aggregates the multiprocess directory when configured"""
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    with patch('roteamento_ia_backend.core.metrics.MULTIPROCESS', True):
+        response = metrics_response()
+
+    assert response.status_code == 200
+    assert response.media_type.startswith("text/plain")
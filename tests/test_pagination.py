@@ -0,0 +1,119 @@
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import patch, AsyncMock, MagicMock
+from bson import ObjectId
+from fastapi import HTTPException
+
+from roteamento_ia_backend.db.crud import prompts_filter
+from roteamento_ia_backend.db.pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_page
+from roteamento_ia_backend.routers.executions import list_executions
+from roteamento_ia_backend.routers.prompts import list_all
+
+
+def _collection(docs):
+    cursor = MagicMock()
+    cursor.sort.return_value = cursor
+    cursor.limit.return_value = cursor
+    cursor.to_list = AsyncMock(side_effect=lambda length: docs[:length])
+    collection = MagicMock()
+    collection.find.return_value = cursor
+    return collection, cursor
+
+
+def test_cursor_round_trip():
+    """Test that the opaque cursor decodes back to the last _id and checks the sort direction"""
+    oid = ObjectId()
+    token = encode_cursor(oid, -1)
+
+    assert decode_cursor(token, -1) == oid
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token, 1)
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor", 1)
+
+
+@pytest.mark.asyncio
+async def test_keyset_page_returns_next_cursor_only_when_more_remain():
+    """Test that one extra document is fetched to detect the next page"""
+    docs = [{"_id": ObjectId()} for _ in range(3)]
+    collection, cursor = _collection(docs)
+
+    page, next_cursor = await keyset_page(collection, {}, limit=2)
+    assert page == docs[:2]
+    assert decode_cursor(next_cursor, 1) == docs[1]["_id"]
+    cursor.limit.assert_called_with(3)
+
+    page, next_cursor = await keyset_page(collection, {}, limit=5)
+    assert page == docs and next_cursor is None
+
+
+@pytest.mark.asyncio
+async def test_keyset_page_continues_after_cursor_within_window():
+    """Test that the cursor becomes an _id bound combined with the time window"""
+    last = ObjectId()
+    since = ObjectId.from_datetime(datetime(2026, 1, 1, tzinfo=timezone.utc))
+    until = ObjectId.from_datetime(datetime(2027, 1, 1, tzinfo=timezone.utc))
+    collection, cursor = _collection([])
+
+    await keyset_page(collection, {"_id": {"$gte": since, "$lt": until}}, 10, encode_cursor(last, -1), order=-1,
+                      projection={"latency_ms": 1, "_id": 0})
+
+    query, projection = collection.find.call_args[0]
+    assert query == {"_id": {"$gte": since, "$lt": last}}
+    assert projection == {"latency_ms": 1}  # _id always kept for the cursor
+    cursor.sort.assert_called_once_with("_id", -1)
+
+
+def test_prompts_filter_escapes_name_prefix():
+    """Test that the name prefix is an anchored, escaped regex"""
+    query = prompts_filter(ia_model="gpt-4o", name_prefix="resumo (v1")
+
+    assert query == {"ia_model": "gpt-4o", "name": {"$regex": r"^resumo\ \(v1"}}
+
+
+@pytest.mark.asyncio
+async def test_list_prompts_returns_next_cursor_and_projects_fields():
+    """Test that /prompts returns the same page body as /executions"""
+    docs = [{"_id": ObjectId(), "name": "p1"}, {"_id": ObjectId(), "name": "p2"}]
+    with patch('roteamento_ia_backend.routers.prompts.get_prompts', new_callable=AsyncMock,
+               return_value=(docs, "next-token")) as mock_get:
+        page = await list_all(limit=2, cursor=None, ia_model=None, name_prefix="p",
+                              since=None, until=None, fields="name")
+
+    assert page.model_dump(exclude_unset=True) == {
+        "items": [
+            {"id": str(docs[0]["_id"]), "name": "p1"},
+            {"id": str(docs[1]["_id"]), "name": "p2"},
+        ],
+        "next_cursor": "next-token",
+    }
+    assert mock_get.call_args[0][3] == {"name": 1}
+
+    with pytest.raises(HTTPException) as excinfo:
+        await list_all(limit=2, cursor=None, ia_model=None, name_prefix=None,
+                       since=None, until=None, fields="name,secret")
+    assert excinfo.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_list_executions_rejects_bad_cursor():
+    """Test that a malformed cursor is a 400, not a 500"""
+    with patch('roteamento_ia_backend.routers.executions.get_executions_page', new_callable=AsyncMock,
+               side_effect=InvalidCursor("Cursor inválido")):
+        with pytest.raises(HTTPException) as excinfo:
+            await list_executions(limit=10, cursor="x", prompt_id=None, ia_model=None, since=None, until=None, fields=None)
+
+    assert excinfo.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_list_executions_serializes_page():
+    """Test that ObjectIds and datetimes are serialized in the page items"""
+    oid = ObjectId()
+    docs = [{"_id": oid, "prompt_id": "p", "created_at": datetime(2026, 3, 1, tzinfo=timezone.utc)}]
+    with patch('roteamento_ia_backend.routers.executions.get_executions_page', new_callable=AsyncMock,
+               return_value=(docs, None)):
+        page = await list_executions(limit=10, cursor=None, prompt_id="p", ia_model=None, since=None, until=None, fields=None)
+
+    assert page.items == [{"_id": str(oid), "prompt_id": "p", "created_at": "2026-03-01T00:00:00+00:00"}]
+    assert page.next_cursor is None
@@ -0,0 +1,25 @@
+import pytest
+from datetime import datetime, timezone
+from fastapi import HTTPException
+
+from roteamento_ia_backend.routers.params import parse_fields, utc_window
+
+
+def test_parse_fields_dedupes_and_drops_covered_sub_paths():
+    """Test that repeated fields and sub-paths of selected fields are dropped"""
+    assert parse_fields(None) is None
+    assert parse_fields(" name, ia_model ,name") == ["name", "ia_model"]
+    assert parse_fields("fallback.used,fallback,latency_ms") == ["fallback", "latency_ms"]
+    with pytest.raises(HTTPException) as excinfo:
+        parse_fields("name,$where")
+    assert excinfo.value.status_code == 400
+
+
+def test_utc_window_normalizes_naive_dates():
+    """Test that naive dates become UTC and inverted windows are rejected"""
+    since, until = utc_window(datetime(2025, 1, 1), datetime(2025, 1, 2, tzinfo=timezone.utc))
+    assert since == datetime(2025, 1, 1, tzinfo=timezone.utc)
+    assert utc_window(None, None) == (None, None)
+    with pytest.raises(HTTPException) as excinfo:
+        utc_window(datetime(2025, 1, 2), datetime(2025, 1, 1))
+    assert excinfo.value.status_code == 400
@@ -0,0 +1,124 @@
+import io
+import os
+import pytest
+from unittest.mock import patch
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+
+from roteamento_ia_backend.routers.execute import _build_payload
+from roteamento_ia_backend.utils.file_utils import extract_text_from_pdf, iter_pdf_pages, parse_page_ranges
+
+PAGE_TEXT = "x" * 100
+
+
+def _fake_pdf(page_count, calls, paths=None):
+    def pages_text(path, page_numbers, max_chars):
+        if paths is not None:
+            with open(path, "rb") as f:
+                paths.append((path, f.read()))
+        calls.append(list(page_numbers))
+        return [(n, f"p{n}:" + PAGE_TEXT) for n in page_numbers]
+    return (
+        patch('roteamento_ia_backend.utils.file_utils._pdf_page_count', return_value=page_count),
+        patch('roteamento_ia_backend.utils.file_utils._pdf_pages_text', side_effect=pages_text),
+        patch('roteamento_ia_backend.utils.file_utils.settings.PDF_PAGES_PER_TASK', 4),
+    )
+
+
+def test_parse_page_ranges():
+    """Test that page selections are parsed into inclusive ranges"""
+    assert parse_page_ranges("1-3, 7") == [(1, 3), (7, 7)]
+    assert parse_page_ranges("") is None
+    for bad in ("0", "3-1", "a", "1,,2"):
+        with pytest.raises(ValueError):
+            parse_page_ranges(bad)
+
+
+@pytest.mark.asyncio
+async def test_pages_are_yielded_in_order_from_chunks():
+    """Test that pages come back in document order, split into chunks"""
+    calls = []
+    count, text, size = _fake_pdf(10, calls)
+    with count, text, size:
+        pages = [n async for n, _ in iter_pdf_pages(b"%PDF")]
+
+    assert pages == list(range(1, 11))
+    assert sorted(calls) == [[1, 2, 3, 4], [5, 6, 7, 8], [9, 10]]
+
+
+@pytest.mark.asyncio
+async def test_page_selection_skips_other_pages():
+    """Test that only the selected pages (within the document) are extracted"""
+    calls = []
+    count, text, size = _fake_pdf(10, calls)
+    with count, text, size:
+        pages = [n async for n, _ in iter_pdf_pages(b"%PDF", parse_page_ranges("2,9-40"))]
+
+    assert pages == [2, 9, 10]
+    assert calls == [[2, 9, 10]]
+
+
+@pytest.mark.asyncio
+async def test_selection_outside_the_document_is_rejected():
+    """Test that a page selection matching no page is a 400 instead of empty text"""
+    calls = []
+    count, text, size = _fake_pdf(3, calls)
+    upload = UploadFile(file=io.BytesIO(b"%PDF"), filename="a.pdf", headers=Headers({"content-type": "application/pdf"}))
+    with count, text, size, \
+         patch('roteamento_ia_backend.utils.file_utils.settings.EXTRACTION_CACHE_ENABLED', False):
+        with pytest.raises(HTTPException) as excinfo:
+            await extract_text_from_pdf(upload, parse_page_ranges("5-9"), max_chars=0)
+
+    assert excinfo.value.status_code == 400
+    assert calls == []
+
+
+@pytest.mark.asyncio
+async def test_chunks_share_one_temp_file():
+    """Test that workers get the path of a single temp copy, removed afterwards"""
+    calls, paths = [], []
+    count, text, size = _fake_pdf(10, calls, paths)
+    with count, text, size:
+        pages = [n async for n, _ in iter_pdf_pages(b"%PDF-1.7 data")]
+
+    assert pages == list(range(1, 11))
+    assert len(paths) == 3
+    assert len({path for path, _ in paths}) == 1
+    assert all(data == b"%PDF-1.7 data" for _, data in paths)
+    assert not os.path.exists(paths[0][0])
+
+
+@pytest.mark.asyncio
+async def test_character_budget_stops_early():
+    """Test that extraction stops at the budget and later chunks are never started"""
+    calls = []
+    count, text, size = _fake_pdf(500, calls)
+    with count, text, size:
+        pages = [(n, t) async for n, t in iter_pdf_pages(b"%PDF", max_chars=250)]
+
+    assert [n for n, _ in pages] == [1, 2, 3]
+    assert sum(len(t) for _, t in pages) == 250
+    # At most one chunk per pool worker was in flight when the budget was reached
+    assert len(calls) <= 3
+
+
+@pytest.mark.asyncio
+async def test_extract_text_from_pdf_joins_selected_pages():
+    """Test that the PDF text is the selected pages joined by newlines"""
+    calls = []
+    count, text, size = _fake_pdf(5, calls)
+    upload = UploadFile(file=io.BytesIO(b"%PDF"), filename="a.pdf", headers=Headers({"content-type": "application/pdf"}))
+    with count, text, size:
+        result = await extract_text_from_pdf(upload, parse_page_ranges("1,3"), max_chars=0)
+
+    assert result == f"p1:{PAGE_TEXT}\np3:{PAGE_TEXT}"
+
+
+def test_build_payload_rejects_invalid_pages():
+    """Test that a malformed page selection is a 400"""
+    upload = UploadFile(file=io.BytesIO(b"%PDF"), filename="a.pdf", headers=Headers({"content-type": "application/pdf"}))
+
+    assert _build_payload("p", "gpt-4o", "{}", None, upload, pages="1-2").pages == "1-2"
+    with pytest.raises(HTTPException) as excinfo:
+        _build_payload("p", "gpt-4o", "{}", None, upload, pages="2-1")
+    assert excinfo.value.status_code == 400
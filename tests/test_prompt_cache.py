@@ -0,0 +1,113 @@
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+from roteamento_ia_backend.db.crud import (
+    get_prompt_by_id, update_prompt, prompt_cache, watch_prompt_changes, _poll_prompt_versions,
+)
+
+PROMPT_ID = "6507e86b5a458dd52809d552"
+
+
+def _prompt_doc(version=0):
+    return {
+        "_id": ObjectId(PROMPT_ID),
+        "name": "Test Prompt",
+        "template": "Hello {name}",
+        "ia_model": "gemini-pro",
+        "variables": ["name"],
+        "version": version,
+    }
+
+
+@pytest.mark.asyncio
+async def test_cache_hit_does_no_io(mock_mongo_db):
+    """Test that the second lookup is served from memory"""
+    mock_mongo_db.prompts.find_one.return_value = _prompt_doc()
+
+    first = await get_prompt_by_id(PROMPT_ID)
+    second = await get_prompt_by_id(PROMPT_ID)
+
+    assert second is first
+    mock_mongo_db.prompts.find_one.assert_called_once()
+    assert prompt_cache.stats()["hits"] == 1
+    assert prompt_cache.stats()["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_update_invalidates_local_entry(mock_mongo_db):
+    """Test that updating a prompt drops it from this worker's cache"""
+    mock_mongo_db.prompts.find_one.return_value = _prompt_doc()
+    mock_mongo_db.prompts.update_one.return_value = MagicMock(modified_count=1)
+    await get_prompt_by_id(PROMPT_ID)
+
+    await update_prompt(PROMPT_ID, {"name": "Renamed"})
+    mock_mongo_db.prompts.find_one.return_value = {**_prompt_doc(version=1), "name": "Renamed"}
+
+    assert (await get_prompt_by_id(PROMPT_ID)).name == "Renamed"
+    assert mock_mongo_db.prompts.find_one.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_version_poll_drops_stale_entries(mock_mongo_db):
+    """Test that the poll fallback invalidates prompts whose version changed elsewhere"""
+    mock_mongo_db.prompts.find_one.return_value = _prompt_doc(version=0)
+    await get_prompt_by_id(PROMPT_ID)
+
+    mock_mongo_db.prompts.find.return_value.to_list = AsyncMock(
+        return_value=[{"_id": ObjectId(PROMPT_ID), "version": 1}]
+    )
+    await _poll_prompt_versions()
+
+    assert prompt_cache.stats()["entries"] == 0
+    assert prompt_cache.stats()["invalidations"] == 1
+
+
+@pytest.mark.asyncio
+async def test_watcher_invalidates_on_change_event(mock_mongo_db):
+    """Test that a change stream event invalidates the changed prompt"""
+    mock_mongo_db.prompts.find_one.return_value = _prompt_doc()
+    processed = asyncio.Event()
+
+    class FakeStream:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        def __aiter__(self):
+            return self._events()
+
+        async def _events(self):
+            # The cache is filled after the stream opens (opening clears it)
+            await get_prompt_by_id(PROMPT_ID)
+            yield {"operationType": "update", "documentKey": {"_id": ObjectId(PROMPT_ID)}}
+            processed.set()
+            await asyncio.sleep(3600)
+
+    mock_mongo_db.prompts.watch = MagicMock(return_value=FakeStream())
+    task = asyncio.create_task(watch_prompt_changes())
+    await asyncio.wait_for(processed.wait(), timeout=1)
+    task.cancel()
+
+    assert prompt_cache.stats()["entries"] == 0
+    assert prompt_cache.stats()["invalidation_mode"] == "change_stream"
+
+
+@pytest.mark.asyncio
+async def test_watcher_falls_back_to_polling(mock_mongo_db):
+    """Test that a standalone server (no change streams) switches to version polling"""
+    mock_mongo_db.prompts.watch = MagicMock(side_effect=OperationFailure("not a replica set", code=40573))
+
+    with patch('roteamento_ia_backend.db.crud._poll_prompt_versions', new_callable=AsyncMock) as mock_poll, \
+         patch('roteamento_ia_backend.db.crud.settings.PROMPT_CACHE_POLL_INTERVAL_S', 0):
+        task = asyncio.create_task(watch_prompt_changes())
+        for _ in range(10):
+            await asyncio.sleep(0)
+        task.cancel()
+
+    assert prompt_cache.stats()["invalidation_mode"] == "poll"
+    assert mock_poll.await_count > 0
@@ -1,6 +1,7 @@
 import pytest
 from unittest.mock import patch, AsyncMock, MagicMock
 from bson import ObjectId
+from datetime import datetime, timezone
 
 from roteamento_ia_backend.db.models import PromptModel
 from roteamento_ia_backend.db.crud import (
@@ -86,7 +87,7 @@ async def test_get_prompts():
         
         # Create a mock cursor that can be used in the method chain
         mock_cursor = MagicMock()
-        mock_cursor.skip = MagicMock(return_value=mock_cursor)
+        mock_cursor.sort = MagicMock(return_value=mock_cursor)
         mock_cursor.limit = MagicMock(return_value=mock_cursor)
         mock_cursor.to_list = AsyncMock(return_value=sample_prompts)
         
@@ -94,21 +95,21 @@ async def test_get_prompts():
         mock_db.prompts.find = MagicMock(return_value=mock_cursor)
         
         # Execute the function being tested
-        result = await get_prompts(limit=100, skip=0)
+        result, next_cursor = await get_prompts(limit=100)
         
         # Assertions
         assert isinstance(result, list)
         assert len(result) == 2
-        assert isinstance(result[0], PromptModel)
-        assert str(result[0].id) == "6507e86b5a458dd52809d552"
-        assert result[0].name == "Test Prompt 1"
-        assert result[1].name == "Test Prompt 2"
-        
-        # Verify the mock calls
-        mock_db.prompts.find.assert_called_once()
-        mock_cursor.skip.assert_called_once_with(0)
-        mock_cursor.limit.assert_called_once_with(100)
-        mock_cursor.to_list.assert_called_once_with(length=100)
+        assert result[0]["_id"] == ObjectId("6507e86b5a458dd52809d552")
+        assert result[0]["name"] == "Test Prompt 1"
+        assert result[1]["name"] == "Test Prompt 2"
+        assert next_cursor is None  # fewer than limit + 1 documents: last page
+        
+        # Verify the mock calls (keyset pagination: sorted by _id, one extra document)
+        mock_db.prompts.find.assert_called_once_with({}, None)
+        mock_cursor.sort.assert_called_once_with("_id", 1)
+        mock_cursor.limit.assert_called_once_with(101)
+        mock_cursor.to_list.assert_called_once_with(length=101)
 
 @pytest.mark.asyncio
 async def test_get_prompt_by_id(sample_prompt_model):
@@ -173,7 +174,7 @@ async def test_update_prompt():
         assert result is True
         mock_update_one.assert_called_once_with(
             {"_id": ObjectId(valid_id)}, 
-            {"$set": update_data}
+            {"$set": update_data, "$inc": {"version": 1}}
         )
         
         # Reset mock
@@ -238,62 +239,62 @@ async def test_delete_prompt():
 async def test_get_prompt_metrics():
     """Test getting execution metrics for a prompt"""
     with patch('roteamento_ia_backend.db.crud.db') as mock_db:
-        # Setup mock responses
         valid_id = "6507e86b5a458dd52809d552"
-        
-        # Sample executions data
-        sample_executions = [
-            {
-                "_id": ObjectId("6507e86b5a458dd52809d560"),
-                "prompt_id": valid_id,
-                "latency_ms": 100,
-                "cost": 0.001
-            },
-            {
-                "_id": ObjectId("6507e86b5a458dd52809d561"),
-                "prompt_id": valid_id,
-                "latency_ms": 200,
-                "cost": 0.002
-            }
-        ]
-        
-        # Create a mock cursor for find() results
-        mock_cursor = MagicMock()
-        mock_cursor.to_list = AsyncMock(return_value=sample_executions)
-        
-        # Make find return the cursor
-        mock_db.executions.find = MagicMock(return_value=mock_cursor)
-        
-        # Execute the function with valid ID
+
+        # A single $facet aggregation, percentiles included
+        facets = {
+            "summary": [{
+                "_id": None, "total": 4, "avg_latency_ms": 250.0,
+                "avg_cost": 0.0015, "avg_ttft_ms": None, "errors": 1,
+            }],
+            "by_model": [
+                {"_id": "gpt-4o", "count": 3, "avg_latency_ms": 200.0, "errors": 1},
+                {"_id": "gemini-pro", "count": 1, "avg_latency_ms": 400.0, "errors": 0},
+            ],
+            "by_type": [{"_id": "text", "count": 3}, {"_id": "image", "count": 1}],
+            "latency": [{"p50": 200, "p90": 400, "p99": 400}],
+        }
+        cursor = MagicMock()
+        cursor.to_list = AsyncMock(return_value=[facets])
+        mock_db.executions.aggregate = MagicMock(return_value=cursor)
+
         result = await get_prompt_metrics(valid_id)
-        
-        # Assertions
-        assert isinstance(result, dict)
-        assert "total_executions" in result
-        assert "avg_latency_ms" in result
-        assert "avg_cost" in result
-        assert result["total_executions"] == 2
-        assert result["avg_latency_ms"] == 150.0  # Average of 100 and 200
-        assert result["avg_cost"] == 0.0015  # Average of 0.001 and 0.002
-        
-        # Verify the mock calls
-        mock_db.executions.find.assert_called_once_with({"prompt_id": valid_id})
-        mock_cursor.to_list.assert_called_once_with(length=None)
-        
-        # Reset mocks
-        mock_db.executions.find.reset_mock()
-        mock_cursor.to_list.reset_mock()
-        
+
+        # Computed in Mongo: no execution documents are loaded
+        mock_db.executions.find.assert_not_called()
+        mock_db.executions.aggregate.assert_called_once()
+        # The latencies are sorted once for all percentiles
+        latency_stages = mock_db.executions.aggregate.call_args[0][0][1]["$facet"]["latency"]
+        assert [stage for stage in latency_stages if "$sort" in stage] == [{"$sort": {"latency_ms": 1}}]
+        assert set(latency_stages[-1]["$project"]) == {"_id", "p50", "p90", "p99"}
+        assert result["total_executions"] == 4
+        assert result["avg_latency_ms"] == 250.0
+        assert result["avg_cost"] == 0.0015
+        assert (result["p50_latency_ms"], result["p90_latency_ms"], result["p99_latency_ms"]) == (200.0, 400.0, 400.0)
+        assert result["error_rate"] == 0.25
+        assert result["by_model"]["gpt-4o"]["error_rate"] == pytest.approx(1 / 3)
+        assert result["execution_types"] == {"text": 3, "image": 1}
+        first_pipeline = mock_db.executions.aggregate.call_args_list[0][0][0]
+        assert first_pipeline[0] == {"$match": {"prompt_id": valid_id}}
+
+        # Time window filters on the creation time embedded in _id
+        mock_db.executions.aggregate.reset_mock()
+        since, until = datetime(2025, 1, 1, tzinfo=timezone.utc), datetime(2025, 2, 1, tzinfo=timezone.utc)
+        await get_prompt_metrics(valid_id, since, until)
+        match = mock_db.executions.aggregate.call_args_list[0][0][0][0]["$match"]
+        assert match["_id"] == {"$gte": ObjectId.from_datetime(since), "$lt": ObjectId.from_datetime(until)}
+
+        # No latency samples: percentiles are None
+        facets["latency"] = []
+        result_no_latency = await get_prompt_metrics(valid_id)
+        assert result_no_latency["p50_latency_ms"] is None
+
         # Test no executions found
-        mock_cursor.to_list.return_value = []
+        facets["summary"] = []
         result_empty = await get_prompt_metrics(valid_id)
-        
-        # Assertions
         assert result_empty is None
-        
+
         # Invalid ID case
         invalid_id = "invalid_id_format"
         result_invalid = await get_prompt_metrics(invalid_id)
-        
-        # Assertions for invalid ID
-        assert result_invalid is None
\ No newline at end of file
+        assert result_invalid is None
@@ -0,0 +1,121 @@
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+from bson import ObjectId
+from fastapi import HTTPException
+
+from roteamento_ia_backend.core.rate_limit import (
+    TokenBucket, RateLimiterRegistry, RateLimitTimeout, rate_limit_retry_after, estimate_tokens
+)
+from roteamento_ia_backend.routers.execute import _execute_common
+from roteamento_ia_backend.db.schemas import ExecutionIn, InputPayload
+from roteamento_ia_backend.db.models import PromptModel
+
+
+def test_token_bucket_waits_when_empty():
+    """Test that an empty bucket reports the time needed to refill"""
+    bucket = TokenBucket(per_minute=60)  # 1 token/s
+    bucket.tokens = 0.0
+
+    assert bucket.wait_time(1) == pytest.approx(1.0, abs=0.05)
+
+
+def test_token_bucket_adapts_to_rate_limits():
+    """Test that a 429 halves the rate and honours Retry-After, and successes recover it"""
+    bucket = TokenBucket(per_minute=600)
+    bucket.penalize(retry_after_s=2.0)
+
+    assert bucket.rate == pytest.approx(bucket.base_rate * 0.5)
+    assert bucket.wait_time(1) >= 1.9
+
+    for _ in range(100):
+        bucket.reward()
+    assert bucket.rate == bucket.base_rate
+
+
+def test_rate_limit_retry_after_detects_provider_429():
+    """Test reading Retry-After from OpenAI/Gemini style exceptions"""
+    exc = Exception("rate limited")
+    exc.status_code = 429
+    exc.response = MagicMock(headers={"retry-after": "7"})
+    assert rate_limit_retry_after(exc) == 7.0
+
+    gemini_exc = Exception("resource exhausted")
+    gemini_exc.code = 429
+    assert rate_limit_retry_after(gemini_exc) == 0.0
+
+    assert rate_limit_retry_after(Exception("other")) is None
+
+
+def test_estimate_tokens_ignores_base64_size():
+    """Test that an embedded image counts as a fixed number of tokens"""
+    image_prompt = "Describe:\ndata:image/png;base64," + "A" * 1_000_000
+    assert estimate_tokens(image_prompt) < 5_000
+
+
+@pytest.mark.asyncio
+async def test_registry_limits_concurrency_per_provider():
+    """Test that the provider semaphore bounds in-flight calls"""
+    registry = RateLimiterRegistry({"openai": {"concurrency": 2}}, max_wait_s=1.0)
+    in_flight = 0
+    max_in_flight = 0
+
+    async def call():
+        nonlocal in_flight, max_in_flight
+        async with registry.limit("gpt-4o", 10):
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+    await asyncio.gather(*(call() for _ in range(6)))
+
+    assert max_in_flight == 2
+    assert registry.snapshot()["openai"]["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_registry_times_out_callers_over_max_wait():
+    """Test that callers waiting longer than max_wait_s get RateLimitTimeout"""
+    registry = RateLimiterRegistry({"gemini": {"rpm": 1}}, max_wait_s=0.05)
+
+    async with registry.limit("gemini-pro", 10):
+        pass
+    with pytest.raises(RateLimitTimeout):
+        async with registry.limit("gemini-pro", 10):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_execute_common_returns_503_when_rate_limited():
+    """Test that a limiter timeout becomes a 503 instead of a stored error output"""
+    prompt = PromptModel(
+        _id=ObjectId("6507e86b5a458dd52809d552"),
+        name="Test Prompt",
+        template="Hello",
+        ia_model="gpt-3.5-turbo",
+        variables=[]
+    )
+    payload = ExecutionIn(
+        prompt_id="6507e86b5a458dd52809d552",
+        ia_model="gpt-3.5-turbo",
+        input=InputPayload(type="text", data="Hi")
+    )
+    registry = RateLimiterRegistry({"openai": {"rpm": 1}}, max_wait_s=0.0)
+    registry._get("openai").requests.tokens = 0.0
+
+    with patch('roteamento_ia_backend.routers.execute.rate_limiter', registry), \
+         patch('roteamento_ia_backend.routers.execute.get_prompt_by_id', new_callable=AsyncMock) as mock_get_prompt, \
+         patch('roteamento_ia_backend.routers.execute._select_model_fn', new_callable=AsyncMock) as mock_select_fn, \
+         patch('roteamento_ia_backend.routers.execute.record_execution', new_callable=AsyncMock) as mock_create_execution:
+        mock_get_prompt.return_value = prompt
+        generate = AsyncMock(return_value="never")
+        mock_select_fn.return_value = (generate, True)
+
+        with pytest.raises(HTTPException) as excinfo:
+            await _execute_common(payload)
+
+        assert excinfo.value.status_code == 503
+        assert "Retry-After" in excinfo.value.headers
+        generate.assert_not_called()
+        mock_create_execution.assert_not_called()
@@ -0,0 +1,183 @@
+import asyncio
+import os
+import pytest
+from bson import ObjectId, json_util
+from unittest.mock import patch, AsyncMock
+
+from roteamento_ia_backend.db.recorder import ExecutionRecorder
+
+
+def _recorder(tmp_path, **kwargs):
+    params = dict(max_queue=100, batch_size=3, flush_interval_s=0.05, max_wait_s=0.01,
+                  spill_path=str(tmp_path / "spill.jsonl"))
+    params.update(kwargs)
+    return ExecutionRecorder(**params)
+
+
+@pytest.mark.asyncio
+async def test_records_are_flushed_in_batches(tmp_path):
+    """Test that queued executions are written with insert_many by batch size"""
+    recorder = _recorder(tmp_path)
+    with patch('roteamento_ia_backend.db.recorder.create_executions_bulk',
+               new_callable=AsyncMock, side_effect=lambda docs: len(docs)) as mock_bulk:
+        await recorder.start()
+        for i in range(7):
+            await recorder.record({"prompt_id": "p", "output": i})
+        await asyncio.sleep(0.2)
+        await recorder.stop()
+
+    sizes = [len(c[0][0]) for c in mock_bulk.call_args_list]
+    assert sum(sizes) == 7
+    assert max(sizes) <= 3
+    assert recorder.flushed == 7
+    assert all("_id" in doc for c in mock_bulk.call_args_list for doc in c[0][0])
+
+
+@pytest.mark.asyncio
+async def test_stop_drains_the_queue(tmp_path):
+    """Test that executions still queued at shutdown are written"""
+    recorder = _recorder(tmp_path, batch_size=100, flush_interval_s=10)
+    with patch('roteamento_ia_backend.db.recorder.create_executions_bulk',
+               new_callable=AsyncMock, side_effect=lambda docs: len(docs)) as mock_bulk:
+        await recorder.start()
+        for i in range(5):
+            await recorder.record({"output": i})
+        await recorder.stop()
+
+    assert recorder.flushed + recorder.spilled == 5
+
+
+@pytest.mark.asyncio
+async def test_stop_writes_the_batch_being_collected(tmp_path):
+    """Test that executions already taken off the queue by the flusher are written at shutdown"""
+    recorder = _recorder(tmp_path, batch_size=100, flush_interval_s=5)
+    with patch('roteamento_ia_backend.db.recorder.create_executions_bulk',
+               new_callable=AsyncMock, side_effect=lambda docs: len(docs)) as mock_bulk:
+        await recorder.start()
+        for i in range(5):
+            await recorder.record({"output": i})
+        # The flusher takes the docs and waits for more until the interval ends
+        await asyncio.sleep(0.05)
+        await recorder.stop()
+
+    assert recorder.flushed == 5
+    assert sorted(doc["output"] for c in mock_bulk.call_args_list for doc in c[0][0]) == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_spills_to_disk_and_is_replayed(tmp_path):
+    """Test that a batch Mongo rejects goes to disk and is sent again on start"""
+    recorder = _recorder(tmp_path)
+    with patch('roteamento_ia_backend.db.recorder.create_executions_bulk',
+               new_callable=AsyncMock, side_effect=Exception("mongo down")):
+        await recorder.start()
+        await recorder.record({"output": "a"})
+        await asyncio.sleep(0.2)
+        await recorder.stop()
+
+    assert recorder.spilled == 1
+    assert os.path.exists(recorder.spill_file)
+    assert recorder.spill_file == str(tmp_path / f"spill.{os.getpid()}.jsonl")
+
+    with patch('roteamento_ia_backend.db.recorder.create_executions_bulk',
+               new_callable=AsyncMock, side_effect=lambda docs: len(docs)) as mock_bulk:
+        await recorder.start()
+        await recorder.stop()
+
+    assert mock_bulk.call_args[0][0][0]["output"] == "a"
+    assert os.listdir(tmp_path) == []
+
+
+def _dead_pid():
+    pid = 999_999
+    while True:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return pid
+        except PermissionError:
+            pass
+        pid -= 1
+
+
+@pytest.mark.asyncio
+async def test_start_replays_leftovers_and_dead_letters_bad_lines(tmp_path):
+    """Test that start picks up files of dead workers and interrupted replays, skipping truncated lines"""
+    dead = _dead_pid()
+    good = [{"_id": ObjectId(), "output": i} for i in range(3)]
+    (tmp_path / f"spill.{dead}.jsonl").write_text(
+        json_util.dumps(good[0]) + "\n" + '{"_id": {"$oid": "65', encoding="utf-8"
+    )
+    (tmp_path / f"spill.{dead}.jsonl.replay-1").write_text(json_util.dumps(good[1]) + "\n", encoding="utf-8")
+    (tmp_path / f"spill.{os.getpid()}.jsonl").write_text(json_util.dumps(good[2]) + "\n", encoding="utf-8")
+
+    recorder = _recorder(tmp_path)
+    with patch('roteamento_ia_backend.db.recorder.create_executions_bulk',
+               new_callable=AsyncMock, side_effect=lambda docs: len(docs)) as mock_bulk:
+        await recorder.start()
+        await recorder.stop()
+
+    inserted = sorted(doc["output"] for c in mock_bulk.call_args_list for doc in c[0][0])
+    assert inserted == [0, 1, 2]
+    assert sorted(os.listdir(tmp_path)) == ["spill.dead.jsonl"]
+    assert (tmp_path / "spill.dead.jsonl").read_text(encoding="utf-8").startswith('{"_id": {"$oid": "65')
+
+
+@pytest.mark.asyncio
+async def test_start_leaves_files_of_live_workers(tmp_path):
+    """Test that another running worker's spill file is not taken over"""
+    live = tmp_path / f"spill.{os.getppid()}.jsonl"
+    live.write_text(json_util.dumps({"_id": ObjectId()}) + "\n", encoding="utf-8")
+    recorder = _recorder(tmp_path)
+    with patch('roteamento_ia_backend.db.recorder.create_executions_bulk', new_callable=AsyncMock) as mock_bulk:
+        await recorder.start()
+        await recorder.stop()
+
+    mock_bulk.assert_not_called()
+    assert live.exists()
+
+
+@pytest.mark.asyncio
+async def test_failed_replay_does_not_stop_start_and_keeps_the_docs(tmp_path):
+    """Test that a replay error is logged, the docs go back to disk and start still succeeds"""
+    (tmp_path / f"spill.{os.getpid()}.jsonl").write_text(json_util.dumps({"_id": ObjectId()}) + "\n", encoding="utf-8")
+    recorder = _recorder(tmp_path)
+    with patch('roteamento_ia_backend.db.recorder.create_executions_bulk',
+               new_callable=AsyncMock, side_effect=Exception("mongo down")):
+        await recorder.start()
+        assert recorder.running
+        await recorder.stop()
+
+    assert os.listdir(tmp_path) == [f"spill.{os.getpid()}.jsonl"]
+    assert recorder.spilled == 1
+
+
+@pytest.mark.asyncio
+async def test_full_queue_spills_instead_of_blocking(tmp_path):
+    """Test that a full queue makes the caller wait briefly and then spill"""
+    recorder = _recorder(tmp_path, max_queue=1)
+    blocked = asyncio.Event()
+
+    async def slow_bulk(docs):
+        await blocked.wait()
+        return len(docs)
+
+    with patch('roteamento_ia_backend.db.recorder.create_executions_bulk', side_effect=slow_bulk):
+        await recorder.start()
+        await recorder.record({"output": 1})  # taken by the flusher, which then blocks
+        await asyncio.sleep(0.1)
+        await recorder.record({"output": 2})  # fills the queue
+        await recorder.record({"output": 3})  # queue full: spilled
+        assert recorder.spilled == 1
+        blocked.set()
+        await recorder.stop()
+
+
+@pytest.mark.asyncio
+async def test_record_without_running_recorder_writes_directly(tmp_path):
+    """Test that the recorder falls back to a direct insert when it is not started"""
+    recorder = _recorder(tmp_path)
+    with patch('roteamento_ia_backend.db.recorder.create_execution', new_callable=AsyncMock) as mock_create:
+        await recorder.record({"output": "x"})
+
+    mock_create.assert_awaited_once()
@@ -0,0 +1,100 @@
+import pytest
+from unittest.mock import patch, AsyncMock
+from bson import ObjectId
+
+from roteamento_ia_backend.core.response_cache import LRUCache, ResponseCache, make_cache_key
+from roteamento_ia_backend.routers.execute import _execute_common
+from roteamento_ia_backend.db.schemas import ExecutionIn, InputPayload
+from roteamento_ia_backend.db.models import PromptModel
+
+
+@pytest.fixture
+def mock_prompt():
+    return PromptModel(
+        _id=ObjectId("6507e86b5a458dd52809d552"),
+        name="Test Prompt",
+        template="Summarize for {name}",
+        ia_model="gpt-3.5-turbo",
+        variables=["name"]
+    )
+
+
+def test_lru_cache_evicts_least_recently_used():
+    """Test that the LRU tier keeps at most max_entries items"""
+    cache = LRUCache(max_entries=2, ttl_s=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" becomes the most recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_lru_cache_expires_entries():
+    """Test that entries older than the TTL are dropped"""
+    cache = LRUCache(max_entries=10, ttl_s=60)
+    with patch('roteamento_ia_backend.core.response_cache.time.monotonic', return_value=1000.0):
+        cache.set("a", 1)
+    with patch('roteamento_ia_backend.core.response_cache.time.monotonic', return_value=1061.0):
+        assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_make_cache_key_depends_on_every_part():
+    """Test that prompt, model, input and rendered template all change the key"""
+    base = make_cache_key("p1", "rendered", "input", "gpt-4")
+    assert base == make_cache_key("p1", "rendered", "input", "gpt-4")
+    assert base != make_cache_key("p2", "rendered", "input", "gpt-4")
+    assert base != make_cache_key("p1", "other", "input", "gpt-4")
+    assert base != make_cache_key("p1", "rendered", "other", "gpt-4")
+    assert base != make_cache_key("p1", "rendered", "input", "gemini-pro")
+
+
+@pytest.mark.asyncio
+async def test_response_cache_promotes_mongo_hits_to_memory():
+    """Test that a hit on the Mongo tier is copied to the memory tier"""
+    cache = ResponseCache(max_entries=10, ttl_s=60, use_mongo=True)
+    entry = {"output": "cached", "latency_ms": 900}
+
+    with patch('roteamento_ia_backend.core.response_cache.get_cached_response', new_callable=AsyncMock) as mock_get:
+        mock_get.return_value = entry
+
+        assert await cache.get("k") == (entry, "mongo")
+        assert await cache.get("k") == (entry, "memory")
+        mock_get.assert_awaited_once_with("k")
+
+
+@pytest.mark.asyncio
+async def test_execute_common_cache_hit_skips_provider(mock_prompt):
+    """Test that a second identical execution is served from the cache"""
+    payload = ExecutionIn(
+        prompt_id="6507e86b5a458dd52809d552",
+        ia_model="gpt-3.5-turbo",
+        variables={"name": "John"},
+        input=InputPayload(type="text", data="Hello, world!")
+    )
+    cache = ResponseCache(max_entries=10, ttl_s=60, use_mongo=False)
+    generate = AsyncMock(return_value="Fresh response")
+
+    with patch('roteamento_ia_backend.routers.execute.settings.RESPONSE_CACHE_ENABLED', True), \
+         patch('roteamento_ia_backend.routers.execute.response_cache', cache), \
+         patch('roteamento_ia_backend.routers.execute.get_prompt_by_id', new_callable=AsyncMock) as mock_get_prompt, \
+         patch('roteamento_ia_backend.routers.execute._select_model_fn', new_callable=AsyncMock) as mock_select_fn, \
+         patch('roteamento_ia_backend.routers.execute.record_execution', new_callable=AsyncMock) as mock_create_execution:
+        mock_get_prompt.return_value = mock_prompt
+        mock_select_fn.return_value = (generate, True)
+
+        first = await _execute_common(payload)
+        second = await _execute_common(payload)
+
+        assert first.cache_hit is False
+        assert second.cache_hit is True
+        assert second.cache_tier == "memory"
+        assert second.output == "Fresh response"
+        generate.assert_awaited_once()
+
+        stored = mock_create_execution.call_args_list[1][0][0]
+        assert stored["cache"]["hit"] is True
+        assert stored["cache"]["tier"] == "memory"
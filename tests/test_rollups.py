@@ -0,0 +1,119 @@
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import patch, AsyncMock, MagicMock
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo.errors import BulkWriteError
+
+from roteamento_ia_backend.db.crud import (
+    apply_execution_rollups, create_executions_bulk, get_execution_timeseries,
+)
+from roteamento_ia_backend.routers.prompts import timeseries
+
+PROMPT_ID = "6507e86b5a458dd52809d552"
+TS = datetime(2025, 3, 10, 14, 37, 12, tzinfo=timezone.utc)
+
+
+def _execution(latency_ms, error=False, model="gpt-4o"):
+    return {
+        "_id": ObjectId.from_datetime(TS),
+        "prompt_id": PROMPT_ID,
+        "ia_model": model,
+        "latency_ms": latency_ms,
+        "cost": 0.01,
+        "error": error,
+    }
+
+
+@pytest.mark.asyncio
+async def test_rollups_merge_a_batch_into_one_upsert_per_bucket():
+    """Test that a batch becomes one $inc upsert per prompt × model × granularity bucket"""
+    with patch('roteamento_ia_backend.db.crud.db') as mock_db:
+        mock_db.execution_rollups.bulk_write = AsyncMock()
+        await apply_execution_rollups([_execution(80), _execution(300, error=True), _execution(90)])
+
+    ops = mock_db.execution_rollups.bulk_write.call_args[0][0]
+    by_granularity = {op._filter["granularity"]: op for op in ops}
+    assert len(ops) == 3
+    minute = by_granularity["minute"]
+    assert minute._filter["bucket"] == datetime(2025, 3, 10, 14, 37, tzinfo=timezone.utc)
+    assert minute._doc["$inc"]["count"] == 3
+    assert minute._doc["$inc"]["errors"] == 1
+    assert minute._doc["$inc"]["latency_sum"] == 470
+    assert minute._doc["$inc"]["hist.le_100"] == 2
+    assert minute._doc["$inc"]["hist.le_500"] == 1
+    assert "expires_at" in minute._doc["$setOnInsert"]
+    assert by_granularity["day"]._filter["bucket"] == datetime(2025, 3, 10, tzinfo=timezone.utc)
+    assert "$setOnInsert" not in by_granularity["day"]._doc  # days are kept
+
+
+@pytest.mark.asyncio
+async def test_bulk_insert_rolls_up_only_inserted_documents():
+    """Test that documents rejected by insert_many are not counted in the rollups"""
+    docs = [_execution(100), _execution(200)]
+    error = BulkWriteError({"writeErrors": [{"index": 1, "code": 11000}], "nInserted": 1})
+    with patch('roteamento_ia_backend.db.crud.db') as mock_db, \
+         patch('roteamento_ia_backend.db.crud.apply_execution_rollups', new_callable=AsyncMock) as mock_rollups:
+        mock_db.executions.insert_many = AsyncMock(side_effect=error)
+        with pytest.raises(BulkWriteError):
+            await create_executions_bulk(docs)
+
+    mock_rollups.assert_awaited_once_with([docs[0]])
+
+
+@pytest.mark.asyncio
+async def test_bulk_insert_stamps_created_at():
+    """Test that batch executions get a creation time like single inserts"""
+    stamped = {**_execution(100), "created_at": TS}
+    docs = [_execution(100), stamped]
+    with patch('roteamento_ia_backend.db.crud.db') as mock_db, \
+         patch('roteamento_ia_backend.db.crud.apply_execution_rollups', new_callable=AsyncMock):
+        mock_db.executions.insert_many = AsyncMock(return_value=MagicMock(inserted_ids=[1, 2]))
+        await create_executions_bulk(docs)
+
+    inserted = mock_db.executions.insert_many.call_args[0][0]
+    assert isinstance(inserted[0]["created_at"], datetime)
+    assert inserted[1]["created_at"] == TS
+
+
+@pytest.mark.asyncio
+async def test_timeseries_reads_rollups():
+    """Test that time series points are built from the rollup buckets"""
+    row = {
+        "_id": datetime(2025, 3, 10, 14),
+        "count": 4, "errors": 1, "cost_sum": 0.04,
+        "latency_sum": 1000, "latency_count": 4, "ttft_sum": 0, "ttft_count": 0,
+        "le_100": 1, "le_250": 1, "le_500": 1, "le_1000": 1,
+    }
+    with patch('roteamento_ia_backend.db.crud.db') as mock_db:
+        cursor = MagicMock()
+        cursor.to_list = AsyncMock(return_value=[row])
+        mock_db.execution_rollups.aggregate = MagicMock(return_value=cursor)
+
+        points = await get_execution_timeseries(
+            PROMPT_ID, "hour", datetime(2025, 3, 10, tzinfo=timezone.utc), datetime(2025, 3, 11, tzinfo=timezone.utc)
+        )
+
+    mock_db.executions.aggregate.assert_not_called()
+    match = mock_db.execution_rollups.aggregate.call_args[0][0][0]["$match"]
+    assert match["granularity"] == "hour"
+    point = points[0]
+    assert point["count"] == 4
+    assert point["error_rate"] == 0.25
+    assert point["avg_latency_ms"] == 250.0
+    assert point["p50_latency_ms"] == 250.0
+    assert point["p99_latency_ms"] == 1000.0
+    assert point["avg_ttft_ms"] is None
+
+
+@pytest.mark.asyncio
+async def test_timeseries_endpoint_validates_parameters():
+    """Test the time series endpoint parameters"""
+    with pytest.raises(HTTPException) as excinfo:
+        await timeseries(PROMPT_ID, granularity="week", since=None, until=None, ia_model=None)
+    assert excinfo.value.status_code == 400
+
+    # Two months of minute buckets is above ROLLUP_MAX_POINTS
+    with pytest.raises(HTTPException) as excinfo:
+        await timeseries(PROMPT_ID, granularity="minute", since=datetime(2025, 1, 1), until=datetime(2025, 3, 1), ia_model=None)
+    assert excinfo.value.status_code == 400
@@ -0,0 +1,145 @@
+import pytest
+from unittest.mock import patch, AsyncMock
+from bson import ObjectId
+
+from roteamento_ia_backend.core.model_stats import ModelStatsRegistry
+from roteamento_ia_backend.core.routing import ModelRouter, estimate_cost
+from roteamento_ia_backend.routers.execute import _execute_common
+from roteamento_ia_backend.db.schemas import ExecutionIn, InputPayload
+from roteamento_ia_backend.db.models import PromptModel
+
+CLASSES = {
+    "fast": {"models": ["model-a", "model-b"], "latency_weight": 1.0, "cost_weight": 0.0},
+    "cheap": {"models": ["model-a", "model-b"], "latency_weight": 0.0, "cost_weight": 1.0},
+    "vision": {"models": ["model-b"], "latency_weight": 1.0, "cost_weight": 0.0},
+}
+COSTS = {
+    "model-a": {"input": 0.01, "output": 0.01},
+    "model-b": {"input": 0.001, "output": 0.001},
+}
+
+
+@pytest.fixture
+def stats():
+    registry = ModelStatsRegistry(window=50, alpha=0.5)
+    for _ in range(10):
+        registry.record("model-a", 200, ok=True)
+        registry.record("model-b", 900, ok=True)
+    return registry
+
+
+def test_ewma_tracks_latency_and_errors():
+    """Test the EWMA latency and error rate kept per model"""
+    registry = ModelStatsRegistry(window=10, alpha=0.5)
+    registry.record("m", 100, ok=True)
+    registry.record("m", 300, ok=True)
+    registry.record("m", 5000, ok=False)
+
+    stats = registry.peek("m")
+    assert stats.ewma_latency_ms == 200.0
+    assert stats.ewma_error_rate == 0.5
+
+
+def test_route_explicit_model_passes_through(stats):
+    """Test that concrete model names are not rerouted"""
+    router = ModelRouter(CLASSES, stats)
+    decision = router.route("gpt-4o", 100)
+
+    assert decision["model"] == "gpt-4o"
+    assert decision["reason"] == "explicit"
+
+
+def test_route_fast_and_cheap_classes(stats):
+    """Test that classes pick the fastest or the cheapest candidate"""
+    router = ModelRouter(CLASSES, stats)
+    with patch('roteamento_ia_backend.core.routing.settings.MODEL_COSTS', COSTS):
+        fast = router.route("fast", 1000)
+        cheap = router.route("cheap", 1000)
+
+    assert fast["model"] == "model-a"
+    assert cheap["model"] == "model-b"
+    assert {c["model"] for c in fast["candidates"]} == {"model-a", "model-b"}
+    assert all("score" in c for c in fast["candidates"])
+
+
+def test_route_penalizes_failing_models(stats):
+    """Test that a model with a high recent error rate loses to a slower healthy one"""
+    for _ in range(10):
+        stats.record("model-a", 200, ok=False)
+    router = ModelRouter(CLASSES, stats)
+
+    assert router.route("fast", 1000)["model"] == "model-b"
+
+
+def test_penalized_model_recovers_after_idle_time(stats):
+    """Test that a failing model is chosen again once its error rate decays"""
+    for _ in range(10):
+        stats.record("model-a", 200, ok=False)
+    router = ModelRouter(CLASSES, stats, error_half_life_s=60)
+    assert router.route("fast", 1000)["model"] == "model-b"
+
+    later = stats.peek("model-a").updated_at + 600
+    with patch('roteamento_ia_backend.core.model_stats.time.monotonic', return_value=later):
+        decision = router.route("fast", 1000)
+
+    assert decision["model"] == "model-a"
+    assert decision["candidates"][0]["error_rate"] < 0.01
+
+
+def test_route_explores_other_candidates(stats):
+    """Test that exploration occasionally sends traffic to a non-best candidate"""
+    router = ModelRouter(CLASSES, stats, explore_probability=0.1)
+    with patch('roteamento_ia_backend.core.routing.random.random', return_value=0.05):
+        explored = router.route("fast", 1000)
+    with patch('roteamento_ia_backend.core.routing.random.random', return_value=0.5):
+        exploited = router.route("fast", 1000)
+
+    assert explored["model"] == "model-b"
+    assert explored["reason"] == "exploração"
+    assert exploited["model"] == "model-a"
+
+
+def test_route_restricts_images_to_vision_models(stats):
+    """Test that image inputs only route to vision-capable models"""
+    router = ModelRouter(CLASSES, stats)
+
+    assert router.route("fast", 1000, needs_vision=True)["model"] == "model-b"
+
+
+def test_estimate_cost_uses_cost_table():
+    """Test the per-1k-token cost estimate"""
+    with patch('roteamento_ia_backend.core.routing.settings.MODEL_COSTS', COSTS):
+        assert estimate_cost("model-a", 1000, 500) == pytest.approx(0.015)
+        assert estimate_cost("unknown", 1000, 500) is None
+
+
+@pytest.mark.asyncio
+async def test_execute_common_stores_routing_decision(stats):
+    """Test that a class request is routed to a concrete model and the decision is stored"""
+    prompt = PromptModel(
+        _id=ObjectId("6507e86b5a458dd52809d552"),
+        name="Test Prompt",
+        template="Hello",
+        ia_model="gpt-3.5-turbo",
+        variables=[]
+    )
+    payload = ExecutionIn(
+        prompt_id="6507e86b5a458dd52809d552",
+        ia_model="fast",
+        input=InputPayload(type="text", data="Hi")
+    )
+
+    with patch('roteamento_ia_backend.routers.execute.model_router', ModelRouter(CLASSES, stats)), \
+         patch('roteamento_ia_backend.routers.execute.get_prompt_by_id', new_callable=AsyncMock) as mock_get_prompt, \
+         patch('roteamento_ia_backend.routers.execute._select_model_fn', new_callable=AsyncMock) as mock_select_fn, \
+         patch('roteamento_ia_backend.routers.execute.record_execution', new_callable=AsyncMock) as mock_create_execution:
+        mock_get_prompt.return_value = prompt
+        mock_select_fn.return_value = (AsyncMock(return_value="ok"), True)
+
+        await _execute_common(payload)
+
+        mock_select_fn.assert_called_once_with("model-a")
+        stored = mock_create_execution.call_args[0][0]
+        assert stored["ia_model"] == "model-a"
+        assert stored["routing"]["requested"] == "fast"
+        assert stored["routing"]["route_class"] == "fast"
@@ -0,0 +1,103 @@
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock
+from bson import ObjectId
+
+from roteamento_ia_backend.core.singleflight import SingleFlight
+from roteamento_ia_backend.routers.execute import _execute_common
+from roteamento_ia_backend.db.schemas import ExecutionIn, InputPayload
+from roteamento_ia_backend.db.models import PromptModel
+
+
+@pytest.mark.asyncio
+async def test_singleflight_runs_concurrent_calls_once():
+    """Test that concurrent calls with the same key share one execution"""
+    flight = SingleFlight()
+    calls = 0
+
+    async def slow_call():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "result"
+
+    results = await asyncio.gather(*(flight.do("k", slow_call) for _ in range(5)))
+
+    assert calls == 1
+    assert [r for r, _ in results] == ["result"] * 5
+    assert sum(1 for _, shared in results if not shared) == 1
+    assert len(flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_singleflight_propagates_errors_to_all_waiters():
+    """Test that every waiter receives the leader's exception"""
+    flight = SingleFlight()
+
+    async def failing_call():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(
+        flight.do("k", failing_call), flight.do("k", failing_call), return_exceptions=True
+    )
+
+    assert all(isinstance(r, ValueError) for r in results)
+    assert len(flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_singleflight_survives_leader_cancellation():
+    """Test that cancelling the caller that started the call does not cancel the waiters"""
+    flight = SingleFlight()
+
+    async def slow_call():
+        await asyncio.sleep(0.02)
+        return "result"
+
+    leader = asyncio.ensure_future(flight.do("k", slow_call))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(flight.do("k", slow_call))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == ("result", True)
+
+
+@pytest.mark.asyncio
+async def test_execute_common_coalesces_identical_requests():
+    """Test that identical concurrent executions call the provider once but are each recorded"""
+    prompt = PromptModel(
+        _id=ObjectId("6507e86b5a458dd52809d552"),
+        name="Test Prompt",
+        template="Summarize for {name}",
+        ia_model="gpt-3.5-turbo",
+        variables=["name"]
+    )
+    payload = ExecutionIn(
+        prompt_id="6507e86b5a458dd52809d552",
+        ia_model="gpt-3.5-turbo",
+        variables={"name": "John"},
+        input=InputPayload(type="text", data="Hello, world!")
+    )
+
+    async def slow_generate(prompt_text, model):
+        await asyncio.sleep(0.01)
+        return "Shared response"
+
+    generate = AsyncMock(side_effect=slow_generate)
+
+    with patch('roteamento_ia_backend.routers.execute.inflight_executions', SingleFlight()), \
+         patch('roteamento_ia_backend.routers.execute.get_prompt_by_id', new_callable=AsyncMock) as mock_get_prompt, \
+         patch('roteamento_ia_backend.routers.execute._select_model_fn', new_callable=AsyncMock) as mock_select_fn, \
+         patch('roteamento_ia_backend.routers.execute.record_execution', new_callable=AsyncMock) as mock_create_execution:
+        mock_get_prompt.return_value = prompt
+        mock_select_fn.return_value = (generate, True)
+
+        results = await asyncio.gather(*(_execute_common(payload) for _ in range(3)))
+
+        assert [r.output for r in results] == ["Shared response"] * 3
+        generate.assert_awaited_once()
+        assert mock_create_execution.await_count == 3
+        stored = [c[0][0] for c in mock_create_execution.call_args_list]
+        assert sum(1 for d in stored if d.get("coalesced")) == 2
@@ -0,0 +1,88 @@
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+from bson import ObjectId
+
+from roteamento_ia_backend.core.templates import (
+    TemplateCache, TemplateError, MissingVariablesError, compile_template,
+)
+from roteamento_ia_backend.db.crud import create_prompt
+
+
+def test_compile_extracts_placeholders():
+    """Test that placeholders are extracted once, including attribute/index access"""
+    compiled = compile_template("Hi {name}, {user.city} {items[0]} {name!r:>8} {{literal}}")
+
+    assert compiled.variables == ["name", "user", "items"]
+
+
+def test_render_matches_str_format():
+    """Test that the compiled render produces the same output as str.format"""
+    template = "Olá {name}! Total: {total:.2f} ({name!r}) {{fixo}}"
+    values = {"name": "Gui", "total": 3.14159}
+
+    assert compile_template(template).render(values) == template.format(**values)
+
+
+def test_render_reports_all_missing_variables():
+    """Test that every missing variable is reported at once"""
+    compiled = compile_template("{a} {b} {c}")
+
+    with pytest.raises(MissingVariablesError) as excinfo:
+        compiled.render({"b": 1, "z": 2})
+
+    assert excinfo.value.missing == ["a", "c"]
+    assert excinfo.value.extra == ["z"]
+    assert "a, c mencionadas no template" in str(excinfo.value)
+
+
+def test_check_against_declared_variables():
+    """Test that undeclared placeholders and unused declared variables are rejected"""
+    compile_template("{a} {b}", ["a", "b"])
+
+    with pytest.raises(TemplateError) as excinfo:
+        compile_template("{a} {b}", ["a", "c"])
+    assert "b" in str(excinfo.value) and "c" in str(excinfo.value)
+
+    with pytest.raises(TemplateError):
+        compile_template("{} {0}")
+    with pytest.raises(TemplateError):
+        compile_template("unbalanced {name")
+
+
+def test_template_cache_is_keyed_by_version():
+    """Test that a new prompt version is recompiled and the old one is reused"""
+    cache = TemplateCache(max_entries=10)
+    first = cache.get("p1", 0, "{a}")
+
+    assert cache.get("p1", 0, "{a}") is first
+    assert cache.get("p1", 1, "{a} {b}").variables == ["a", "b"]
+
+    cache.forget("p1")
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_create_prompt_fills_variables_from_template():
+    """Test that an empty variables list is filled from the template placeholders"""
+    data = {"name": "p", "template": "Resuma {texto} em {idioma}", "ia_model": "gemini-pro", "variables": []}
+    with patch('roteamento_ia_backend.db.crud.db') as mock_db:
+        inserted_id = ObjectId()
+        mock_db.prompts.insert_one = AsyncMock(return_value=MagicMock(inserted_id=inserted_id))
+        mock_db.prompts.find_one = AsyncMock(side_effect=lambda q: {**mock_db.prompts.insert_one.call_args[0][0], "_id": inserted_id})
+
+        result = await create_prompt(data)
+
+    assert result.variables == ["texto", "idioma"]
+
+
+@pytest.mark.asyncio
+async def test_create_prompt_rejects_broken_template():
+    """Test that a broken template is rejected before it is saved"""
+    data = {"name": "p", "template": "Resuma {texto}", "ia_model": "gemini-pro", "variables": ["outro"]}
+    with patch('roteamento_ia_backend.db.crud.db') as mock_db:
+        mock_db.prompts.insert_one = AsyncMock()
+
+        with pytest.raises(TemplateError):
+            await create_prompt(data)
+
+    mock_db.prompts.insert_one.assert_not_called()